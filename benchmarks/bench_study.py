@@ -0,0 +1,339 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""
+Benchmarks for study expansion, staging, and conductor ticks.
+
+The benchmarks generate synthetic study specifications scaled along the
+number of parameters, the number of combinations, the number of steps, and
+the shape of the study's DAG:
+    - chain: Each step depends on the step before it.
+    - fanout: Every step depends on a single root step.
+    - diamond: A root step fans out to the middle steps, which all join into
+    a final step.
+
+For each configuration the following phases are timed:
+    - load: Loading and verifying the YAML specification (uncached).
+    - setup: Study.setup (acquiring the environment and applying it).
+    - stage: Study.stage (expanding the study into an ExecutionGraph).
+    - generate_scripts: Writing the scripts for every expanded step.
+    - pickle / unpickle: Persisting and loading the ExecutionGraph.
+    - ticks: Conductor ticks (ExecutionGraph.execute_ready_steps) against the
+    simulated scheduler adapter. By default every job finishes by the next
+    tick; settings of the simulated adapter (queue delays, runtimes, failure
+    rates, etc.) can be passed with --batch to exercise restarts and failure
+    propagation deterministically.
+
+Results are written as JSON so that runs can be compared across commits:
+
+    $ python benchmarks/bench_study.py --params 1 2 --combos 10 100 \
+        --steps 4 --shapes chain fanout diamond -o bench.json
+    $ python benchmarks/bench_study.py --combos 1000 --steps 8 \
+        --batch runtime="uniform(1, 5)" failure_rate=0.01 timeout_rate=0.05
+"""
+from argparse import ArgumentParser, RawTextHelpFormatter
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+from subprocess import PIPE, Popen
+import sys
+import tempfile
+import time
+
+import yaml
+
+from maestrowf.datastructures import YAMLSpecification
+from maestrowf.datastructures.core import ExecutionGraph, Study
+
+LOGGER = logging.getLogger(__name__)
+SHAPES = ("chain", "fanout", "diamond")
+
+
+def generate_specification(shape, num_params, num_combos, num_steps,
+                           output_path):
+    """
+    Generate a synthetic study specification.
+
+    Every step except the root uses all parameters and refers to the
+    workspace of its first dependency.
+
+    :param shape: Shape of the study DAG (one of SHAPES).
+    :param num_params: Number of global parameters.
+    :param num_combos: Number of values for each parameter.
+    :param num_steps: Number of abstract steps in the study.
+    :param output_path: The OUTPUT_PATH of the study.
+    :returns: A dictionary representing the YAML specification.
+    """
+    params = ["P{}".format(i) for i in range(num_params)]
+    used = " ".join("$({})".format(param) for param in params)
+
+    study = []
+    names = ["step{}".format(i) for i in range(num_steps)]
+    for index, name in enumerate(names):
+        if index == 0:
+            depends = []
+        elif shape == "chain":
+            depends = [names[index - 1]]
+        elif shape == "fanout" or index < num_steps - 1:
+            depends = [names[0]]
+        else:
+            depends = names[1:-1] or [names[0]]
+
+        if depends:
+            cmd = "echo {} > out.txt; ls $({}.workspace)" \
+                  .format(used, depends[0])
+        else:
+            cmd = "echo root > out.txt"
+
+        study.append({
+            "name": name,
+            "description": "Synthetic step {}.".format(index),
+            # Request resources so that steps are handed to the adapter
+            # rather than executed locally.
+            "run": {"cmd": cmd, "depends": depends, "nodes": 1, "procs": 1},
+        })
+
+    return {
+        "description": {
+            "name": "bench_{}_{}p_{}c_{}s".format(shape, num_params,
+                                                  num_combos, num_steps),
+            "description": "Synthetic benchmark study.",
+        },
+        "env": {
+            "variables": {"OUTPUT_PATH": output_path},
+        },
+        "study": study,
+        "global.parameters": {
+            param: {
+                "values": list(range(num_combos)),
+                "label": "{}.%%".format(param),
+            } for param in params
+        },
+    }
+
+
+class _Timer(object):
+    """Accumulate wall clock timings of named phases."""
+
+    def __init__(self):
+        """Initialize an empty _Timer."""
+        self.timings = {}
+
+    def time(self, phase, func, *args, **kwargs):
+        """
+        Time a call and record its duration under phase.
+
+        :param phase: Name of the phase being timed.
+        :param func: Callable to time.
+        :returns: The value returned by func.
+        """
+        start = time.time()
+        value = func(*args, **kwargs)
+        self.timings[phase] = time.time() - start
+        return value
+
+
+def run_benchmark(shape, num_params, num_combos, num_steps, workdir,
+                  batch=None, stage_workers=1):
+    """
+    Benchmark a single study configuration.
+
+    :param shape: Shape of the study DAG (one of SHAPES).
+    :param num_params: Number of global parameters.
+    :param num_combos: Number of values for each parameter.
+    :param num_steps: Number of abstract steps in the study.
+    :param workdir: Directory to write the study to.
+    :param batch: A dictionary of settings for the simulated adapter.
+    :param stage_workers: Number of processes to stage the study with.
+    :returns: A dictionary of the configuration, and the timings of each
+    benchmarked phase.
+    """
+    output_path = os.path.join(workdir, "output")
+    spec_path = os.path.join(workdir, "spec.yaml")
+    with open(spec_path, "w") as spec_file:
+        yaml.safe_dump(generate_specification(
+            shape, num_params, num_combos, num_steps, output_path),
+            spec_file)
+
+    timer = _Timer()
+    spec = timer.time("load", YAMLSpecification.load_specification,
+                      spec_path, cache_dir=None)
+    study = Study(spec.name, spec.description,
+                  studyenv=spec.get_study_environment(),
+                  parameters=spec.get_parameters(),
+                  steps=spec.get_study_steps())
+    timer.time("setup", study.setup)
+    path, dag = timer.time("stage", study.stage, stage_workers)
+    # Use a queue private to this configuration so runs are independent.
+    adapter = {"type": "simulated", "queue": workdir}
+    adapter.update(batch or {})
+    dag.set_adapter(adapter)
+    timer.time("generate_scripts", dag.generate_scripts)
+
+    pkl_path = os.path.join(path, "{}.pkl".format(study.name))
+    timer.time("pickle", dag.pickle, pkl_path)
+    dag = timer.time("unpickle", ExecutionGraph.unpickle, pkl_path)
+
+    ticks = 0
+    start = time.time()
+    while not dag.execute_ready_steps():
+        ticks += 1
+    timer.timings["ticks"] = time.time() - start
+
+    return {
+        "shape": shape,
+        "params": num_params,
+        "combos": num_combos,
+        "steps": num_steps,
+        "nodes": len(dag.values) - 1,
+        "ticks": ticks,
+        "completed": len(dag.completed_steps),
+        "failed": len(dag.failed_steps),
+        "timings": timer.timings,
+    }
+
+
+def get_commit():
+    """
+    Get the commit of the repository being benchmarked.
+
+    :returns: The commit hash of HEAD, or None if it cannot be determined.
+    """
+    try:
+        p = Popen(["git", "rev-parse", "HEAD"], stdout=PIPE, stderr=PIPE,
+                  cwd=os.path.dirname(os.path.abspath(__file__)))
+        output, _ = p.communicate()
+    except OSError:
+        return None
+
+    if p.returncode != 0:
+        return None
+
+    return output.decode("utf-8").strip()
+
+
+def setup_argparser():
+    """Method for setting up the program's argument parser."""
+    parser = ArgumentParser(prog="bench_study",
+                            description="Benchmark study expansion, staging,"
+                            " and conductor ticks on synthetic studies.",
+                            formatter_class=RawTextHelpFormatter)
+    parser.add_argument("--params", type=int, nargs="+", default=[1, 2],
+                        help="Numbers of parameters to benchmark.")
+    parser.add_argument("--combos", type=int, nargs="+", default=[10, 100],
+                        help="Numbers of parameter combinations to benchmark.")
+    parser.add_argument("--steps", type=int, nargs="+", default=[4],
+                        help="Numbers of abstract steps to benchmark.")
+    parser.add_argument("--shapes", type=str, nargs="+", default=list(SHAPES),
+                        choices=SHAPES, help="DAG shapes to benchmark.")
+    parser.add_argument("--batch", type=str, nargs="+", default=[],
+                        metavar="KEY=VALUE",
+                        help="Settings for the simulated scheduler adapter.")
+    parser.add_argument("--stage_workers", type=int, default=1,
+                        help="Number of processes to stage studies with.")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="Path to write JSON results to (default: "
+                        "stdout).")
+    parser.add_argument("-k", "--keep", action="store_true",
+                        help="Keep the generated studies.")
+
+    return parser
+
+
+def main():
+    """Run the configured benchmarks and write the results."""
+    parser = setup_argparser()
+    args = parser.parse_args()
+
+    batch = {}
+    for setting in args.batch:
+        key, sep, value = setting.partition("=")
+        if not sep:
+            parser.error("Batch settings must be of the form KEY=VALUE.")
+        batch[key] = value
+
+    # Expansion logs heavily, keep it from dominating the measurements.
+    logging.basicConfig(level=logging.CRITICAL)
+    logging.getLogger("maestrowf").setLevel(logging.ERROR)
+
+    results = []
+    configurations = itertools.product(args.shapes, args.params, args.combos,
+                                       args.steps)
+    for shape, num_params, num_combos, num_steps in configurations:
+        workdir = tempfile.mkdtemp(prefix="maestro_bench_")
+        try:
+            result = run_benchmark(shape, num_params, num_combos, num_steps,
+                                   workdir, batch, args.stage_workers)
+        except Exception as e:
+            # Record configurations the tree cannot run and keep going.
+            LOGGER.exception("Benchmark failed.")
+            result = {"shape": shape, "params": num_params,
+                      "combos": num_combos, "steps": num_steps,
+                      "error": "{}: {}".format(type(e).__name__, e)}
+            sys.stderr.write("{shape:<8} params={params:<3} "
+                             "combos={combos:<6} steps={steps:<3} "
+                             "FAILED ({error})\n".format(**result))
+            results.append(result)
+            continue
+        finally:
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        timings = " ".join("{}={:.3f}s".format(phase, seconds)
+                           for phase, seconds in
+                           sorted(result["timings"].items()))
+        sys.stderr.write("{shape:<8} params={params:<3} combos={combos:<6} "
+                         "steps={steps:<3} nodes={nodes:<7} ticks={ticks:<4} "
+                         "failed={failed:<5} ".format(**result))
+        sys.stderr.write("{}\n".format(timings))
+        results.append(result)
+
+    output = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "batch": batch,
+        "stage_workers": args.stage_workers,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(output, out, indent=2, sort_keys=True)
+    else:
+        json.dump(output, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,7 @@
 """Package for providing enumerations for interfaces"""
 from enum import Enum
 
-__all__ = ("JobStatusCode", "State", "SubmissionCode")
+__all__ = ("CancelCode", "JobStatusCode", "State", "SubmissionCode")
 
 
 class SubmissionCode(Enum):
@@ -38,6 +38,11 @@ class SubmissionCode(Enum):
     ERROR = 1
 
 
+class CancelCode(Enum):
+    OK = 0
+    ERROR = 1
+
+
 class JobStatusCode(Enum):
     OK = 0
     NOJOBS = 1
@@ -34,6 +34,7 @@ Abstract classes for handling interfacing with various services.
 from maestrowf.abstracts.interfaces.schedulerscriptadapter import \
     SchedulerScriptAdapter
 from maestrowf.abstracts.interfaces.scriptadapter import ScriptAdapter
+from maestrowf.abstracts.interfaces.statebackend import StateBackend
 
 
-__all__ = ("SchedulerScriptAdapter", "ScriptAdapter")
+__all__ = ("SchedulerScriptAdapter", "ScriptAdapter", "StateBackend")
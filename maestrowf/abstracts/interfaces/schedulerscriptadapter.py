@@ -29,13 +29,21 @@
 
 """Abstract Cluster Interfaces defining the API for interacting with queues."""
 from abc import ABCMeta, abstractmethod
+import copy
 import logging
+import os
 import re
 import six
+import stat
 
+from maestrowf.abstracts.enums import State
 from maestrowf.abstracts.interfaces.scriptadapter import ScriptAdapter
+from maestrowf.markers import get_marker_commands
+from maestrowf.statuscache import TERMINAL_STATES
 
 LOGGER = logging.getLogger(__name__)
+# Name of the file a step run in a bundle reports its progress in.
+MARKER_NAME = "{}.state"
 
 
 @six.add_metaclass(ABCMeta)
@@ -240,6 +248,130 @@ class SchedulerScriptAdapter(ScriptAdapter):
         """
         pass
 
+    def _get_marker_commands(self, step, restart=False):
+        """
+        Generate the commands a scheduled script writes its markers with.
+
+        :param step: An instance of a StudyStep.
+        :param restart: True if the script is the step's restart script.
+        :returns: A string of commands to follow the header of the script,
+        which is empty if no marker directory is set.
+        """
+        if not self._marker_dir:
+            return ""
+
+        commands = get_marker_commands(self._marker_dir, step.name, restart)
+        return "\n\n{}".format(commands)
+
+    def get_marker_path(self, ws_path, name):
+        """
+        Return the path of the marker a step reports its progress in.
+
+        :param ws_path: Path to the workspace directory of the step.
+        :param name: Name of the step.
+        :returns: The path to the step's marker file.
+        """
+        return os.path.join(ws_path, MARKER_NAME.format(name))
+
+    def write_bundle(self, ws_path, name, steps, scripts, markers,
+                     walltime="", parallel=False):
+        """
+        Write a script that runs the scripts of several steps as one job.
+
+        Each step runs in its own workspace and writes its marker when it
+        starts ('RUNNING') and when it ends ('FINISHED' or 'FAILED').
+
+        :param ws_path: Path to the directory the bundle script is written to.
+        :param name: Name of the bundle (used as the job name).
+        :param steps: A list of the StudyStep instances in the bundle, which
+        must share a resource shape.
+        :param scripts: A list of (workspace, script path) tuples of the steps.
+        :param markers: A list of the marker paths of the steps.
+        :param walltime: Walltime of the bundle job.
+        :param parallel: True to run the steps at once, False to run them one
+        after another.
+        :returns: A StudyStep describing the bundle and the path to the
+        written bundle script.
+        """
+        bundle = copy.deepcopy(steps[0])
+        bundle.name = name
+        bundle.description = "Bundle of {} steps: {}".format(
+            len(steps), ", ".join(step.name for step in steps))
+        bundle.run["walltime"] = walltime
+        if parallel:
+            bundle.run["nodes"] = sum(int(step.run.get("nodes") or 1)
+                                      for step in steps)
+
+        quote = six.moves.shlex_quote
+        lines = [self.get_header(bundle), ""]
+        for step, (workspace, script), marker in zip(steps, scripts, markers):
+            # Clear the marker of an earlier attempt.
+            if os.path.exists(marker):
+                os.remove(marker)
+            lines.extend([
+                "# {}".format(step.name),
+                "(",
+                "    cd {} || exit 1".format(quote(workspace)),
+                "    echo RUNNING > {}".format(quote(marker)),
+                "    if {}; then".format(quote(script)),
+                "        echo FINISHED > {}".format(quote(marker)),
+                "    else",
+                "        echo FAILED > {}".format(quote(marker)),
+                "    fi",
+                ") &" if parallel else ")",
+                "",
+            ])
+        if parallel:
+            lines.append("wait")
+
+        path = os.path.join(ws_path, "{}.bundle.sh".format(name))
+        with open(path, "w") as bundle_file:
+            bundle_file.write("\n".join(lines))
+            bundle_file.write("\n")
+        st = os.stat(path)
+        os.chmod(path, st.st_mode | stat.S_IXUSR)
+
+        return bundle, path
+
+    def get_bundle_status(self, job_state, markers):
+        """
+        Derive the status of each step in a bundle.
+
+        :param job_state: The State of the bundle job (None if not found).
+        :param markers: A list of the marker paths of the steps.
+        :returns: A list of the State of each step. Steps that had not started
+        when the bundle ended are INITIALIZED.
+        """
+        ended = job_state in TERMINAL_STATES
+        status = []
+        for marker in markers:
+            try:
+                with open(marker) as marker_file:
+                    progress = marker_file.read().strip()
+            except (IOError, OSError):
+                progress = None
+
+            if progress == State.FINISHED.name:
+                status.append(State.FINISHED)
+            elif progress == State.FAILED.name:
+                status.append(State.FAILED)
+            elif progress is None:
+                if ended:
+                    status.append(State.INITIALIZED)
+                elif job_state == State.RUNNING:
+                    # Waiting on the steps before it in the bundle.
+                    status.append(State.PENDING)
+                else:
+                    status.append(job_state)
+            elif ended:
+                # The bundle ended while the step was running.
+                status.append(State.FAILED if job_state == State.FINISHED
+                              else job_state)
+            else:
+                status.append(State.RUNNING)
+
+        return status
+
     @abstractmethod
     def _state(self, job_state):
         """
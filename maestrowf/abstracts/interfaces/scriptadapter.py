@@ -34,6 +34,9 @@ import os
 import six
 import stat
 
+from maestrowf.abstracts.enums import CancelCode, SubmissionCode
+from maestrowf.statuscache import StatusCache
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -53,6 +56,12 @@ class ScriptAdapter(object):
         - Checking job status.
     """
 
+    # Settings of the status cache used by check_status.
+    _status_ttl = 0
+    _status_cache = None
+    # Directory scheduled scripts write their markers to (None for none).
+    _marker_dir = None
+
     @abstractmethod
     def check_jobs(self, joblist):
         """
@@ -64,6 +73,71 @@ class ScriptAdapter(object):
         """
         pass
 
+    def get_status_scope(self):
+        """
+        Return a key for the set of jobs that check_jobs can observe.
+
+        Adapters that return the same key observe the same jobs, so a single
+        status query can be shared by every study using them.
+
+        :returns: A hashable key, or None if status queries cannot be shared.
+        """
+        return None
+
+    def get_job_nodes(self, joblist):
+        """
+        Return the nodes jobs ran on, to be avoided when resubmitting them.
+
+        :param joblist: A list of job identifiers to look up.
+        :returns: A dictionary of job identifiers to lists of node names. Jobs
+        whose nodes are unknown are left out.
+        """
+        return {}
+
+    def set_status_cache(self, ttl=0, path=None):
+        """
+        Configure the status cache used by check_status.
+
+        :param ttl: Seconds the result of a status query is reused for by
+        adapters with the same status scope (0 to always query jobs that are
+        not known to be in a terminal state).
+        :param path: Path to a file the cache is kept in so that it is shared
+        between processes (None to only share it within the process).
+        """
+        self._status_ttl = float(ttl)
+        self._status_cache = path
+
+    def set_marker_dir(self, path):
+        """
+        Set the directory that scheduled scripts write their markers to.
+
+        Markers let the ExecutionGraph detect that a step exited, and with
+        what exit code, without querying the scheduler (see markers).
+
+        :param path: Path to the marker directory (None to not write markers).
+        """
+        self._marker_dir = path
+
+    def check_status(self, joblist):
+        """
+        For the given job list, query execution status through a cache.
+
+        Adapters with the same status scope share a StatusCache, so a query
+        made by one adapter answers the queries of the others until it
+        expires. Jobs known to be in a terminal state are not queried again.
+
+        :param joblist: A list of job identifiers to be queried.
+        :returns: The return code of the status query, and a dictionary of job
+        identifiers to their status.
+        """
+        scope = self.get_status_scope()
+        if scope is None:
+            return self.check_jobs(joblist)
+
+        cache = StatusCache.get_cache(self._status_cache)
+        return cache.check_jobs(scope, joblist, self.check_jobs,
+                                self._status_ttl)
+
     @abstractmethod
     def _write_script(self, ws_path, step):
         """
@@ -123,3 +197,38 @@ class ScriptAdapter(object):
         :returns: The return code of the submission command and job identiifer.
         """
         pass
+
+    def submit_after(self, step, path, cwd, jobid):
+        """
+        Submit a script that only starts if a job ends unsuccessfully.
+
+        Used to chain the restart of a step to its running job, so that a
+        step that reaches its walltime resumes as soon as its job ends.
+        Adapters that cannot express such a dependency return an error.
+
+        The script also starts if the job fails for another reason, before
+        the conductor sees that it failed and cancels the script. Restart
+        scripts that write markers exit right away if the job's exit marker
+        shows an error, but a job lost to a node failure or cancelled by a
+        signal leaves no such marker, and its restart runs until cancelled.
+
+        :param step: An instance of a StudyStep.
+        :param path: Path to the script to be executed.
+        :param cwd: Path to the current working directory.
+        :param jobid: Identifier of the job the script is to follow.
+        :returns: The return code of the submission command and job identiifer.
+        """
+        LOGGER.debug("%s does not support chained submissions.",
+                     type(self).__name__)
+        return SubmissionCode.ERROR, -1
+
+    def cancel(self, joblist):
+        """
+        Cancel a list of jobs.
+
+        :param joblist: A list of job identifiers to be cancelled.
+        :returns: The return code of the cancel command.
+        """
+        LOGGER.debug("%s does not support cancelling jobs.",
+                     type(self).__name__)
+        return CancelCode.ERROR
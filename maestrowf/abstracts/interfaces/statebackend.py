@@ -0,0 +1,88 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Abstract interface defining the API for persisting study state."""
+from abc import ABCMeta, abstractmethod
+import logging
+import six
+
+LOGGER = logging.getLogger(__name__)
+
+
+@six.add_metaclass(ABCMeta)
+class StateBackend(object):
+    """
+    Abstract class representing the interface for storing study state.
+
+    An ExecutionGraph is persisted as a single pickle which must be loaded in
+    its entirety to answer any question about a study. A StateBackend mirrors
+    the state of an ExecutionGraph into a store that can be queried by step
+    state or abstract step name without loading the graph, and that can be
+    read by external tools while the conductor is writing to it. Backends are
+    expected to provide:
+        - Recording the structure (steps and edges) of a graph.
+        - Updating the store with the current state of each step.
+        - Querying steps by state, abstract step, and time of last change.
+    """
+
+    @abstractmethod
+    def initialize(self, graph):
+        """
+        Record the steps and edges of an ExecutionGraph.
+
+        :param graph: The ExecutionGraph instance to be recorded.
+        """
+        pass
+
+    @abstractmethod
+    def update(self, graph):
+        """
+        Update the store with the current state of each step in a graph.
+
+        :param graph: The ExecutionGraph instance whose state is recorded.
+        """
+        pass
+
+    @abstractmethod
+    def get_steps(self, state=None, abstract_name=None, updated_before=None):
+        """
+        Query the steps recorded in the store.
+
+        :param state: Only return steps in this State (optional).
+        :param abstract_name: Only return steps expanded from the abstract
+        step with this name (optional).
+        :param updated_before: Only return steps whose state last changed
+        before this time in seconds since the epoch (optional).
+        :returns: A list of dictionaries describing each matching step.
+        """
+        pass
+
+    def close(self):
+        """Release any resources held by the backend."""
+        pass
@@ -0,0 +1,212 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Utilities for running shell commands with timeouts, retries and limits."""
+import logging
+from multiprocessing.pool import ThreadPool
+import os
+import signal
+from subprocess import PIPE, Popen
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CommandResult(object):
+    """The outcome of running a command with a CommandRunner."""
+
+    def __init__(self, cmd, retcode, output, err, attempts=1,
+                 timed_out=False, pid=None):
+        """
+        Initialize a CommandResult.
+
+        :param cmd: The command that was run.
+        :param retcode: Return code of the final attempt.
+        :param output: Standard output of the final attempt (as a string).
+        :param err: Standard error of the final attempt (as a string).
+        :param attempts: Number of times the command was run.
+        :param timed_out: True if the final attempt was killed for exceeding
+        its timeout, False otherwise.
+        :param pid: Process identifier of the final attempt.
+        """
+        self.cmd = cmd
+        self.retcode = retcode
+        self.output = output
+        self.err = err
+        self.attempts = attempts
+        self.timed_out = timed_out
+        self.pid = pid
+
+
+class CommandRunner(object):
+    """
+    Run commands with timeouts and retries, and many commands concurrently.
+
+    Interactions with schedulers and the shell are dominated by waiting on
+    round-trips, so the CommandRunner overlaps them on a bounded pool of
+    threads rather than running them one after another.
+    """
+
+    def __init__(self, max_workers=8, timeout=None, retries=0,
+                 retry_delay=1.0):
+        """
+        Initialize a CommandRunner.
+
+        :param max_workers: Maximum number of commands to run at once.
+        :param timeout: Default seconds before a command is killed (None to
+        wait indefinitely).
+        :param retries: Default number of times a failed command is retried.
+        :param retry_delay: Seconds to wait before the first retry, doubled
+        for every retry after it.
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def run(self, cmd, cwd=None, env=None, shell=True, timeout=None,
+            retries=None, ok_codes=(0,)):
+        """
+        Run a command to completion.
+
+        A command is retried if it times out or returns a code that is not in
+        ok_codes. Only retry commands that are safe to repeat.
+
+        :param cmd: Command to run (a string if shell is True, a list of
+        arguments otherwise).
+        :param cwd: Working directory to run the command in.
+        :param env: A dict containing a modified environment for execution.
+        :param shell: True to run the command through the shell.
+        :param timeout: Seconds before the command is killed (defaults to the
+        runner's timeout).
+        :param retries: Times to retry a failed command (defaults to the
+        runner's retries).
+        :param ok_codes: Return codes that are not considered failures.
+        :returns: A CommandResult of the final attempt.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+
+        attempt = 0
+        while True:
+            attempt += 1
+            pid, retcode, output, err, timed_out = \
+                self._run_once(cmd, cwd, env, shell, timeout)
+            if not timed_out and retcode in ok_codes:
+                break
+
+            if timed_out:
+                LOGGER.warning("Command '%s' timed out after %ss (attempt %d "
+                               "of %d).", cmd, timeout, attempt, retries + 1)
+            else:
+                LOGGER.warning("Command '%s' returned %s (attempt %d of %d).",
+                               cmd, retcode, attempt, retries + 1)
+
+            if attempt > retries:
+                break
+            time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        return CommandResult(cmd, retcode, output, err, attempt, timed_out,
+                             pid)
+
+    def map(self, func, items):
+        """
+        Apply a function to every item, at most max_workers at a time.
+
+        :param func: A callable taking a single item. It is called from
+        worker threads and must be safe to call concurrently.
+        :param items: A list of items to apply func to.
+        :returns: A list of the values returned by func, in the order of
+        items.
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+
+        pool = ThreadPool(min(self.max_workers, len(items)))
+        try:
+            results = pool.map(func, items)
+        except Exception:
+            pool.terminate()
+            raise
+        pool.close()
+        pool.join()
+        return results
+
+    def run_many(self, cmds, **kwargs):
+        """
+        Run several commands concurrently.
+
+        :param cmds: A list of commands to run.
+        :param **kwargs: Keyword arguments passed to run for every command.
+        :returns: A list of CommandResults, in the order of cmds.
+        """
+        return self.map(lambda cmd: self.run(cmd, **kwargs), cmds)
+
+    @staticmethod
+    def _run_once(cmd, cwd, env, shell, timeout):
+        """
+        Run a command once.
+
+        :returns: The process identifier, return code, standard output and
+        standard error of the command, and True if it was killed for timing
+        out.
+        """
+        # Commands that can time out run in their own process group so that
+        # anything they spawn (such as the command under a shell) is killed
+        # with them and does not hold their output open.
+        setsid = os.setsid if timeout and hasattr(os, "setsid") else None
+        p = Popen(cmd, shell=shell, stdout=PIPE, stderr=PIPE, cwd=cwd,
+                  env=env, universal_newlines=True, preexec_fn=setsid)
+
+        timed_out = []
+        timer = None
+        if timeout:
+            def _kill():
+                timed_out.append(True)
+                try:
+                    if setsid:
+                        os.killpg(p.pid, signal.SIGKILL)
+                    else:
+                        p.kill()
+                except OSError:
+                    # The process finished before it could be killed.
+                    pass
+            timer = threading.Timer(timeout, _kill)
+            timer.daemon = True
+            timer.start()
+
+        try:
+            output, err = p.communicate()
+        finally:
+            if timer:
+                timer.cancel()
+
+        return p.pid, p.returncode, output, err, bool(timed_out)
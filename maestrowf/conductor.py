@@ -28,16 +28,19 @@
 ###############################################################################
 
 from argparse import ArgumentParser, RawTextHelpFormatter
+from collections import OrderedDict
 from datetime import datetime
 import glob
 import inspect
 import logging
 import os
 import sys
-from time import sleep
+from time import sleep, time
 
 from maestrowf.datastructures.core import ExecutionGraph
+from maestrowf.profiler import PROFILE_FORMATS, Profiler
 from maestrowf.utils import create_parentdir
+from maestrowf.watcher import get_watcher
 
 # Logger instantiation
 rootlogger = logging.getLogger(inspect.getmodule(__name__))
@@ -65,6 +68,9 @@ def setup_argparser():
                         help="Check the status of the ExecutionGraph "
                         "located as specified by the 'directory' "
                         "argument.")
+    parser.add_argument("-r", "--report", action="store_true",
+                        help="Report timing statistics for the steps of the "
+                        "study located in the 'directory' argument.")
     parser.add_argument("-l", "--logpath", type=str,
                         help="Alternate path to store program logging.")
     parser.add_argument("-d", "--debug_lvl", type=int, default=2,
@@ -79,6 +85,21 @@ def setup_argparser():
     parser.add_argument("-t", "--sleeptime", type=int, default=60,
                         help="Amount of time (in seconds) for the manager to "
                         "wait between job status checks.")
+    parser.add_argument("--no_watch", action="store_true", default=False,
+                        help="Only check job status every sleeptime seconds, "
+                        "rather than also as soon as steps write their exit "
+                        "markers.")
+    parser.add_argument("--min_interval", type=float, default=5,
+                        help="Minimum amount of time (in seconds) between "
+                        "checks woken up by steps that exit. Checks between "
+                        "sleeptime intervals only read exit markers, without "
+                        "querying the scheduler.")
+    parser.add_argument("--profile", type=str, default=None,
+                        choices=PROFILE_FORMATS,
+                        help="Profile conductor ticks, writing the profile to "
+                        "the logging path after every tick:\n"
+                        "pstats - cProfile output readable with pstats\n"
+                        "trace - Timing spans as Chrome trace JSON")
 
     return parser
 
@@ -124,16 +145,122 @@ def setup_logging(args, name):
     logger.debug("DEBUG Logging Level -- Enabled")
 
 
+def display_status(directory):
+    """
+    Print the status of a study from its status index.
+
+    Only the compact status index written by the conductor is read, so
+    checking status neither loads the ExecutionGraph nor contends with a
+    running conductor.
+
+    :param directory: The directory where a study has been set up.
+    :returns: 0 if the status was displayed, 1 otherwise.
+    """
+    status_index = glob.glob(os.path.join(directory, "*.status"))
+    # A study split into shards has a status index per shard, which are
+    # displayed as one.
+    shard_index = sorted(
+        glob.glob(os.path.join(directory, "shards", "*", "*.status")))
+    if not status_index and shard_index:
+        status_index = shard_index
+    elif len(status_index) != 1:
+        sys.stderr.write("Expected a single status index in '{}', found {}."
+                         "\n".format(directory, len(status_index)))
+        return 1
+
+    status = OrderedDict()
+    for path in status_index:
+        status.update(ExecutionGraph.read_status(path))
+    row = "{:<50} {:<12} {:<12} {:>8}  {}"
+    lines = [row.format("Step", "State", "Job ID", "Restarts", "Updated")]
+    counts = {}
+    for name, entry in status.items():
+        state = entry["state"].name
+        counts[state] = counts.get(state, 0) + 1
+        updated = entry["updated"].strftime("%Y-%m-%d %H:%M:%S") \
+            if entry["updated"] else "--"
+        lines.append(row.format(name, state, entry["jobid"] or "--",
+                                entry["restarts"], updated))
+
+    summary = ", ".join("{}: {}".format(state, counts[state])
+                        for state in sorted(counts))
+    lines.append("")
+    lines.append("Total steps: {} ({})".format(len(status), summary))
+    if len(status_index) > 1:
+        lines.append("Shards: {}".format(len(status_index)))
+    sys.stdout.write("\n".join(lines))
+    sys.stdout.write("\n")
+    return 0
+
+
+def _format_seconds(value):
+    """
+    Format a duration for display.
+
+    :param value: Duration in seconds (or None).
+    :returns: A string of the duration in seconds, '--' if value is None.
+    """
+    return "--" if value is None else "{:.1f}".format(value)
+
+
+def display_report(dag):
+    """
+    Print a timing report for the steps of a study.
+
+    :param dag: The ExecutionGraph of the study.
+    :returns: 0 once the report has been displayed.
+    """
+    report = dag.get_performance_report()
+    lines = [
+        "Study: {}".format(dag.name),
+        "Makespan (s): {}".format(_format_seconds(report["makespan"])),
+        "Critical path (s): {}".format(
+            _format_seconds(report["critical_path"])),
+        "Critical steps: {}".format(" -> ".join(report["critical_steps"])),
+        "",
+    ]
+
+    row = "{:<30} {:<8} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10}"
+    stats = ("min", "mean", "median", "p90", "max")
+    lines.append(row.format("Step", "Interval", "Count", *stats))
+    intervals = ("latency", "queue", "runtime")
+    sections = list(report["steps"].items()) + \
+        [("(all steps)", {key: report[key] for key in intervals})]
+    for step, summary in sections:
+        for interval in intervals:
+            values = summary[interval]
+            lines.append(row.format(
+                step, interval, values["count"],
+                *[_format_seconds(values[stat]) for stat in stats]))
+
+    lines.append("")
+    lines.append("latency: dependencies finished to submission (conductor)")
+    lines.append("queue: submission to started running (scheduler)")
+    lines.append("runtime: started running to finished (from markers where "
+                 "written, otherwise as seen by the conductor)")
+    sys.stdout.write("\n".join(lines))
+    sys.stdout.write("\n")
+    return 0
+
+
 def main():
     # Set up and parse the ArgumentParser
     parser = setup_argparser()
     args = parser.parse_args()
 
+    # If only checking status, read the status index and exit.
+    if args.status:
+        sys.exit(display_status(args.directory))
+
+    profiler = Profiler("conductor", args.profile)
+
     # Unpickle the ExecutionGraph
     study_pkl = glob.glob(os.path.join(args.directory, "*.pkl"))
     # We expect only a single pickle file.
     if len(study_pkl) == 1:
-        dag = ExecutionGraph.unpickle(study_pkl[0])
+        with profiler.span("unpickle"):
+            dag = ExecutionGraph.unpickle(study_pkl[0])
+        status_path = "{}.status".format(os.path.splitext(study_pkl[0])[0])
     else:
         if len(study_pkl) > 1:
             msg = "More than one pickle found. Expected only one. Aborting."
@@ -145,6 +272,10 @@ def main():
         sys.stderr.write(msg)
         sys.exit(status)
 
+    # If only reporting, summarize the recorded step timings and exit.
+    if args.report:
+        sys.exit(display_report(dag))
+
     # Set up logging
     setup_logging(args, dag.name)
     # Use ExecutionGraph API to determine next jobs to be launched.
@@ -152,15 +283,50 @@ def main():
                 "%s...", dag.name, study_pkl[0])
     logger.info("Study Description: %s", dag.description)
 
+    log_path = args.logpath or os.path.join(args.directory, "logs")
+    # Wake up early for steps that exit, where they write markers.
+    watcher = None
+    if dag.marker_dir and not args.no_watch:
+        watcher = get_watcher(dag.marker_dir)
+
     study_complete = False
+    tick = 0
+    # The scheduler is queried at most once every sleeptime, checks woken up
+    # by the watcher in between only resolve the steps that wrote markers.
+    last_query = None
     while not study_complete:
         logger.info("Checking DAG status at %s", str(datetime.now()))
-        # Execute steps that are ready
-        study_complete = dag.execute_ready_steps()
-        # Re-pickle the ExecutionGraph.
-        dag.pickle(study_pkl[0])
-        # Sleep for SLEEPTIME in args
-        sleep(args.sleeptime)
+        tick_start = time()
+        markers_only = last_query is not None and \
+            tick_start - last_query < args.sleeptime
+        if not markers_only:
+            last_query = tick_start
+        with profiler.span("tick", tick=tick, markers_only=markers_only):
+            # Execute steps that are ready
+            with profiler.span("execute_ready_steps"):
+                study_complete = dag.execute_ready_steps(
+                    markers_only=markers_only)
+            # Re-pickle the ExecutionGraph and refresh the status index.
+            with profiler.span("pickle"):
+                dag.pickle(study_pkl[0])
+            with profiler.span("write_status"):
+                dag.write_status(status_path)
+            with profiler.span("sync_state"):
+                dag.sync_state()
+        # Refresh the profile so that a stalled study can be inspected.
+        profiler.dump(log_path, dag.name)
+        tick += 1
+        # Sleep for SLEEPTIME in args, or until a step exits.
+        if not watcher:
+            sleep(args.sleeptime)
+        elif not study_complete and \
+                watcher.wait(max(0, last_query + args.sleeptime - time())):
+            # Let more steps exit rather than checking on every marker.
+            sleep(max(0, tick_start + args.min_interval - time()))
+            logger.info("Steps exited, checking DAG status early.")
+
+    if watcher:
+        watcher.close()
 
     # Explicitly return a 0 status.
     sys.exit(0)
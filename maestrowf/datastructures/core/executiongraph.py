@@ -1,13 +1,105 @@
+from collections import defaultdict, OrderedDict
+from datetime import datetime
 import getpass
+import heapq
 import logging
+import os
 import pickle
+import random
+import tempfile
+import time
 
 from maestrowf.abstracts.enums import JobStatusCode, State, SubmissionCode
+from maestrowf.commandrunner import CommandRunner
 from maestrowf.datastructures.dag import DAG
-from maestrowf.interfaces import ScriptAdapterFactory
+from maestrowf.interfaces import ScriptAdapterFactory, StateBackendFactory
+from maestrowf.markers import SIGNAL_EXIT, clear_markers, \
+    read_start_marker, scan_markers
+from maestrowf.runtimehistory import RuntimeHistory
+from maestrowf.utils import format_walltime, parse_walltime
 
 logger = logging.getLogger(__name__)
 SOURCE = "_source"
+# Layout of the status index written by ExecutionGraph.write_status.
+STATUS_FIELDS = ("step", "state", "jobid", "restarts", "updated")
+STATUS_DELIMITER = "\t"
+# Orders in which queued steps are submitted:
+#   - fifo: In the order steps became ready.
+#   - downstream: Steps with the longest chain of steps below them first.
+#   - critical_path: Steps with the longest estimated runtime of the chain of
+#     steps below them (including themselves) first.
+PRIORITIZERS = ("fifo", "downstream", "critical_path")
+# Estimated runtime (in seconds) of a step without observed runtimes or a
+# walltime.
+DEFAULT_RUNTIME = 1.0
+# Lifecycle events that begin a new attempt (job) of a step.
+ATTEMPT_EVENTS = ("SUBMITTED", "CHAINED")
+# States of a step between attempts, which are not the outcome of one.
+BETWEEN_ATTEMPTS = (State.INITIALIZED.name, State.QUEUED.name)
+
+
+def _summarize(values):
+    """
+    Compute summary statistics for a collection of durations.
+
+    :param values: A list of durations in seconds.
+    :returns: A dictionary with the count, min, mean, median, 90th percentile
+    and max of values (None for all statistics if values is empty).
+    """
+    values = sorted(values)
+    count = len(values)
+    if not count:
+        return {"count": 0, "min": None, "mean": None, "median": None,
+                "p90": None, "max": None}
+
+    return {
+        "count": count,
+        "min": values[0],
+        "mean": sum(values) / float(count),
+        "median": values[count // 2] if count % 2 else
+        (values[count // 2 - 1] + values[count // 2]) / 2.0,
+        "p90": values[int(round(0.9 * (count - 1)))],
+        "max": values[-1],
+    }
+
+
+def _get_record_status(record):
+    """
+    Return the state of a record, including records pickled before states
+    were tracked with lifecycle events (which stored the state directly).
+
+    :param record: An instance of a _StepRecord class.
+    :returns: A State enum representing the record's state.
+    """
+    status = getattr(record, "_status", None)
+    if status is None:
+        status = record.__dict__.get("status", State.UNKNOWN)
+    return status
+
+
+def _split_hostlist(hostlist):
+    """
+    Split a comma separated list of hosts without splitting host ranges.
+
+    Slurm compresses host lists into ranges such as 'node[01-03,07]', whose
+    commas do not separate hosts.
+
+    :param hostlist: A comma separated string of hosts and host ranges.
+    :returns: A list of the hosts and host ranges in the list.
+    """
+    hosts = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(hostlist):
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            hosts.append(hostlist[start:index])
+            start = index + 1
+    hosts.append(hostlist[start:])
+    return [host.strip() for host in hosts if host.strip()]
 
 
 class _StepRecord(object):
@@ -32,8 +124,13 @@ class _StepRecord(object):
         to_be_scheduled: True if the record needs scheduling. False otherwise.
         step: The StudyStep that is represented by the record instance.
         restart_limit: Upper limit on the number of restart attempts.
+        abstract_name: Name of the abstract step the record was expanded from.
         """
         self.workspace = kwargs.pop("workspace", "")
+        # Timestamped lifecycle events as (event, time) tuples.
+        self.events = []
+        self._status = None
+        self.last_updated = None
         self.status = kwargs.pop("status", State.INITIALIZED)
         self.jobid = kwargs.pop("jobid", [])
         self.script = kwargs.pop("script", "")
@@ -42,6 +139,222 @@ class _StepRecord(object):
         self.step = kwargs.pop("step", None)
         self.restart_limit = kwargs.pop("restart_limit", 3)
         self.num_restarts = 0
+        self.abstract_name = kwargs.pop("abstract_name", None)
+        # Submission ordering and the number of rejected submissions.
+        self.priority = 0
+        self.rejections = 0
+        # Failed submissions since the last rejection, and the number of
+        # hardware failures the record has been resubmitted after.
+        self.submit_failures = 0
+        self.hwfailures = 0
+        # True if the record's latest job is a bundle of several steps.
+        self.bundled = False
+        # Identifier of a restart job submitted to follow the record's latest
+        # job if it ends unsuccessfully (see chain_restart).
+        self.chained = None
+
+    @property
+    def status(self):
+        """
+        Return the current execution state of the record.
+
+        :returns: A State enum representing the record's state.
+        """
+        return _get_record_status(self)
+
+    @status.setter
+    def status(self, value):
+        """
+        Set the execution state of the record.
+
+        Changing the state also updates the time the record last changed and
+        records the change as a lifecycle event.
+
+        :param value: A State enum representing the record's new state.
+        """
+        if value != getattr(self, "_status", None):
+            self._status = value
+            self.last_updated = time.time()
+            if not hasattr(self, "events"):
+                self.events = []
+            self.events.append((value.name, self.last_updated))
+
+    def mark(self, event, timestamp=None):
+        """
+        Record a timestamped lifecycle event that is not a state change.
+
+        :param event: String name of the event (for example, 'READY').
+        :param timestamp: Time the event happened in seconds since the epoch
+        (defaults to now).
+        """
+        self.events.append(
+            (event, time.time() if timestamp is None else timestamp))
+
+    def first_event(self, event):
+        """
+        Return the time an event was first recorded.
+
+        :param event: String name of the event.
+        :returns: Time in seconds since the epoch, or None if not recorded.
+        """
+        for name, timestamp in self.events:
+            if name == event:
+                return timestamp
+        return None
+
+    def last_event(self, event):
+        """
+        Return the time an event was most recently recorded.
+
+        :param event: String name of the event.
+        :returns: Time in seconds since the epoch, or None if not recorded.
+        """
+        for name, timestamp in reversed(self.events):
+            if name == event:
+                return timestamp
+        return None
+
+    def get_attempts(self):
+        """
+        Return the submission time and outcome of each job of the record.
+
+        Attempts are delimited by the events that begin them (see
+        ATTEMPT_EVENTS), and the outcome of an attempt is the last state the
+        record reached before the next attempt began.
+
+        :returns: A list of (jobid, submitted, state, updated) tuples in order
+        of submission, with the State the attempt reached and the time it was
+        reached.
+        """
+        starts = [index for index, (event, _) in enumerate(self.events)
+                  if event in ATTEMPT_EVENTS]
+        starts.append(len(self.events))
+        attempts = []
+        for number, jobid in enumerate(self.jobid):
+            if number + 1 >= len(starts):
+                # Recorded without an event, so only the latest is known.
+                attempts.append((jobid, self.last_updated, self.status,
+                                 self.last_updated))
+                continue
+
+            submitted = self.events[starts[number]][1]
+            state, updated = State.PENDING, submitted
+            for event, timestamp in \
+                    self.events[starts[number]:starts[number + 1]]:
+                if event in State.__members__ and \
+                        event not in BETWEEN_ATTEMPTS:
+                    state, updated = State[event], timestamp
+            attempts.append((jobid, submitted, state, updated))
+
+        return attempts
+
+    def get_start_time(self):
+        """
+        Return when the record's first job started running.
+
+        The time written by the job to its start marker is used if there is
+        one, otherwise the time it was first seen running.
+
+        :returns: Time in seconds since the epoch, or None if not known.
+        """
+        started = self.first_event("STARTED")
+        if started is None:
+            started = self.first_event(State.RUNNING.name)
+        return started
+
+    def get_finish_time(self):
+        """
+        Return when the record finished.
+
+        The time written by its job to its exit marker is used if there is one,
+        otherwise the time it was seen to have finished (which can be a whole
+        poll interval after it did).
+
+        :returns: Time in seconds since the epoch, or None if not finished.
+        """
+        finished = None
+        for event, timestamp in reversed(self.events):
+            if finished is None:
+                if event == State.FINISHED.name:
+                    finished = timestamp
+            elif event == "EXITED":
+                return min(timestamp, finished)
+            elif event in ATTEMPT_EVENTS:
+                # The job that finished did not write an exit marker.
+                break
+        return finished
+
+    def get_runtime(self):
+        """
+        Return how long the record's finishing job ran for.
+
+        The runtime is measured between the times the job wrote to its start
+        and exit markers. The times the conductor saw it running and finished
+        are not used, since they are only as precise as its poll interval.
+
+        :returns: The runtime in seconds, or None if the record has not
+        finished or its job did not write both markers.
+        """
+        started = exited = None
+        finished = False
+        for event, timestamp in reversed(self.events):
+            if not finished:
+                finished = event == State.FINISHED.name
+            elif event == "EXITED" and exited is None:
+                exited = timestamp
+            elif event == "STARTED" and exited is not None:
+                started = timestamp
+                break
+            elif event in ATTEMPT_EVENTS:
+                break
+
+        if started is None:
+            return None
+        return max(0.0, exited - started)
+
+
+class _TokenBucket(object):
+    """
+    A token bucket limiting the rate at which jobs are submitted.
+
+    Tokens accumulate at a fixed rate up to a capacity, which bounds the size
+    of a burst of submissions. Each submission takes a token.
+    """
+    def __init__(self, rate, capacity):
+        """
+        Initializes a new, full TokenBucket.
+
+        :param rate: Tokens added per second.
+        :param capacity: Maximum number of tokens held.
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.time()
+
+    def refill(self):
+        """
+        Add the tokens accumulated since the bucket was last refilled.
+
+        :returns: The number of whole tokens available.
+        """
+        now = time.time()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return int(self.tokens)
+
+    def take(self, count=1):
+        """
+        Remove tokens from the bucket.
+
+        :param count: Number of tokens to remove.
+        """
+        self.tokens = max(0.0, self.tokens - count)
+
+    def drain(self):
+        """Remove all tokens so that submissions pause to refill."""
+        self.tokens = 0.0
 
 
 class ExecutionGraph(DAG):
@@ -58,17 +371,22 @@ class ExecutionGraph(DAG):
     workflow in some fashion or additional monitoring is needed, this class is
     where that would go.
     """
-    def __init__(self, submission_attempts=1):
+    def __init__(self, submission_attempts=1, submission_workers=8):
         """
         Initializes a new instance of an ExecutionGraph.
 
         :param submission_attempts: Number of attempted submissions before
         marking a step as failed.
+        :param submission_workers: Maximum number of scheduled steps to
+        submit concurrently.
         """
         super(ExecutionGraph, self).__init__()
         # Member variables for execution.
         self._adapter = None
         self._description = {}
+        # Settings for an optional StateBackend and the (unpickled) instance.
+        self._state_backend = None
+        self._state_store = None
 
         # Sets to track progress.
         self.completed_steps = set([SOURCE])
@@ -78,8 +396,60 @@ class ExecutionGraph(DAG):
         # Values for management of the DAG. Things like submission attempts,
         # throttling, etc. should be listed here.
         self._submission_attempts = submission_attempts
+        self._submission_workers = submission_workers
+        # Throttling of submissions, see set_throttle.
+        self._throttle = {
+            "max_in_flight": 0,
+            "submit_rate": 0,
+            "burst": 0,
+            "rejection_retries": 0,
+            "retry_delay": 60,
+        }
+        self._bucket = None
+        # Steps waiting to be submitted as a heap of (-priority, sequence,
+        # name, restart) entries, and the time each may be submitted after.
+        self._submit_queue = []
+        self._queue_seq = 0
+        self._not_before = {}
+        self._prioritizer = PRIORITIZERS[0]
+        # Resubmission of failed steps, see set_retry_policy.
+        self._retry = {
+            "hwfailure_retries": 3,
+            "hwfailure_delay": 60,
+            "timeout_delay": 0,
+            "submission_delay": 5,
+            "backoff": 2.0,
+            "max_delay": 3600,
+            "jitter": 0.1,
+            "exclude_nodes": True,
+        }
+        # Observed runtimes of finished steps as [total, count] per abstract
+        # step, used to estimate the runtime of steps yet to run.
+        self._runtimes = {}
+        # Settings for an optional RuntimeHistory and the (unpickled)
+        # instance.
+        self._history = None
+        self._history_store = None
+        # Counters describing the most recent call to execute_ready_steps.
+        self._tick_summary = OrderedDict()
+        # Number of bundles submitted, used to name them.
+        self._num_bundles = 0
+        # Directory scheduled steps write their markers to (see markers).
+        self._marker_dir = None
+
+    @property
+    def tick_summary(self):
+        """
+        Return counters describing the most recent execution tick.
+
+        :returns: An OrderedDict of counters (for example, the number of
+        steps 'finished', 'submitted', and 'scheduled') from the most recent
+        call to execute_ready_steps.
+        """
+        return self._tick_summary
 
-    def add_step(self, name, step, workspace, restart_limit):
+    def add_step(self, name, step, workspace, restart_limit,
+                 abstract_name=None):
         """
         Add a StepRecord to the ExecutionGraph.
 
@@ -87,12 +457,15 @@ class ExecutionGraph(DAG):
         :param step: StudyStep instance to be recorded.
         :param workspace: Directory path for the step's working directory.
         :param restart_limit: Upper limit on the number of restart attempts.
+        :param abstract_name: Name of the abstract step that the step was
+        expanded from (defaults to name).
         """
         data = {
                     "step": step,
                     "state": State.INITIALIZED,
                     "workspace": workspace,
-                    "restart_limit": restart_limit
+                    "restart_limit": restart_limit,
+                    "abstract_name": abstract_name or name
                 }
         record = _StepRecord(**data)
         super(ExecutionGraph, self).add_node(name, record)
@@ -122,6 +495,492 @@ class ExecutionGraph(DAG):
 
         self._adapter = adapter
 
+    def set_throttle(self, max_in_flight=0, submit_rate=0, burst=0,
+                     rejection_retries=0, retry_delay=60):
+        """
+        Limit how quickly steps are handed to the scheduler.
+
+        Steps that are ready to run are queued and submitted in priority order
+        as the limits allow. Steps executed locally are not limited.
+
+        :param max_in_flight: Maximum number of scheduled steps that are
+        submitted and unfinished at once (0 for no limit).
+        :param submit_rate: Maximum submissions per second on average (0 for
+        no limit).
+        :param burst: Maximum number of submissions at once when limiting the
+        rate (defaults to the larger of 1 and submit_rate).
+        :param rejection_retries: Number of times a step whose submission was
+        rejected is queued again before it is marked as failed.
+        :param retry_delay: Seconds before the first resubmission of a
+        rejected step, doubled for every rejection after it.
+        """
+        if max_in_flight < 0 or submit_rate < 0 or burst < 0 or \
+                rejection_retries < 0 or retry_delay < 0:
+            msg = "Throttle settings must not be negative."
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self._throttle = {
+            "max_in_flight": int(max_in_flight),
+            "submit_rate": float(submit_rate),
+            "burst": int(burst),
+            "rejection_retries": int(rejection_retries),
+            "retry_delay": float(retry_delay),
+        }
+        if submit_rate:
+            capacity = burst or max(1, submit_rate)
+            self._bucket = _TokenBucket(submit_rate, capacity)
+        else:
+            self._bucket = None
+
+    def set_retry_policy(self, hwfailure_retries=3, hwfailure_delay=60,
+                         timeout_delay=0, submission_delay=5, backoff=2.0,
+                         max_delay=3600, jitter=0.1, exclude_nodes=True):
+        """
+        Set how steps are resubmitted after they fail.
+
+        Each failure class has a base delay, multiplied by backoff for every
+        retry of the same class after the first and capped at max_delay.
+        Retried steps wait in the submission queue without holding up other
+        steps. Timed out steps are restarted up to their restart limit, and
+        submissions are attempted up to the graph's submission attempts (and
+        its throttle's rejection retries). A step can set 'hwfailure_retries'
+        in its run block to override the graph's limit.
+
+        :param hwfailure_retries: Number of times a step is resubmitted after
+        a hardware failure before it is marked as failed.
+        :param hwfailure_delay: Seconds before resubmitting a step after its
+        first hardware failure.
+        :param timeout_delay: Seconds before restarting a step after its first
+        timeout.
+        :param submission_delay: Seconds before the second attempt to submit a
+        step whose submission failed.
+        :param backoff: Factor the delay grows by with every retry.
+        :param max_delay: Maximum seconds before any retry.
+        :param jitter: Fraction of the delay it is randomly varied by, so that
+        steps that failed together are not resubmitted together.
+        :param exclude_nodes: True to exclude the nodes a step was running on
+        when resubmitting it after a hardware failure (if the scheduler
+        reports them).
+        """
+        if hwfailure_retries < 0 or hwfailure_delay < 0 or \
+                timeout_delay < 0 or submission_delay < 0 or backoff < 1 or \
+                max_delay < 0 or not 0 <= jitter <= 1:
+            msg = "Retry delays and limits must not be negative, backoff " \
+                  "must be at least 1, and jitter between 0 and 1."
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self._retry = {
+            "hwfailure_retries": int(hwfailure_retries),
+            "hwfailure_delay": float(hwfailure_delay),
+            "timeout_delay": float(timeout_delay),
+            "submission_delay": float(submission_delay),
+            "backoff": float(backoff),
+            "max_delay": float(max_delay),
+            "jitter": float(jitter),
+            "exclude_nodes": bool(exclude_nodes),
+        }
+
+    def _get_retry_delay(self, delay, attempt):
+        """
+        Compute the seconds before a retry under the retry policy.
+
+        :param delay: Base delay of the failure class in seconds.
+        :param attempt: The number of the retry (1 for the first).
+        :returns: The delay in seconds, with backoff and jitter applied.
+        """
+        if not delay:
+            return 0
+        delay = min(self._retry["max_delay"],
+                    delay * self._retry["backoff"] ** (attempt - 1))
+        jitter = self._retry["jitter"]
+        return delay * random.uniform(1 - jitter, 1 + jitter)
+
+    def _exclude_nodes(self, names):
+        """
+        Exclude the nodes steps' latest jobs ran on from their resubmissions.
+
+        The nodes of every job are looked up in one query per adapter. If the
+        query fails the steps are resubmitted without excluding any nodes.
+
+        :param names: A list of the names of the steps to be resubmitted.
+        """
+        if not self._retry["exclude_nodes"]:
+            return
+
+        jobs = defaultdict(dict)  # Jobs to step names, by adapter type.
+        for name in names:
+            record = self.values[name]
+            if record.jobid:
+                jobs[record.to_be_scheduled][str(record.jobid[-1])] = name
+
+        for scheduled, jobmap in jobs.items():
+            adapter = self._get_adapter(scheduled)
+            for jobid, nodes in adapter.get_job_nodes(list(jobmap)).items():
+                name = jobmap.get(jobid)
+                if name is None or not nodes:
+                    continue
+
+                record = self.values[name]
+                excluded = record.step.run.get("exclude")
+                excluded = set(_split_hostlist(excluded or ""))
+                for hostlist in nodes:
+                    excluded.update(_split_hostlist(hostlist))
+                record.step.run["exclude"] = ",".join(sorted(excluded))
+                logger.info("Excluding nodes %s from resubmissions of '%s'.",
+                            record.step.run["exclude"], name)
+
+    def set_prioritizer(self, prioritizer):
+        """
+        Set the order in which queued steps are submitted.
+
+        :param prioritizer: Name of the ordering (one of PRIORITIZERS).
+        """
+        if prioritizer not in PRIORITIZERS:
+            msg = "'{}' is not a valid prioritizer. Expected one of {}." \
+                  .format(prioritizer, ", ".join(PRIORITIZERS))
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self._prioritizer = prioritizer
+        self._prioritize()
+
+    def _prioritize(self):
+        """Compute the submission priority of every step in the graph."""
+        priorities = dict.fromkeys(self.values, 0)
+        if self._prioritizer == "downstream":
+            # Length of the longest chain of steps starting at each step.
+            for name in reversed(self.topological_sort()):
+                priorities[name] = 1 + max(
+                    [priorities[child] for child in self.adjacency_table[name]]
+                    or [0])
+        elif self._prioritizer == "critical_path":
+            # Estimated runtime of the longest chain of steps starting at
+            # each step.
+            for name in reversed(self.topological_sort()):
+                if name == SOURCE:
+                    continue
+                priorities[name] = \
+                    self._estimate_runtime(self.values[name]) + max(
+                        [priorities[child]
+                         for child in self.adjacency_table[name]] or [0])
+
+        for name, record in self.values.items():
+            if name != SOURCE:
+                record.priority = priorities[name]
+
+        # Reorder anything already waiting, keeping the order of steps of
+        # equal priority and when each may be submitted.
+        queue = []
+        for _, _, name, restart in sorted(self._submit_queue):
+            self._queue_seq += 1
+            queue.append((-self.values[name].priority, self._queue_seq, name,
+                          restart))
+        heapq.heapify(queue)
+        self._submit_queue = queue
+
+    def _estimate_runtime(self, record):
+        """
+        Estimate how long a step will run.
+
+        The estimate is the mean runtime of finished steps expanded from the
+        same abstract step. Without any, the step's walltime is used.
+
+        :param record: The StepRecord of the step.
+        :returns: The estimated runtime in seconds.
+        """
+        observed = self._runtimes.get(record.abstract_name)
+        if observed:
+            return observed[0] / observed[1]
+
+        walltime = parse_walltime(record.step.run.get("walltime"))
+        if walltime:
+            return float(walltime)
+
+        return DEFAULT_RUNTIME
+
+    def _observe_runtime(self, record):
+        """
+        Record the runtime of a finished step.
+
+        :param record: The StepRecord of the finished step.
+        :returns: True if a runtime was recorded, False otherwise.
+        """
+        runtime = record.get_runtime()
+        if runtime is None:
+            return False
+
+        observed = self._runtimes.setdefault(record.abstract_name, [0.0, 0])
+        observed[0] += runtime
+        observed[1] += 1
+        return True
+
+    def _enqueue(self, name, restart=False, delay=0):
+        """
+        Queue a step for submission.
+
+        :param name: The name of the step to be queued.
+        :param restart: True if the step is to be restarted.
+        :param delay: Seconds before the step may be submitted.
+        """
+        record = self.values[name]
+        record.status = State.QUEUED
+        self._queue_seq += 1
+        heapq.heappush(self._submit_queue,
+                       (-record.priority, self._queue_seq, name, restart))
+        if delay:
+            self._not_before[name] = time.time() + delay
+        else:
+            self._not_before.pop(name, None)
+
+    def _dequeue(self, limit=None):
+        """
+        Take the queued steps that can be submitted under the throttle.
+
+        :param limit: Maximum number of scheduled steps to take, in addition
+        to the graph's own throttle (optional).
+        :returns: A list of (name, record, restart) tuples in priority order.
+        """
+        now = time.time()
+        capacity = float("inf") if limit is None else max(0, limit)
+        if self._throttle["max_in_flight"]:
+            capacity = min(capacity, max(0, self._throttle["max_in_flight"] -
+                                         len(self.in_progress)))
+        if self._bucket:
+            capacity = min(capacity, self._bucket.refill())
+
+        selected = []
+        deferred = []
+        num_scheduled = 0
+        has_local = None
+        while self._submit_queue:
+            if num_scheduled >= capacity:
+                # Only steps executed locally can still be taken, which are
+                # not throttled.
+                if has_local is None:
+                    has_local = any(not self.values[entry[2]].to_be_scheduled
+                                    for entry in self._submit_queue)
+                if not has_local:
+                    break
+
+            entry = heapq.heappop(self._submit_queue)
+            name, restart = entry[2], entry[3]
+            record = self.values[name]
+            if name in self.failed_steps:
+                continue
+            if self._not_before.get(name, 0) > now or \
+                    (record.to_be_scheduled and num_scheduled >= capacity):
+                deferred.append(entry)
+                continue
+
+            self._not_before.pop(name, None)
+            selected.append((name, record, restart))
+            if record.to_be_scheduled:
+                num_scheduled += 1
+
+        for entry in deferred:
+            heapq.heappush(self._submit_queue, entry)
+
+        if self._bucket:
+            self._bucket.take(num_scheduled)
+
+        return selected
+
+    def set_state_backend(self, backend):
+        """
+        Set the backend used to store queryable study state.
+
+        :param backend: A dictionary of backend settings containing the
+        'type' of backend and any settings the backend requires.
+        """
+        if not backend:
+            self._state_backend = None
+            self._state_store = None
+            return
+
+        if not isinstance(backend, dict):
+            msg = "State backend settings must be contained in a dictionary."
+            logger.error(msg)
+            raise TypeError(msg)
+
+        if backend["type"] not in StateBackendFactory.get_valid_backends():
+            msg = "'{}' backend must be specfied in StateBackendFactory." \
+                  .format(backend)
+            logger.error(msg)
+            raise TypeError(msg)
+
+        self._state_backend = backend
+        self._state_store = None
+
+    def set_runtime_history(self, path, percentile=0.95, margin=0.2,
+                            min_samples=3):
+        """
+        Set the store of step runtimes used to predict walltimes.
+
+        The runtimes of finished steps are recorded in the store. Steps that
+        set 'auto_walltime' in their run block are given a walltime predicted
+        from the runtimes recorded for them, limited to the walltime the step
+        specifies (if any).
+
+        :param path: Path to the runtime history database (None to disable).
+        :param percentile: Fraction of recorded runtimes a predicted walltime
+        should cover.
+        :param margin: Fraction of the percentile added as a safety margin.
+        :param min_samples: Fewest recorded runtimes a prediction is based on.
+        """
+        if not path:
+            self._history = None
+            self._history_store = None
+            return
+
+        if not 0 < percentile <= 1 or margin < 0 or min_samples < 1:
+            msg = "Runtime history settings are out of range (percentile " \
+                  "{}, margin {}, min_samples {})." \
+                  .format(percentile, margin, min_samples)
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self._history = {
+            "path": path,
+            "percentile": float(percentile),
+            "margin": float(margin),
+            "min_samples": int(min_samples),
+        }
+        self._history_store = None
+
+    def set_marker_dir(self, path):
+        """
+        Set the directory scheduled steps write their markers to.
+
+        Scripts generated afterwards write a marker when they start and when
+        they exit. Steps that exited are then found with a single scan of the
+        directory each tick rather than by querying the scheduler, which may
+        report a job that failed as finished or forget it once it ends.
+
+        :param path: Path to the marker directory (None to disable).
+        """
+        if path and not os.path.exists(path):
+            os.makedirs(path)
+        self._marker_dir = path
+
+    def _get_history(self):
+        """
+        Return the RuntimeHistory instance, opening it if needed.
+
+        :returns: A RuntimeHistory, or None if no history is set.
+        """
+        if not self._history:
+            return None
+
+        if self._history_store is None:
+            self._history_store = RuntimeHistory(self._history["path"])
+
+        return self._history_store
+
+    def _history_key(self, name, record):
+        """
+        Return the key a step's runtimes are recorded under.
+
+        Parameterized steps are named after their abstract step followed by
+        the labels of the parameters they use, so the labels identify the
+        parameter values of the step.
+
+        :param name: The name of the step.
+        :param record: The StepRecord of the step.
+        :returns: A (study, abstract step, parameter labels) tuple.
+        """
+        params = name[len(record.abstract_name) + 1:] \
+            if name != record.abstract_name else ""
+        return (self.name, record.abstract_name, params)
+
+    def _predict_walltimes(self):
+        """Set predicted walltimes for the steps that request them."""
+        history = self._get_history()
+        if history is None:
+            return
+
+        num_predicted = 0
+        for name, record in self.values.items():
+            if name == SOURCE or not record.step.run.get("auto_walltime"):
+                continue
+
+            study, step, params = self._history_key(name, record)
+            walltime = history.predict_walltime(
+                study, step, params,
+                percentile=self._history["percentile"],
+                margin=self._history["margin"],
+                min_samples=self._history["min_samples"])
+            if walltime is None:
+                logger.debug("Too few runtimes recorded to predict the "
+                             "walltime of '%s'.", name)
+                continue
+
+            # Never ask for more time than the step specifies.
+            requested = parse_walltime(record.step.run.get("walltime"))
+            if requested:
+                walltime = min(walltime, requested)
+
+            record.step.run["walltime"] = format_walltime(walltime)
+            num_predicted += 1
+
+        logger.info("Predicted walltimes for %d steps from %s.",
+                    num_predicted, self._history["path"])
+
+    def _record_runtimes(self, names):
+        """
+        Record the runtimes of finished steps in the runtime history.
+
+        Steps that were restarted ran as several jobs, so their runtimes are
+        not recorded.
+
+        :param names: Names of the steps that finished.
+        """
+        history = self._get_history()
+        if history is None or not names:
+            return
+
+        runtimes = []
+        for name in names:
+            record = self.values[name]
+            runtime = record.get_runtime()
+            if runtime is not None and not record.num_restarts:
+                runtimes.append(self._history_key(name, record) + (runtime,))
+
+        history.record(runtimes)
+
+    def sync_state(self):
+        """
+        Update the state backend (if one is set) with the graph's state.
+
+        The first sync from a process also records the graph's structure.
+        """
+        if not self._state_backend:
+            return
+
+        if self._state_store is None:
+            settings = dict(self._state_backend)
+            backend = StateBackendFactory.get_backend(settings.pop("type"))
+            self._state_store = backend(**settings)
+            self._state_store.initialize(self)
+
+        self._state_store.update(self)
+
+    def __getstate__(self):
+        """
+        Return the picklable state of the ExecutionGraph.
+
+        Open connections to a state backend or runtime history cannot be
+        pickled, so their instances are dropped and recreated from their
+        settings when needed.
+
+        :returns: A dictionary of the instance's attributes.
+        """
+        state = self.__dict__.copy()
+        state["_state_store"] = None
+        state["_history_store"] = None
+        return state
+
     def add_description(self, name, description):
         """
         Add a study description to the ExecutionGraph instance.
@@ -132,6 +991,106 @@ class ExecutionGraph(DAG):
         self._description["name"] = name
         self._description["description"] = description
 
+    def partition(self, num_shards):
+        """
+        Partition the graph into shards that share no edges.
+
+        Steps connected by dependencies (other than on the source node) are
+        always placed in the same shard, so that each shard can be conducted
+        on its own. The connected groups of steps are assigned in order to
+        shards of about equal size, so a shard covers a contiguous range of
+        the study's combinations. Each shard copies the settings of the graph
+        except for the state backend, whose path must differ per shard, and
+        the throttle limits are divided between the shards.
+
+        :param num_shards: Number of shards to partition the graph into.
+        :returns: A list of ExecutionGraphs. There are fewer than num_shards
+        if the graph has fewer independent groups of steps.
+        """
+        # Find the connected groups of steps in order of their first step.
+        parents = self.get_parents()
+        group = {}
+        sizes = []
+        for name in self.values:
+            if name == SOURCE or name in group:
+                continue
+
+            index = len(sizes)
+            group[name] = index
+            pending = [name]
+            size = 0
+            while pending:
+                node = pending.pop()
+                size += 1
+                for other in self.adjacency_table[node] + parents[node]:
+                    if other != SOURCE and other not in group:
+                        group[other] = index
+                        pending.append(other)
+            sizes.append(size)
+
+        # Assign each group to a shard by where it starts in the graph.
+        num_shards = max(1, min(num_shards, len(sizes)))
+        total = float(max(1, sum(sizes)))
+        shard_of = []
+        assigned = 0
+        for size in sizes:
+            shard_of.append(min(num_shards - 1,
+                                int(assigned * num_shards / total)))
+            assigned += size
+        # Large groups can leave shards empty, so number the used ones.
+        used = sorted(set(shard_of))
+        shard_of = [used.index(shard) for shard in shard_of]
+        num_shards = len(used) or 1
+
+        throttle = dict(self._throttle)
+        for key in ("max_in_flight", "burst"):
+            if throttle[key]:
+                throttle[key] = max(1, throttle[key] // num_shards)
+        throttle["submit_rate"] /= num_shards
+
+        shards = []
+        for index in range(num_shards):
+            shard = ExecutionGraph(self._submission_attempts,
+                                   self._submission_workers)
+            shard.add_description(**self._description)
+            shard._adapter = dict(self._adapter) if self._adapter else None
+            shard._history = dict(self._history) if self._history else None
+            shard._marker_dir = self._marker_dir
+            shard._prioritizer = self._prioritizer
+            shard._runtimes = {key: list(value)
+                               for key, value in self._runtimes.items()}
+            shard._queue_seq = self._queue_seq
+            shard.set_throttle(**throttle)
+            shard.set_retry_policy(**self._retry)
+            shard.values[SOURCE] = self.values[SOURCE]
+            shard.adjacency_table[SOURCE] = []
+            shards.append(shard)
+
+        for name, record in self.values.items():
+            if name == SOURCE:
+                continue
+
+            shard = shards[shard_of[group[name]]]
+            shard.values[name] = record
+            shard.adjacency_table[name] = list(self.adjacency_table[name])
+            if name in self.adjacency_table[SOURCE]:
+                shard.adjacency_table[SOURCE].append(name)
+            for steps in ("completed_steps", "in_progress", "failed_steps"):
+                if name in getattr(self, steps):
+                    getattr(shard, steps).add(name)
+            if name in self._not_before:
+                shard._not_before[name] = self._not_before[name]
+
+        for entry in self._submit_queue:
+            shards[shard_of[group[entry[2]]]]._submit_queue.append(entry)
+        for shard in shards:
+            heapq.heapify(shard._submit_queue)
+
+        logger.info("Partitioned '%s' into %d shards of %s steps.",
+                    self.name, num_shards,
+                    ", ".join(str(len(shard.values) - 1) for shard in shards))
+        return shards
+
     @classmethod
     def unpickle(cls, path):
         """
@@ -167,6 +1126,79 @@ class ExecutionGraph(DAG):
         with open(path, 'wb') as pkl:
             pickle.dump(self, pkl)
 
+    def write_status(self, path):
+        """
+        Write a compact status index of the graph's steps.
+
+        The index holds one line per step with the step's state, most recent
+        job identifier, number of restarts, and the time of its last state
+        change. It is written to a temporary file and renamed into place so
+        readers never see a partially written index and never need to load
+        the full ExecutionGraph. The index is given the permissions of any
+        other file the process creates, so it is as readable as the pickle.
+
+        :param path: The path to write the status index to.
+        """
+        lines = ["# {}".format(STATUS_DELIMITER.join(STATUS_FIELDS))]
+        for key, record in self.values.items():
+            if key == SOURCE:
+                continue
+
+            jobid = record.jobid[-1] if record.jobid else ""
+            updated = getattr(record, "last_updated", None) or ""
+            lines.append(STATUS_DELIMITER.join([
+                key, _get_record_status(record).name, str(jobid),
+                str(record.num_restarts), str(updated)]))
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or None,
+                                        suffix=".tmp")
+        with os.fdopen(fd, 'w') as status:
+            status.write("\n".join(lines))
+            status.write("\n")
+        # mkstemp creates the file readable by its owner only.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.rename(tmp_path, path)
+
+    @staticmethod
+    def read_status(path):
+        """
+        Read a status index written by an ExecutionGraph.
+
+        :param path: Path to a status index file.
+        :returns: An OrderedDict mapping step names to a dictionary of the
+        step's 'state', 'jobid', 'restarts', and 'updated' values.
+        """
+        status = OrderedDict()
+        with open(path, 'r') as index:
+            for line in index:
+                if line.startswith("#") or not line.strip():
+                    continue
+
+                name, state, jobid, restarts, updated = \
+                    line.rstrip("\n").split(STATUS_DELIMITER)
+                status[name] = {
+                    "state": getattr(State, state, State.UNKNOWN),
+                    "jobid": jobid,
+                    "restarts": int(restarts),
+                    "updated":
+                        datetime.fromtimestamp(float(updated))
+                        if updated else None,
+                }
+
+        return status
+
+    @property
+    def marker_dir(self):
+        """
+        Return the directory scheduled steps write their markers to.
+
+        :returns: The path to the marker directory, or None if markers are
+        not written.
+        """
+        return self._marker_dir
+
     @property
     def name(self):
         """
@@ -210,7 +1242,8 @@ class ExecutionGraph(DAG):
         The generate_scripts method scans the ExecutionGraph instance and uses
         the stored adapter to write executable scripts for either local or
         scheduled execution. If a restart command is specified, a restart
-        script will be generated for that record.
+        script will be generated for that record. Steps that request it are
+        given a walltime predicted from the runtime history (if one is set).
         """
         # An adapter must be specified
         if not self._adapter:
@@ -219,36 +1252,37 @@ class ExecutionGraph(DAG):
             logger.error(msg)
             raise ValueError(msg)
 
+        logger.info("Generating scripts...")
+        adapter = ScriptAdapterFactory.get_adapter(self._adapter["type"])
+        adapter = adapter(**self._adapter)
+        adapter.set_marker_dir(self._marker_dir)
+        self._predict_walltimes()
+        debug = logger.isEnabledFor(logging.DEBUG)
         for key, record in self.values.items():
             if key == SOURCE:
                 continue
 
-            logger.info("Generating scripts...")
-            adapter = ScriptAdapterFactory.get_adapter(self._adapter["type"])
-            adapter = adapter(**self._adapter)
             to_be_scheduled, cmd_script, restart_script = \
                 adapter.write_script(record.workspace, record.step)
-            logger.info("Step -- %s\nScript: %s\nRestart: %s\nScheduled?: %s",
-                        record.step.name, cmd_script, restart_script,
-                        to_be_scheduled)
+            if debug:
+                logger.debug("Step -- %s\nScript: %s\nRestart: %s\n"
+                             "Scheduled?: %s", record.step.name, cmd_script,
+                             restart_script, to_be_scheduled)
             record.to_be_scheduled = to_be_scheduled
             record.script = cmd_script
             record.restart_script = restart_script
 
-    def _execute_record(self, name, record, restart=False):
+    def _get_adapter(self, scheduled=True):
         """
-        Execute a StepRecord.
+        Instantiate the adapter used to submit records.
 
-        :param name: The name of the step to be executed.
-        :param record: An instance of a _StepRecord class.
-        :param restart: True if the record needs restarting, False otherwise.
+        :param scheduled: True for the adapter the graph was configured with,
+        False for the adapter that executes unscheduled steps locally.
+        :returns: An instance of a ScriptAdapter.
         """
-        num_restarts = 0    # Times this step has temporally restarted.
-        retcode = None      # Execution return code.
-
         # If we want to schedule the execution of the record, grab the
         # scheduler adapter from the ScriptAdapterFactory.
-        if record.to_be_scheduled:
+        if scheduled:
             adapter = \
                 ScriptAdapterFactory.get_adapter(self._adapter["type"])
         else:
@@ -257,44 +1291,93 @@ class ExecutionGraph(DAG):
                 ScriptAdapterFactory.get_adapter("local")
 
         # Pass the adapter the settings we've stored.
-        adapter = adapter(**self._adapter)
+        return adapter(**self._adapter)
 
-        # While our submission needs to be submitted, keep trying:
-        # 1. If the JobStatus is not OK.
-        # 2. num_restarts is less than self._submission_attempts
-        while retcode != SubmissionCode.OK and \
-                num_restarts < self._submission_attempts:
-            logger.info("Attempting submission of '%s' (attempt %d of %d)...",
-                        name, num_restarts + 1, self._submission_attempts)
-
-            # If not a restart, submit the cmd script.
-            if not restart:
-                retcode, jobid = adapter.submit(
-                    record.step,
-                    record.script,
-                    record.workspace)
-            # Otherwise, it's a restart.
-            else:
-                # If the restart is specified, use the record restart script.
-                retcode, jobid = adapter.submit(
-                    record.step,
-                    record.restart_script,
-                    record.workspace)
+    def _submit_record(self, adapter, name, record, restart=False):
+        """
+        Submit a StepRecord using an adapter without modifying the graph.
+
+        Submission only reads from the record, so records can be submitted
+        concurrently. The results are applied with _apply_submission.
 
-            # Increment the number of restarts we've attempted.
-            num_restarts += 1
+        :param adapter: The ScriptAdapter instance to submit with.
+        :param name: The name of the step to be executed.
+        :param record: An instance of a _StepRecord class.
+        :param restart: True if the record needs restarting, False otherwise.
+        :returns: The SubmissionCode of the attempt and the job identifier
+        returned by the adapter.
+        """
+        if self._marker_dir:
+            clear_markers(self._marker_dir, name)
+
+        # Failed attempts are queued again by _apply_submission rather than
+        # retried here, so that retries back off without blocking the tick.
+        logger.debug("Attempting submission of '%s' (attempt %d of %d)...",
+                     name, record.submit_failures + 1,
+                     self._submission_attempts)
+
+        # If not a restart, submit the cmd script.
+        if not restart:
+            return adapter.submit(
+                record.step,
+                record.script,
+                record.workspace)
+        # Otherwise, it's a restart.
+        else:
+            # If the restart is specified, use the record restart script.
+            return adapter.submit(
+                record.step,
+                record.restart_script,
+                record.workspace)
+
+    def _apply_submission(self, name, record, retcode, jobid,
+                          restart=False):
+        """
+        Update the graph with the outcome of submitting a StepRecord.
 
+        :param name: The name of the step that was submitted.
+        :param record: An instance of a _StepRecord class.
+        :param retcode: The SubmissionCode returned by the submission.
+        :param jobid: The job identifier returned by the submission.
+        :param restart: True if the submission was a restart.
+        """
         if retcode == SubmissionCode.OK:
-            logger.info("'%s' submitted with identifier '%s'", name, jobid)
+            logger.debug("'%s' submitted with identifier '%s'", name, jobid)
+            record.mark("SUBMITTED")
             record.status = State.PENDING
             record.jobid.append(jobid)
+            record.submit_failures = 0
             self.in_progress.add(name)
 
             # Executed locally, so if we executed OK -- Finished.
             if record.to_be_scheduled is False:
                 self.completed_steps.add(name)
                 self.in_progress.remove(name)
-                record.state = State.FINISHED
+                record.status = State.FINISHED
+        elif record.submit_failures + 1 < self._submission_attempts:
+            # Attempt the submission again once the retry delay has passed.
+            record.submit_failures += 1
+            delay = self._get_retry_delay(self._retry["submission_delay"],
+                                          record.submit_failures)
+            logger.warning("Submission of '%s' failed (attempt %d of %d). "
+                           "Queueing it again in %.1fs.", name,
+                           record.submit_failures, self._submission_attempts,
+                           delay)
+            self._enqueue(name, restart, delay)
+        elif record.rejections < self._throttle["rejection_retries"]:
+            # The scheduler refused the job, back off and queue it again.
+            record.submit_failures = 0
+            record.rejections += 1
+            delay = self._get_retry_delay(self._throttle["retry_delay"],
+                                          record.rejections)
+            logger.warning("Submission of '%s' was rejected (%d of %d). "
+                           "Queueing it again in %.1fs.", name,
+                           record.rejections,
+                           self._throttle["rejection_retries"], delay)
+            self._enqueue(name, restart, delay)
+            # Ease off the scheduler until the bucket refills.
+            if self._bucket:
+                self._bucket.drain()
         else:
             # Find the subtree, because anything dependent on this step now
             # failed.
@@ -305,7 +1388,213 @@ class ExecutionGraph(DAG):
                 self.failed_steps.add(node)
                 self.values[node].status = State.FAILED
 
-    def execute_ready_steps(self):
+    def _execute_record(self, name, record, restart=False):
+        """
+        Execute a StepRecord.
+
+        :param name: The name of the step to be executed.
+        :param record: An instance of a _StepRecord class.
+        :param restart: True if the record needs restarting, False otherwise.
+        """
+        adapter = self._get_adapter(record.to_be_scheduled)
+        retcode, jobid = self._submit_record(adapter, name, record, restart)
+        self._apply_submission(name, record, retcode, jobid, restart)
+
+    def _is_chained(self, record):
+        """
+        Determine if the next restart of a record is to be chained.
+
+        A step that sets 'chain_restart' in its run block and has a restart
+        command has its restart submitted along with each of its jobs, to
+        start as soon as the job ends unsuccessfully (for example, at its
+        walltime) rather than once the conductor sees it timed out.
+
+        :param record: An instance of a _StepRecord class.
+        :returns: True if a restart is to be chained to the record's job.
+        """
+        return bool(record.to_be_scheduled and record.restart_script and
+                    record.step.run.get("chain_restart") and
+                    record.num_restarts < record.restart_limit)
+
+    def _chain_record(self, adapter, name, record, jobid):
+        """
+        Submit the restart of a StepRecord to follow one of its jobs.
+
+        :param adapter: The ScriptAdapter instance to submit with.
+        :param name: The name of the step.
+        :param record: An instance of a _StepRecord class.
+        :param jobid: Identifier of the job the restart is to follow.
+        :returns: The identifier of the restart job, None if it could not be
+        submitted.
+        """
+        retcode, chained = adapter.submit_after(
+            record.step, record.restart_script, record.workspace, jobid)
+        if retcode == SubmissionCode.OK:
+            logger.debug("Chained restart job %s of '%s' to job %s.",
+                         chained, name, jobid)
+            return chained
+
+        logger.warning("Unable to chain the restart of '%s' to job %s. It "
+                       "will be restarted once it is seen to time out.",
+                       name, jobid)
+        return None
+
+    def _chain_records(self, names):
+        """
+        Chain the next restart of steps to their latest jobs.
+
+        :param names: A list of the names of the steps to chain restarts for.
+        """
+        adapter = self._get_adapter(True)
+
+        def chain(name):
+            record = self.values[name]
+            return self._chain_record(adapter, name, record, record.jobid[-1])
+
+        runner = CommandRunner(max_workers=self._submission_workers)
+        for name, chained in zip(names, runner.map(chain, names)):
+            self.values[name].chained = chained
+
+    def _make_bundles(self, records):
+        """
+        Group scheduled records into the jobs they are submitted as.
+
+        Records whose step sets 'bundle' in its run block are bundled with
+        records of the same abstract step and resource shape (nodes and
+        procs). The value of 'bundle' is the most steps in a bundle (or True
+        for no limit). Bundles run their steps one after another up to a
+        total walltime of 'bundle_walltime' (if set), or all at once if
+        'bundle_parallel' is set. Restarts are never bundled.
+
+        :param records: A list of (name, record, restart) tuples of scheduled
+        records in priority order.
+        :returns: A list of (bundle name, walltime, parallel, members) tuples,
+        where members is a list of (name, record, restart) tuples. Records
+        submitted on their own have a bundle name of None.
+        """
+        jobs = []
+        groups = OrderedDict()
+        for item in records:
+            run = item[1].step.run
+            if not run.get("bundle") or item[2]:
+                jobs.append((None, None, False, [item]))
+                continue
+
+            shape = (item[1].abstract_name, str(run.get("nodes")),
+                     str(run.get("procs")), bool(run.get("bundle_parallel")))
+            groups.setdefault(shape, []).append(item)
+
+        for shape, items in groups.items():
+            run = items[0][1].step.run
+            parallel = shape[-1]
+            size = None if run["bundle"] is True else int(run["bundle"])
+            target = parse_walltime(run.get("bundle_walltime"))
+
+            bundles = [[]]
+            total = 0
+            for item in items:
+                walltime = parse_walltime(item[1].step.run.get("walltime"))
+                full = size and len(bundles[-1]) >= size
+                if not parallel and target and walltime:
+                    full = full or total + walltime > target
+                if bundles[-1] and full:
+                    bundles.append([])
+                    total = 0
+                bundles[-1].append(item)
+                total += walltime or 0
+
+            for members in bundles:
+                if len(members) == 1:
+                    jobs.append((None, None, False, members))
+                    continue
+
+                walltimes = [parse_walltime(item[1].step.run.get("walltime"))
+                             for item in members]
+                if None in walltimes:
+                    walltime = format_walltime(target) if target else ""
+                elif parallel:
+                    walltime = format_walltime(max(walltimes))
+                else:
+                    walltime = format_walltime(sum(walltimes))
+
+                self._num_bundles += 1
+                name = "bundle_{}_{}".format(shape[0], self._num_bundles)
+                jobs.append((name, walltime, parallel, members))
+
+        return jobs
+
+    def _submit_bundle(self, adapter, name, walltime, parallel, members):
+        """
+        Submit several StepRecords as a single job.
+
+        :param adapter: The ScriptAdapter instance to submit with.
+        :param name: The name of the bundle.
+        :param walltime: The walltime of the bundle job.
+        :param parallel: True to run the steps at once, False to run them
+        one after another.
+        :param members: A list of (name, record, restart) tuples.
+        :returns: The SubmissionCode of the attempt and the job identifier
+        returned by the adapter.
+        """
+        records = [record for _, record, _ in members]
+        workspace = records[0].workspace
+        if self._marker_dir:
+            for member, _, _ in members:
+                clear_markers(self._marker_dir, member)
+        step, path = adapter.write_bundle(
+            workspace, name, [record.step for record in records],
+            [(record.workspace, record.script) for record in records],
+            [adapter.get_marker_path(record.workspace, member)
+             for member, record, _ in members],
+            walltime, parallel)
+        logger.info("Bundled %d steps into '%s'.", len(members), name)
+
+        return adapter.submit(step, path, workspace)
+
+    def _execute_records(self, records):
+        """
+        Execute a collection of StepRecords.
+
+        Scheduled records are submitted concurrently (up to the number of
+        submission workers of the graph) so that the round-trips to the
+        scheduler overlap, with records that opt into bundling submitted in
+        bundles (see _make_bundles). Records executed locally run one at a
+        time. The graph is only updated once all submissions have returned.
+
+        :param records: A list of (name, record, restart) tuples.
+        """
+        scheduled = [item for item in records if item[1].to_be_scheduled]
+        local = [item for item in records if not item[1].to_be_scheduled]
+
+        if scheduled:
+            adapter = self._get_adapter(True)
+            jobs = self._make_bundles(scheduled)
+
+            def submit(job):
+                if job[0] is not None:
+                    return self._submit_bundle(adapter, *job) + (None,)
+                name, record, restart = job[3][0]
+                retcode, jobid = self._submit_record(adapter, name, record,
+                                                     restart)
+                chained = None
+                if retcode == SubmissionCode.OK and self._is_chained(record):
+                    chained = self._chain_record(adapter, name, record, jobid)
+                return retcode, jobid, chained
+
+            runner = CommandRunner(max_workers=self._submission_workers)
+            results = runner.map(submit, jobs)
+            for job, (retcode, jobid, chained) in zip(jobs, results):
+                for name, record, restart in job[3]:
+                    record.bundled = job[0] is not None
+                    record.chained = chained
+                    self._apply_submission(name, record, retcode, jobid,
+                                           restart)
+
+        for name, record, restart in local:
+            self._execute_record(name, record, restart)
+
+    def execute_ready_steps(self, job_status=None, limit=None,
+                            markers_only=False):
         """
         Executes any steps whose dependencies are satisfied.
 
@@ -315,8 +1604,16 @@ class ExecutionGraph(DAG):
                 - Updates the state if changed.
             - Finds steps that are initialized and determines what can be run:
                 - Scans a steps dependencies and stages if all are me.
-                - Executes any steps whose dependencies are met.
-
+                - Queues any steps whose dependencies are met.
+            - Submits queued steps in priority order as the throttle allows.
+
+        :param job_status: The result of a status query already made for the
+        graph's jobs (see check_study_status). If None, the graph's adapter is
+        queried.
+        :param limit: Maximum number of scheduled steps to submit, in addition
+        to the graph's own throttle (optional).
+        :param markers_only: Only resolve steps from their exit markers,
+        without querying the adapter (see check_study_status).
         :returns: True if the study has completed, False otherwise.
         """
         resolved_set = self.completed_steps | self.failed_steps
@@ -326,9 +1623,19 @@ class ExecutionGraph(DAG):
             logging.info("'%s' is complete. Returning.", self.name)
             return True
 
-        ready_steps = {}
-        retcode, job_status = self.check_study_status()
-        logger.debug("Checked status (retcode %s)-- %s", retcode, job_status)
+        # Per step messages are only logged at the DEBUG level, check once
+        # instead of on every step. Each tick is summarized at INFO instead.
+        debug = logger.isEnabledFor(logging.DEBUG)
+        summary = OrderedDict([
+            ("checked", 0), ("finished", 0), ("timedout", 0),
+            ("hwfailure", 0), ("failed", 0), ("ready", 0),
+        ])
+
+        retcode, job_status = self.check_study_status(job_status,
+                                                      markers_only)
+        if debug:
+            logger.debug("Checked status (retcode %s)-- %s",
+                         retcode, job_status)
 
         # For now, if we can't check the status something is wrong.
         # Don't modify the DAG.
@@ -340,26 +1647,69 @@ class ExecutionGraph(DAG):
             # For the status of each currently in progress job, check its
             # state.
             cleanup_steps = set()  # Steps that are in progress showing failed.
+            reprioritize = False  # New runtimes change the critical path.
+            finished_steps = []
+            chain_steps = []  # Steps continuing in a chained restart.
+            hwfailure_steps = []  # Steps resubmitted after lost nodes.
+            cancel_jobs = []  # Chained restarts that must not run.
+            summary["checked"] = len(job_status)
             for name, status in job_status.items():
-                logger.debug("Checking job '%s' with status %s.",
-                             name, status)
+                if debug:
+                    logger.debug("Checking job '%s' with status %s.",
+                                 name, status)
                 record = self.values[name]
+                if record.chained and status in (State.FINISHED, State.FAILED,
+                                                 State.HWFAILURE):
+                    # Only a timed out step continues in its chained restart.
+                    cancel_jobs.append(record.chained)
+                    record.chained = None
+
                 if status == State.FINISHED:
                     # Mark the step complete.
-                    logger.info("Step '%s' marked as finished. Adding to "
-                                "complete set.", name)
+                    if debug:
+                        logger.debug("Step '%s' marked as finished. Adding "
+                                     "to complete set.", name)
+                    summary["finished"] += 1
                     self.completed_steps.add(name)
-                    record.state = State.FINISHED
+                    record.status = State.FINISHED
                     self.in_progress.remove(name)
+                    finished_steps.append(name)
+                    if self._prioritizer == "critical_path":
+                        reprioritize |= self._observe_runtime(record)
 
                 elif status == State.TIMEDOUT:
+                    summary["timedout"] += 1
+                    record.status = status
                     # Execute the restart script.
                     # If a restart script doesn't exist, re-run the command.
                     # If we're under the restart limit, attempt a restart.
-                    if record.num_restarts < record.restart_limit:
-                        logger.info("Step '%s' timedout. Restarting.", name)
-                        self._submit_record(name, record, restart=True)
+                    if record.chained:
+                        # The restart was submitted to follow the job that
+                        # timed out, so it continues the step in its place.
+                        record.num_restarts += 1
+                        logger.info("Step '%s' timedout. Continuing in "
+                                    "chained restart job %s.", name,
+                                    record.chained)
+                        record.jobid.append(record.chained)
+                        record.mark("CHAINED")
+                        record.status = State.PENDING
+                        if self._marker_dir:
+                            # The restart runs under the same name, so the
+                            # markers of the job that timed out would be
+                            # taken for its own.
+                            clear_markers(self._marker_dir, name, (
+                                record.last_event("STARTED"),
+                                record.last_event("EXITED")))
+                        record.chained = None
+                        if self._is_chained(record):
+                            chain_steps.append(name)
+                    elif record.num_restarts < record.restart_limit:
                         record.num_restarts += 1
+                        delay = self._get_retry_delay(
+                            self._retry["timeout_delay"], record.num_restarts)
+                        logger.info("Step '%s' timedout. Restarting.", name)
+                        self.in_progress.remove(name)
+                        self._enqueue(name, restart=True, delay=delay)
                     else:
                         logger.info("'%s' has been restarted %s of %s times. "
                                     "Marking step and all descendents as "
@@ -370,14 +1720,28 @@ class ExecutionGraph(DAG):
                         cleanup_steps.update(self.bfs_subtree(name)[0])
 
                 elif status == State.HWFAILURE:
-                    # TODO: Need to make sure that we do this a finite number
-                    # of times.
-                    # Resubmit the cmd.
-                    logger.warning("Hardware failure detected. Attempting to "
-                                   "resubmit step '%s'.", name)
-                    # We can just let the logic below handle submission with
-                    # everything else.
-                    ready_steps[name] = self.values[name]
+                    summary["hwfailure"] += 1
+                    record.status = status
+                    self.in_progress.remove(name)
+                    hwfailure_retries = record.step.run.get(
+                        "hwfailure_retries", self._retry["hwfailure_retries"])
+                    if record.hwfailures < hwfailure_retries:
+                        # Resubmit the cmd once the retry delay has passed,
+                        # avoiding the nodes that failed if possible.
+                        record.hwfailures += 1
+                        delay = self._get_retry_delay(
+                            self._retry["hwfailure_delay"], record.hwfailures)
+                        logger.warning("Hardware failure detected (%d of %d). "
+                                       "Resubmitting step '%s' in %.1fs.",
+                                       record.hwfailures, hwfailure_retries,
+                                       name, delay)
+                        hwfailure_steps.append(name)
+                        self._enqueue(name, delay=delay)
+                    else:
+                        logger.warning("'%s' has had %d hardware failures. "
+                                       "Marking step and all descendents as "
+                                       "failed.", name, record.hwfailures + 1)
+                        cleanup_steps.update(self.bfs_subtree(name)[0])
 
                 elif status == State.FAILED:
                     logger.warning(
@@ -385,76 +1749,234 @@ class ExecutionGraph(DAG):
                         "dependent jobs as failed.",
                         name
                     )
+                    summary["failed"] += 1
                     self.in_progress.remove(name)
                     cleanup_steps.update(self.bfs_subtree(name)[0])
 
+                elif status == State.INITIALIZED:
+                    # The step's bundle ended before the step started.
+                    logger.info("Bundle of step '%s' ended before it ran. "
+                                "Queueing it again.", name)
+                    self.in_progress.remove(name)
+                    self._enqueue(name)
+
+                elif status is not None:
+                    # The step is still in flight, track its latest state.
+                    record.status = status
+
             # Let's handle all the failed steps in one go.
             for node in cleanup_steps:
                 self.failed_steps.add(node)
                 self.values[node].status = State.FAILED
 
+            if cancel_jobs:
+                logger.info("Cancelling %d chained restarts that are no "
+                            "longer needed.", len(cancel_jobs))
+                self._get_adapter(True).cancel(cancel_jobs)
+            if chain_steps:
+                self._chain_records(chain_steps)
+            if hwfailure_steps:
+                self._exclude_nodes(hwfailure_steps)
+
+            self._record_runtimes(finished_steps)
+
+            # Re-estimate the critical path with the runtimes just observed.
+            if reprioritize:
+                self._prioritize()
+
         # Now that we've checked the statuses of existing jobs we need to make
         # sure dependencies haven't been met.
         for key, record in self.values.items():
             # A completed step by definition has had its dependencies met.
             # Skip it.
             if key in self.completed_steps:
-                logger.debug("'%s' in completed set, skipping.", key)
                 continue
 
-            logger.debug("Checking %s -- %s", key, record.jobid)
             # If the record is only INITIALIZED, we have encountered a step
             # that needs consideration.
             if record.status == State.INITIALIZED:
-                logger.debug("'%s' found to be initialized. Checking "
-                             "dependencies...", key)
                 # Count the number of its dependencies have finised.
                 num_finished = 0
                 for dependency in record.step.run["depends"]:
-                    logger.debug("Checking '%s'...", dependency)
                     if dependency in self.completed_steps:
-                        logger.debug("Found in completed steps.")
                         num_finished += 1
+                if debug:
+                    logger.debug("'%s' initialized with %d of %d "
+                                 "dependencies finished.", key, num_finished,
+                                 len(record.step.run["depends"]))
                 # If the total number of dependencies finished is the same
                 # as the number of dependencies the step has, it's ready to
                 # be executed. Add it to the map.
                 if num_finished == len(record.step.run["depends"]):
-                    logger.debug("All dependencies completed. Staging.")
-                    ready_steps[key] = record
-
-        # We now have a collection of ready steps. Execute.
-        for key, record in ready_steps.items():
-            logger.info("Executing -- '%s'\nScript path = %s", key,
-                        record.script)
-            logger.debug("Record: %s", record.__dict__)
-            self._execute_record(key, record)
+                    record.mark("READY")
+                    self._enqueue(key)
+                    summary["ready"] += 1
+
+        # Submit as much of the queue as the throttle allows.
+        ready_steps = self._dequeue(limit)
+        if debug:
+            for key, record, restart in ready_steps:
+                logger.debug("Executing -- '%s'\nScript path = %s\n"
+                             "Record: %s", key, record.script,
+                             record.__dict__)
+        self._execute_records(ready_steps)
+
+        summary["submitted"] = len(ready_steps)
+        summary["scheduled"] = sum(1 for _, record, _ in ready_steps
+                                   if record.to_be_scheduled)
+        summary["queued"] = len(self._submit_queue)
+        summary["in_progress"] = len(self.in_progress)
+        summary["completed"] = len(self.completed_steps)
+        summary["failed_total"] = len(self.failed_steps)
+        logger.info("Tick summary for '%s' -- %s", self.name,
+                    " ".join("{}={}".format(key, value)
+                             for key, value in summary.items()))
+        self._tick_summary = summary
 
         return False
 
-    def check_study_status(self):
+    def get_status_scope(self):
+        """
+        Return a key for the set of jobs the graph's adapter can observe.
+
+        Graphs with the same (non-None) scope can share a single status query
+        made with check_jobs.
+
+        :returns: A hashable key, or None if status queries cannot be shared.
+        """
+        return self._get_adapter().get_status_scope()
+
+    def get_active_jobs(self):
+        """
+        Return the job identifiers of the steps that are in progress.
+
+        Jobs whose steps all exited cleanly according to their exit markers
+        are left out, since their status does not need to be queried.
+
+        :returns: A list of the most recent job identifier of each step
+        (steps in the same bundle share a job).
+        """
+        return self._get_unexited_jobs(self._get_jobmap(),
+                                       self._scan_exited())
+
+    def _get_jobmap(self):
+        """
+        Map the job identifiers of the steps in progress to their steps.
+
+        :returns: An OrderedDict of job identifiers to lists of step names.
+        """
+        jobmap = OrderedDict()
+        for step in self.in_progress:
+            jobmap.setdefault(self.values[step].jobid[-1], []).append(step)
+        return jobmap
+
+    def _scan_exited(self):
+        """
+        Find the steps in progress that wrote an exit marker.
+
+        :returns: A dict of step names to their exit code and the time they
+        exited (empty if markers are not written).
+        """
+        if self._marker_dir and self.in_progress:
+            return scan_markers(self._marker_dir, self.in_progress)
+        return {}
+
+    @staticmethod
+    def _get_unexited_jobs(jobmap, exited):
+        """
+        Return the jobs with a step that has not exited cleanly.
+
+        :param jobmap: A dict of job identifiers to lists of step names.
+        :param exited: A dict of step names to their exit code and time.
+        :returns: A list of the job identifiers with a step that did not
+        write an exit marker or was ended by a signal.
+        """
+        return [jobid for jobid, steps in jobmap.items()
+                if any(exited.get(step, (SIGNAL_EXIT,))[0] >= SIGNAL_EXIT
+                       for step in steps)]
+
+    def check_jobs(self, joblist):
+        """
+        Query the status of jobs using the graph's adapter.
+
+        Status is queried through the adapter's status cache, so queries are
+        shared with other graphs using the same scheduler.
+
+        :param joblist: A list of job identifiers to be queried.
+        :returns: The return code of the status query, and a dictionary of job
+        identifiers to their status.
+        """
+        return self._get_adapter().check_status(joblist)
+
+    def check_study_status(self, job_status=None, markers_only=False):
         """
         Check the status of currently executing steps in the graph.
 
         This method is used to check the status of all currently in progress
         steps in the ExecutionGraph. Each ExecutionGraph stores the adapter
-        used to generate and execute its scripts.
+        used to generate and execute its scripts. Steps that wrote an exit
+        marker (see set_marker_dir) are resolved from it, and their jobs are
+        not queried unless they were ended by a signal.
+
+        :param job_status: The return code and dictionary of job identifiers
+        to their status from a status query already made for the graph's
+        jobs (optional). Jobs that are not the graph's are ignored.
+        :param markers_only: If True, the adapter is not queried and only
+        steps that exited without a signal are resolved. The rest are left
+        for a later check.
+        :returns: The return code of the status query, and a dictionary of
+        step names to their status.
         """
-        # Set up the job list and the map to get back to step names.
-        joblist = []
-        jobmap = {}
-        for step in self.in_progress:
-            jobid = self.values[step].jobid[-1]
-            joblist.append(jobid)
-            jobmap[jobid] = step
+        # Steps that exited report their exit code in a marker.
+        exited = self._scan_exited()
 
-        # Grab the adapter from the ScriptAdapterFactory.
-        adapter = ScriptAdapterFactory.get_adapter(self._adapter["type"])
-        adapter = adapter(**self._adapter)
-        # Use the adapter to grab the job statuses.
-        retcode, job_status = adapter.check_jobs(joblist)
+        # Set up the job list and the map to get back to step names.
+        jobmap = self._get_jobmap()
+
+        if job_status is None:
+            # Use the adapter to grab the status of jobs with steps that
+            # have not exited cleanly.
+            joblist = self._get_unexited_jobs(jobmap, exited)
+            if joblist and not markers_only:
+                job_status = self.check_jobs(joblist)
+            else:
+                job_status = JobStatusCode.NOJOBS, {}
+        retcode, job_status = job_status
         # Map the job identifiers back to step names.
-        step_status = {jobmap[jobid]: status
-                       for jobid, status in job_status.items()}
+        step_status = {}
+        adapter = None
+        for jobid, status in job_status.items():
+            steps = jobmap.get(jobid, [])
+            if len(steps) == 1 and not self.values[steps[0]].bundled:
+                step_status[steps[0]] = status
+            elif steps:
+                # Steps in a bundle report their own progress in markers.
+                adapter = adapter or self._get_adapter()
+                markers = [adapter.get_marker_path(self.values[step].workspace,
+                                                   step) for step in steps]
+                step_status.update(
+                    zip(steps, adapter.get_bundle_status(status, markers)))
+
+        for step, (code, ended) in exited.items():
+            # Record when the step actually ran, once for each job.
+            record = self.values[step]
+            if record.last_event("EXITED") != ended:
+                started = read_start_marker(self._marker_dir, step)
+                if started is not None:
+                    record.mark("STARTED", started)
+                record.mark("EXITED", ended)
+
+            if code == 0:
+                step_status[step] = State.FINISHED
+            elif markers_only and code >= SIGNAL_EXIT:
+                continue
+            elif code < SIGNAL_EXIT or \
+                    step_status.get(step) in (None, State.FINISHED):
+                # A step ended by a signal may have timed out or lost its
+                # node, which only the scheduler can tell.
+                step_status[step] = State.FAILED
+        if exited and retcode == JobStatusCode.NOJOBS:
+            retcode = JobStatusCode.OK
 
         # Based on return code, log something different.
         if retcode == JobStatusCode.OK:
@@ -467,3 +1989,112 @@ class ExecutionGraph(DAG):
             msg = "Unknown Error (Code = {retcode})".format(retcode)
             logger.error(msg)
             return retcode, step_status
+
+    def get_performance_report(self):
+        """
+        Compute timing statistics from the lifecycle events of each step.
+
+        For every step the following intervals are derived from its events:
+            - latency: Time from the last of its dependencies finishing to its
+            submission (conductor induced latency).
+            - queue: Time from submission until it started running.
+            - runtime: Time from starting to run until finishing.
+        The times steps started and finished are taken from their markers
+        where they wrote them (see set_marker_dir), since steps are only seen
+        to start and finish when the conductor next checks on them.
+        Intervals are summarized per abstract step and across the study. The
+        critical path is the chain of dependent steps with the longest total
+        time from submission to finish.
+
+        :returns: A dictionary containing the 'makespan' of the study, the
+        'critical_path' length and its 'critical_steps', and summaries of the
+        'latency', 'queue', and 'runtime' intervals for the whole study and
+        for each of its abstract 'steps'.
+        """
+        parents = self.get_parents()
+        finished = {name: record.get_finish_time()
+                    for name, record in self.values.items()
+                    if name != SOURCE}
+        intervals = OrderedDict()
+        first_submit = None
+        last_finish = None
+        for name, record in self.values.items():
+            if name == SOURCE:
+                continue
+
+            submitted = record.first_event("SUBMITTED")
+            started = record.get_start_time()
+
+            if submitted is not None:
+                first_submit = submitted if first_submit is None \
+                    else min(first_submit, submitted)
+            if finished[name] is not None:
+                last_finish = finished[name] if last_finish is None \
+                    else max(last_finish, finished[name])
+
+            step_intervals = intervals.setdefault(
+                record.abstract_name,
+                {"latency": [], "queue": [], "runtime": []})
+            if submitted is not None and started is not None:
+                step_intervals["queue"].append(started - submitted)
+            if started is not None and finished[name] is not None:
+                step_intervals["runtime"].append(finished[name] - started)
+
+            deps = [parent for parent in parents[name] if parent != SOURCE]
+            if submitted is not None and deps:
+                deps_done = [finished.get(parent) for parent in deps]
+                if None not in deps_done:
+                    step_intervals["latency"].append(
+                        submitted - max(deps_done))
+
+        # Longest path by submission to finish time of each step.
+        longest = {}
+        previous = {}
+        for name in self.topological_sort():
+            if name == SOURCE:
+                continue
+
+            record = self.values[name]
+            submitted = record.first_event("SUBMITTED")
+            weight = 0.0
+            if submitted is not None and finished[name] is not None:
+                weight = finished[name] - submitted
+
+            longest[name] = weight
+            previous[name] = None
+            for parent in parents[name]:
+                if parent in longest and \
+                        longest[parent] + weight > longest[name]:
+                    longest[name] = longest[parent] + weight
+                    previous[name] = parent
+
+        critical_steps = []
+        if longest:
+            node = max(longest, key=longest.get)
+            critical_length = longest[node]
+            while node is not None:
+                critical_steps.append(node)
+                node = previous[node]
+            critical_steps.reverse()
+        else:
+            critical_length = 0.0
+
+        report = {
+            "makespan": last_finish - first_submit
+            if first_submit is not None and last_finish is not None
+            else None,
+            "critical_path": critical_length,
+            "critical_steps": critical_steps,
+            "steps": OrderedDict(),
+        }
+        totals = {"latency": [], "queue": [], "runtime": []}
+        for abstract_name, step_intervals in intervals.items():
+            report["steps"][abstract_name] = {}
+            for interval, values in step_intervals.items():
+                totals[interval].extend(values)
+                report["steps"][abstract_name][interval] = _summarize(values)
+
+        for interval, values in totals.items():
+            report[interval] = _summarize(values)
+
+        return report
@@ -94,19 +94,14 @@ class Combination(object):
         # For the combination being added, assign the expected parameterized
         # strings that the user would substitute in for.
         # Parameterized value:  <self.token>(<key>)
-        logger.debug("Adding parameter value to Combination with args: %s",
-                     [key, name, value, label])
-        var = "{}({})".format(self._token, key)
-        logger.debug('Parameter value: %s = %s', var, value)
-        self._params[var] = value
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Adding parameter value to Combination with args: "
+                         "%s", [key, name, value, label])
+        self._params["{}({})".format(self._token, key)] = value
         # Parameterized label: <self.token>(<key>.label)
-        var = "{}({}.label)".format(self._token, key)
-        logger.debug('Label value: %s = %s', var, label)
-        self._labels[var] = label
+        self._labels["{}({}.label)".format(self._token, key)] = label
         # Parameterized name: <self.token>(<key>.name)
-        var = "{}({}.name)".format(self._token, key)
-        logger.debug('Name value: %s = %s', var, name)
-        self._names[var] = name
+        self._names["{}({}.name)".format(self._token, key)] = name
 
     def __str__(self):
         """
@@ -123,12 +118,21 @@ class Combination(object):
         :param params: A set of parameters to be used in the string.
         :returns: A string containing the labels for the parameters in params.
         """
-        combo_str = []
+        return ".".join(self.get_param_labels(params))
+
+    def get_param_labels(self, params):
+        """
+        Get the labels of the specified parameters, ordered by parameter.
+
+        :param params: A set of parameters to get the labels of.
+        :returns: A list of the labels for the parameters in params.
+        """
+        labels = []
         for item in sorted(params):
             var = "{}({}.label)".format(self._token, item)
-            combo_str.append(self._labels[var])
+            labels.append(self._labels[var])
 
-        return ".".join(combo_str)
+        return labels
 
     def apply(self, item):
         """
@@ -289,13 +293,18 @@ class ParameterGenerator(SimObject):
 
     __nonzero__ = __bool__
 
-    def get_combinations(self):
+    def get_combinations(self, start=0, stop=None):
         """
         Generate all combinations of parameters.
 
+        :param start: Index of the first combination to generate.
+        :param stop: Index after the last combination to generate (None for
+        the last combination).
         :returns: A generator with all combinations of parameters.
         """
-        for i in range(0, self.length):
+        if stop is None:
+            stop = self.length
+        for i in range(start, min(stop, self.length)):
             combo = Combination()
             for key in self.parameters.keys():
                 pvalue = self.parameters[key][i]
@@ -305,29 +314,29 @@ class ParameterGenerator(SimObject):
                 combo.add(key, name, pvalue, tlabel)
             yield combo
 
-    def _get_used_parameters(self, item, params):
+    def _get_used_parameters(self, item, params, patterns):
         """
         Find the parameters used by an item in a StudyStep.
 
         :param item: The item to search for parameters.
         :param params: The current set of found parameters.
+        :param patterns: A list of tuples of parameter keys and the compiled
+        regular expressions that find them.
         """
         if not item:
             return
         elif isinstance(item, int):
             return
         elif isinstance(item, str):
-            for key in self.parameters.keys():
-                _ = "\\{}\\({}\\.*\\w*\)".format(self.token, key)
-                matches = re.findall(_, item)
-                if matches:
+            for key, pattern in patterns:
+                if key not in params and pattern.search(item):
                     params.add(key)
         elif isinstance(item, list):
             for each in item:
-                self._get_used_parameters(each, params)
+                self._get_used_parameters(each, params, patterns)
         elif isinstance(item, dict):
             for each in item.values():
-                self._get_used_parameters(each, params)
+                self._get_used_parameters(each, params, patterns)
         else:
             msg = "Encountered an object of type '{}'. Expected a str, list," \
                   " int, or dict.".format(type(item))
@@ -341,6 +350,12 @@ class ParameterGenerator(SimObject):
         :param step: A StudyStep instance to be checked.
         :returns: A set of the parameter names used within the step parameter.
         """
+        # Compile the search for each parameter once rather than per string.
+        patterns = [
+            (key, re.compile(r"{}\({}\.*\w*\)"
+                             .format(re.escape(self.token), re.escape(key))))
+            for key in self.parameters.keys()
+        ]
         params = set()
-        self._get_used_parameters(step.__dict__, params)
+        self._get_used_parameters(step.__dict__, params, patterns)
         return params
@@ -29,8 +29,11 @@
 
 """Class related to the construction of study campaigns."""
 
+from collections import OrderedDict
 import copy
+import hashlib
 import logging
+import multiprocessing
 import os
 import re
 import time
@@ -46,6 +49,14 @@ SOURCE = "_source"
 WSREGEX = re.compile(
     r"\$\(([-!\$%\^&\*\(\)_\+\|~=`{}\[\]:;<>\?,\.\/\w]+)\.workspace\)"
 )
+# Layouts of parameterized workspaces under the global workspace:
+#   - flat: <combination> (for example, SIZE.10.ITER.10)
+#   - hashed: <hash prefix>/<combination>, spreading workspaces over 256
+#     directories
+#   - nested: one directory per parameter label (for example, SIZE.10/ITER.10)
+WORKSPACE_LAYOUTS = ("flat", "hashed", "nested")
+# Number of hexadecimal digits of the hash prefix of the hashed layout.
+HASH_WIDTH = 2
 
 
 class StudyStep(SimObject):
@@ -207,6 +218,7 @@ class Study(DAG):
         # Settings for handling restarts and submission attempts.
         self._restart_limit = 0
         self._submission_attempts = 0
+        self._workspace_layout = WORKSPACE_LAYOUTS[0]
 
         # If the user specified a flow in the form of steps, copy those into
         # into the Study object.
@@ -264,7 +276,8 @@ class Study(DAG):
         for node in path:
             yield parents[node], node, self.values[node]
 
-    def setup(self, submission_attempts=1, restart_limit=1):
+    def setup(self, submission_attempts=1, restart_limit=1,
+              workspace_layout=WORKSPACE_LAYOUTS[0]):
         """
         Method for executing initial setup of a Study.
 
@@ -276,6 +289,8 @@ class Study(DAG):
         marking a step as failed.
         :param restart_limit: Upper limit on the number of times a step with
         a restart command can be resubmitted before it is considered failed.
+        :param workspace_layout: Layout of the workspaces of parameterized
+        steps (see WORKSPACE_LAYOUTS).
         :returns: True if the Study is successfully setup, False otherwise.
         """
         # If the study has been set up, just return.
@@ -283,8 +298,15 @@ class Study(DAG):
             logger.info("%s is already set up, returning.")
             return True
 
+        if workspace_layout not in WORKSPACE_LAYOUTS:
+            msg = "Unknown workspace layout '{}'. Expected one of {}." \
+                  .format(workspace_layout, ", ".join(WORKSPACE_LAYOUTS))
+            logger.error(msg)
+            raise ValueError(msg)
+
         self._submission_attempts = submission_attempts
         self._restart_limit = restart_limit
+        self._workspace_layout = workspace_layout
 
         # Set up the directory structure.
         # TODO: fdinatal - As I implement the high level program (manager and
@@ -322,10 +344,45 @@ class Study(DAG):
         self._issetup = True
         return True
 
-    def _setup_parameterized(self):
+    def _get_workspace(self, global_workspace, combo, params):
+        """
+        Return the workspace of a step parameterized by a combination.
+
+        :param global_workspace: Path to the study's global workspace.
+        :param combo: The Combination the step is parameterized by.
+        :param params: The set of parameters the step uses.
+        :returns: The path to the step's workspace, laid out according to the
+        study's workspace layout.
+        """
+        labels = combo.get_param_labels(params)
+        combo_str = ".".join(labels)
+        if self._workspace_layout == "hashed":
+            shard = hashlib.sha1(combo_str.encode("utf-8")).hexdigest()
+            return os.path.join(global_workspace, shard[:HASH_WIDTH],
+                                combo_str)
+        elif self._workspace_layout == "nested":
+            return os.path.join(global_workspace, *labels)
+
+        return os.path.join(global_workspace, combo_str)
+
+    def _setup_parameterized(self, workers=1):
         """
         Set up the ExecutionGraph of a parameterized study.
 
+        Each step uses its own parameters and those of every step it depends
+        on. A step is expanded once per distinct projection of the parameter
+        combinations onto the parameters it uses, and is linked to the
+        expansion of each step it depends on with the matching projection.
+        Steps that use no parameters are expanded once, in the global
+        workspace.
+
+        With more than one worker, the combinations are partitioned into
+        ranges that are expanded in separate processes (see _Expansion). The
+        expansions of the ranges are merged in order, keeping the first
+        expansion of steps that more than one range expanded, so the
+        ExecutionGraph is the same however many workers expand it.
+
+        :param workers: Number of processes to expand the study with.
         :returns: The path to the study's global workspace and an expanded
         ExecutionGraph based on the parameters and parameterized workflow
         steps.
@@ -333,178 +390,50 @@ class Study(DAG):
         # Construct ExecutionGraph
         dag = ExecutionGraph()
         dag.add_description(**self.description)
+        dag.add_node(SOURCE, None)
         # Items to store that should be reset.
         global_workspace = self.output.value  # Highest ouput dir
 
-        # Rework begins here:
-        # First step, we need to map each workflow step to the parameters that
-        # they actually use -- and only the parameters used. This setup will
-        # make it so that workflows can be constructed with implicit stages.
-        # That's to say that if a step only requires a subset of parameters,
-        # we only need to run the set of combinations dictated by that subset.
-        # NOTE: We're going to need to make a way for users to access the
-        # workspaces of other steps. With this rework we won't be able to
-        # assume that every directory has all parameters on it.
-        used_params = {}
-        workspaces = {}
-        for parent, step, node in self.walk_study():
-            # Source doesn't matter -- ignore it.
-            if step == SOURCE:
-                continue
+        expansion = _Expansion(self, global_workspace)
+        length = self.parameters.length
+        if workers > 1 and length > 1:
+            # Use more ranges than workers so that they stay busy.
+            num_ranges = min(length, workers * 4)
+            bounds = [(length * i // num_ranges,
+                       length * (i + 1) // num_ranges)
+                      for i in range(num_ranges)]
+            logger.info("Expanding study '%s' over %d ranges of combinations "
+                        "with %d workers.", self.name, num_ranges, workers)
+            pool = multiprocessing.Pool(workers, _init_expansion,
+                                        (expansion,))
+            try:
+                results = pool.map(_expand_range, bounds)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [expansion.expand()]
 
-            # Otherwise, we have a valid key.
-            # We need to collect used parameters for two things:
-            # 1. Collect the used parameters for the current step.
-            # 2. Get the used parameters for the parent step.
-            # The logic here is that the used parameters are going to be the
-            # union of the used parameters for this step and ALL parent steps.
-            # If we keep including the step's parent parameters, we will simply
-            # carry parent parameters recursively.
-            step_params = self.parameters.get_used_parameters(node)
-            if parent != SOURCE:
-                step_params |= used_params[parent]
-            used_params[step] = step_params
-
-        logger.debug("Used Parameters - \n%s", used_params)
-
-        # Secondly, we need to now iterate over all combinations for each step
-        # and simply apply the combination. We can then add the name to the
-        # expanded map using only the parameters that we discovered above.
-        for combo in self.parameters:
-            # For each Combination in the parameters...
-            logger.info("==================================================")
-            logger.info("Expanding study '%s' for combination '%s'",
-                        self.name, str(combo))
-            logger.info("==================================================")
-
-            # For each step in the Study
-            # Walk the study and construct subtree based on the combination.
-            for parent, step, node in self.walk_study():
-                # If we find the source node, we can just add it and continue.
-                if step == SOURCE:
-                    logger.debug("Source node found.")
-                    dag.add_node(SOURCE, None)
-                    continue
-
-                logger.debug("Processing step '%s'.", step)
-                # Due to the rework, we now can get the parameters used. We no
-                # longer have to blindly apply the parameters. In fact, better
-                # if we don't know. We have to see if the name exists in the
-                # DAG first. If it does we can skip the step. Otherwise, apply
-                # and add.
-                if used_params[step]:
-                    logger.debug("Used parameters %s", used_params[step])
-                    # Apply the used parameters to the step.
-                    modified, step_exp = node.apply_parameters(combo)
-                    # Name the step based on the parameters used.
-                    combo_str = combo.get_param_string(used_params[step])
-                    step_name = "{}_{}".format(step_exp.name, combo_str)
-                    logger.debug("Step has been modified. Step '%s' renamed"
-                                 " to '%s'", step_exp.name, step_name)
-                    step_exp.name = step_name
-                    logger.debug("Resulting step name: %s", step_name)
-
-                    # Set the workspace to the parameterized workspace
-                    self.output.value = os.path.join(global_workspace,
-                                                     combo_str)
-
-                    # We now should account for varying workspace locations.
-                    # Search for the use of workspaces in the command line so
-                    # that we can go ahead and fill in the appropriate space
-                    # for this combination.
-                    cmd = step_exp.run["cmd"]
-                    used_spaces = re.findall(WSREGEX, cmd)
-                    for match in used_spaces:
-                        logger.debug("Workspace found -- %s", match)
-                        # Append the parameters that the step uses matching the
-                        # current combo.
-                        combo_str = combo.get_param_string(used_params[match])
-                        logger.debug("Combo str -- %s", combo_str)
-                        if combo_str:
-                            _ = "{}_{}".format(match, combo_str)
-                        else:
-                            _ = match
-                        # Replace the workspace tag in the command.
-                        workspace_var = "$({}.workspace)".format(match)
-                        cmd = cmd.replace(workspace_var, workspaces[_])
-                        logger.debug("New cmd -- %s", cmd)
-                    step_exp.run["cmd"] = cmd
-                else:
-                    # Otherwise, we know that this step is a joining node.
-                    step_exp = copy.deepcopy(node)
-                    modified = False
-                    logger.debug("No parameters found. Resulting name %s",
-                                 step_exp.name)
-                    self.output.value = os.path.join(global_workspace)
-
-                # Add the workspace name to the map of workspaces.
-                workspaces[step_exp.name] = self.output.value
-
-                # Now we need to make sure we handle the dependencies.
-                # We know the parent and the step name (whether it's modified
-                # or not and is not _source). So now there's two cases:
-                #   1. If the ExecutionGraph contains the parent name as it
-                #      exists without parameterization, then we know we have
-                #      a hub/joining node.
-                #   2. If the ExecutionGraph does not have the parent node,
-                #      then our next assumption is that it has a parameterized
-                #      version of the parent. We need to check and make sure.
-                #   3. Fall back third case... Abort. Something is not right.
-                if step_exp.run["restart"]:
-                    rlimit = self._restart_limit
-                else:
-                    rlimit = 0
+        for step in expansion.order:
+            if self.values[step].run["restart"]:
+                rlimit = self._restart_limit
+            else:
+                rlimit = 0
 
-                if parent != SOURCE:
-                    # With the rework, we now need to check the parent's used
-                    # parmeters.
-                    combo_str = combo.get_param_string(used_params[parent])
-                    param_name = "{}_{}".format(parent, combo_str)
-                    # If the parent node is not '_source', check.
-                    if parent in dag.values:
-                        # If the parent is in the dag, add the current step...
-                        dag.add_step(step_exp.name, step_exp,
-                                     self.output.value, rlimit)
-                        # And its associated edge.
+            for _, expanded in results:
+                for step_exp, workspace, parents in expanded[step]:
+                    if step_exp.name in dag.values:
+                        # An earlier range has the same projection.
+                        continue
+
+                    dag.add_step(step_exp.name, step_exp, workspace, rlimit,
+                                 step)
+                    for parent in parents:
                         dag.add_edge(parent, step_exp.name)
-                    elif param_name in dag.values:
-                        # Find the index in the step for the dependency...
-                        i = step_exp.run['depends'].index(parent)
-                        # Sub it with parameterized dependency...
-                        step_exp.run['depends'][i] = param_name
-                        # Add the node and edge.
-                        dag.add_step(step_exp.name, step_exp,
-                                     self.output.value, rlimit)
-                        dag.add_edge(param_name, step_exp.name)
-                    else:
-                        msg = "'{}' nor '{}' found in the ExecutionGraph. " \
-                              "Unexpected error occurred." \
-                              .format(parent, param_name)
-                        logger.error(msg)
-                        raise ValueError(msg)
-                else:
-                    # If the parent is source, then we can just execute it from
-                    # '_source'.
-                    dag.add_step(step_exp.name, step_exp, self.output.value,
-                                 rlimit)
-                    dag.add_edge(SOURCE, step_exp.name)
-
-                # Go ahead and substitute in the output path and create the
-                # workspace in the ExecutionGraph.
-                create_parentdir(self.output.value)
-                step_exp.__dict__ = apply_function(step_exp.__dict__,
-                                                   self.output.substitute)
-
-                # logging
-                logger.debug("---------------- Modified --------------")
-                logger.debug("Modified = %s", modified)
-                logger.debug("step_exp = %s", step_exp.__dict__)
-                logger.debug("----------------------------------------")
-
-                # Reset the output path to the global_workspace.
-                self.output.value = global_workspace
-                logger.info(
-                    "==================================================")
+
+        logger.info("Expanded study '%s' into %d steps over %d "
+                    "combinations.", self.name, len(dag.values) - 1,
+                    sum(num_combos for num_combos, _ in results))
 
         return global_workspace, dag
 
@@ -544,7 +473,7 @@ class Study(DAG):
 
         return self.output.value, dag
 
-    def stage(self):
+    def stage(self, workers=1):
         """
         Method that produces the expanded DAG representing the Study.
 
@@ -553,6 +482,8 @@ class Study(DAG):
         The stage method also sets up individual working directories (or
         workspaces) for each node in the workflow that requires it.
 
+        :param workers: Number of processes to expand a parameterized study
+        with (default 1).
         :returns: An ExecutionGraph object with the expanded workflow.
         """
         # If not set up, return None.
@@ -586,6 +517,212 @@ class Study(DAG):
         # 2. A linear, execute as specified workflow
         # NOTE: This scheme could be how we handle derived use cases.
         if self.parameters:
-            return self._setup_parameterized()
+            return self._setup_parameterized(workers)
         else:
             return self._setup_linear()
+
+
+class _Expansion(object):
+    """
+    The expansion of the steps of a parameterized Study.
+
+    The expansion holds everything that is derived from the abstract
+    workflow, so that expanding a range of combinations only renders the
+    steps for it. Ranges can be expanded in separate processes.
+    """
+
+    def __init__(self, study, global_workspace):
+        """
+        Prepare the expansion of a Study.
+
+        :param study: The Study to expand, which must be set up.
+        :param global_workspace: Path to the study's global workspace.
+        """
+        self._study = study
+        self._global_workspace = global_workspace
+        # Substitutes the workspace of each expanded step for OUTPUT_PATH.
+        self._output = copy.deepcopy(study.output)
+
+        # Order the steps so that each follows the steps it depends on.
+        self.order = [step for step in study.topological_sort()
+                      if step != SOURCE]
+        self._parents = study.get_parents()
+
+        # First step, we need to map each workflow step to the parameters that
+        # they actually use -- and only the parameters used. This setup will
+        # make it so that workflows can be constructed with implicit stages.
+        # That's to say that if a step only requires a subset of parameters,
+        # we only need to run the set of combinations dictated by that subset.
+        # The used parameters of a step are the union of the parameters the
+        # step uses and the used parameters of ALL of the steps it depends on,
+        # so parent parameters are carried recursively.
+        self._used_params = {}
+        for step in self.order:
+            step_params = \
+                study.parameters.get_used_parameters(study.values[step])
+            for parent in self._parents[step]:
+                if parent != SOURCE:
+                    step_params |= self._used_params[parent]
+            self._used_params[step] = frozenset(step_params)
+        self._subsets = set(self._used_params.values())
+
+        logger.debug("Used Parameters - \n%s", self._used_params)
+
+        # Precompute the workspaces that each step's command references as
+        # (step, workspace variable, parameters used by the step) tuples, so
+        # that resolving a reference is only a lookup.
+        self._ws_refs = {}
+        for step in self.order:
+            matches = OrderedDict.fromkeys(
+                re.findall(WSREGEX, study.values[step].run["cmd"]))
+            self._ws_refs[step] = [
+                (match, "$({}.workspace)".format(match),
+                 self._used_params[match]) for match in matches]
+
+    def _get_workspace(self, combo, params):
+        """
+        Return the workspace of a step for a combination.
+
+        :param combo: The Combination the step is expanded for.
+        :param params: The set of parameters the step uses.
+        :returns: The path to the step's workspace.
+        """
+        if not params:
+            return self._global_workspace
+
+        return self._study._get_workspace(self._global_workspace, combo,
+                                          params)
+
+    def expand(self, start=0, stop=None):
+        """
+        Expand the steps of the study for a range of combinations.
+
+        :param start: Index of the first combination of the range.
+        :param stop: Index after the last combination of the range (None for
+        the last combination).
+        :returns: The number of combinations in the range, and a dict of step
+        names to lists of (expanded StudyStep, workspace, names of the steps
+        it depends on) tuples. A step has one tuple per distinct projection
+        of the combinations in the range onto the parameters it uses.
+        """
+        # Project the combinations onto each subset of parameters that steps
+        # use. Each distinct projection is represented by the first
+        # combination with it, along with the label strings of that
+        # combination for every subset.
+        projections = {params: OrderedDict() for params in self._subsets}
+        num_combos = 0
+        for combo in self._study.parameters.get_combinations(start, stop):
+            num_combos += 1
+            combo_strs = {params: combo.get_param_string(params)
+                          for params in self._subsets}
+            for params, combo_str in combo_strs.items():
+                if combo_str not in projections[params]:
+                    projections[params][combo_str] = (combo, combo_strs)
+
+        # Expansion visits every expanded step, so per step messages are
+        # guarded by a single level check.
+        debug = logger.isEnabledFor(logging.DEBUG)
+        expanded = {}
+        for step in self.order:
+            params = self._used_params[step]
+            if debug:
+                logger.debug("Expanding step '%s' over %d projections (used "
+                             "parameters %s).", step,
+                             len(projections[params]), sorted(params))
+
+            expanded[step] = [
+                self._expand_step(step, combo_str, combo, combo_strs, debug)
+                for combo_str, (combo, combo_strs)
+                in projections[params].items()]
+
+        return num_combos, expanded
+
+    def _expand_step(self, step, combo_str, combo, combo_strs, debug=False):
+        """
+        Expand a step for a projection of the combinations.
+
+        :param step: Name of the step to expand.
+        :param combo_str: Label string of the projection.
+        :param combo: A Combination with the projection.
+        :param combo_strs: The label strings of combo for each subset of
+        parameters that steps use.
+        :param debug: True to log the expanded step.
+        :returns: The expanded StudyStep, its workspace, and the names of the
+        steps it depends on.
+        """
+        node = self._study.values[step]
+        params = self._used_params[step]
+        workspace = self._get_workspace(combo, params)
+        if params:
+            # Apply the used parameters to the step.
+            modified, step_exp = node.apply_parameters(combo)
+            # Name the step based on the parameters used.
+            step_exp.name = "{}_{}".format(step_exp.name, combo_str)
+
+            # We now should account for varying workspace locations. Fill in
+            # the appropriate space for this combination for each workspace
+            # the command references.
+            cmd = step_exp.run["cmd"]
+            for match, workspace_var, ref_params in self._ws_refs[step]:
+                cmd = cmd.replace(workspace_var,
+                                  self._get_workspace(combo, ref_params))
+            step_exp.run["cmd"] = cmd
+        else:
+            # Otherwise, we know that this step is a joining node.
+            step_exp = copy.deepcopy(node)
+            modified = False
+
+        # Each step this step depends on was expanded with the projection of
+        # this step's combination onto its parameters (a subset of this
+        # step's), which names its expansion.
+        expanded = {SOURCE: SOURCE}
+        for parent in self._parents[step]:
+            if parent == SOURCE:
+                continue
+            parent_str = combo_strs[self._used_params[parent]]
+            if parent_str:
+                expanded[parent] = "{}_{}".format(parent, parent_str)
+            else:
+                expanded[parent] = parent
+        if step_exp.run["depends"]:
+            step_exp.run["depends"] = [
+                expanded[parent] for parent in step_exp.run["depends"]
+            ]
+
+        # Go ahead and substitute in the output path and create the
+        # workspace.
+        create_parentdir(workspace)
+        self._output.value = workspace
+        step_exp.__dict__ = apply_function(step_exp.__dict__,
+                                           self._output.substitute)
+
+        if debug:
+            logger.debug("Step '%s' expanded (modified = %s) -- %s",
+                         step_exp.name, modified, step_exp.__dict__)
+
+        return (step_exp, workspace,
+                [expanded[parent] for parent in self._parents[step]])
+
+
+# The expansion that worker processes of a parallel expansion run.
+_expansion = None
+
+
+def _init_expansion(expansion):
+    """
+    Initialize a worker process of a parallel expansion.
+
+    :param expansion: The _Expansion the worker expands ranges of.
+    """
+    global _expansion
+    _expansion = expansion
+
+
+def _expand_range(bounds):
+    """
+    Expand a range of combinations in a worker process.
+
+    :param bounds: The start and stop indices of the range.
+    :returns: The result of _Expansion.expand for the range.
+    """
+    return _expansion.expand(*bounds)
@@ -30,6 +30,7 @@
 """Classes that represent the environment of a study."""
 
 import logging
+from multiprocessing.pool import ThreadPool
 
 from maestrowf.abstracts import SimObject, Dependency, Source, Substitution
 
@@ -175,18 +176,53 @@ class StudyEnvironment(SimObject):
         logger.debug("'%s' not found -- \n%s", key, self)
         return None
 
-    def acquire_environment(self):
+    def acquire_environment(self, num_workers=4):
         """
         Acquire any environment items that may be stored remotely.
+
+        Dependencies are independent of one another, so they are acquired
+        concurrently using a bounded pool of worker threads. If any
+        dependency fails to be acquired, no further acquisitions are started
+        and the exception is raised to the caller.
+
+        :param num_workers: Maximum number of dependencies to acquire at once.
         """
         if self._is_set_up:
             logger.info("Environment already set up. Returning.")
             return
 
         logger.info("Acquiring dependencies")
-        for dependency, value in self.dependencies.items():
-            logger.info("Acquiring -- %s", dependency)
-            value.acquire(substitutions=self.substitutions.values())
+        substitutions = list(self.substitutions.values())
+        dependencies = list(self.dependencies.items())
+        total = len(dependencies)
+
+        def _acquire(item):
+            name, dependency = item
+            logger.info("Acquiring -- %s", name)
+            dependency.acquire(substitutions=substitutions)
+            return name
+
+        if num_workers <= 1 or total <= 1:
+            for num_acquired, item in enumerate(dependencies, 1):
+                name = _acquire(item)
+                logger.info("Acquired '%s' (%d of %d).",
+                            name, num_acquired, total)
+        else:
+            pool = ThreadPool(min(num_workers, total))
+            try:
+                results = pool.imap_unordered(_acquire, dependencies)
+                for num_acquired, name in enumerate(results, 1):
+                    logger.info("Acquired '%s' (%d of %d).",
+                                name, num_acquired, total)
+            except Exception:
+                # Fail fast -- drop any acquisitions that have not started.
+                logger.error("Failed to acquire the study environment. "
+                             "Cancelling remaining dependencies.")
+                pool.terminate()
+                raise
+
+            pool.close()
+            pool.join()
 
         self._is_set_up = True
 
@@ -200,24 +236,18 @@ class StudyEnvironment(SimObject):
         if not item:
             return item
 
-        logger.debug("Applying environment to %s", item)
-        logger.debug("Processing labels...")
+        # Substitutions log what they replace, so only the item itself is
+        # logged here (and only when DEBUG logging is enabled).
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Applying environment to %s", item)
+
         for label, value in self.labels.items():
-            logger.debug("Looking for %s in %s", label, item)
             item = value.substitute(item)
-            logger.debug("After substitution: %s", item)
 
-        logger.debug("Processing dependencies...")
         for label, dependency in self.dependencies.items():
-            logger.debug("Looking for %s in %s", label, item)
             item = dependency.substitute(item)
-            logger.debug("After substitution: %s", item)
-            logger.debug("Acquiring %s.", label)
 
-        logger.debug("Processing substitutions...")
         for substitution, value in self.substitutions.items():
-            logger.debug("Looking for %s in %s", substitution, item)
             item = value.substitute(item)
-            logger.debug("After substitution: %s", item)
 
         return item
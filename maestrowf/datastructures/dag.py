@@ -171,3 +171,40 @@ class DAG(Graph):
                 path.append(node)
 
         return path, parent
+
+    def topological_sort(self):
+        """
+        Order the nodes of the DAG so that every node follows its parents.
+
+        :returns: A list of node names in topological order.
+        """
+        in_degree = OrderedDict((node, 0) for node in self.adjacency_table)
+        for children in self.adjacency_table.values():
+            for child in children:
+                in_degree[child] += 1
+
+        queue = deque(node for node, degree in in_degree.items()
+                      if degree == 0)
+        order = []
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for child in self.adjacency_table[node]:
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    queue.append(child)
+
+        return order
+
+    def get_parents(self):
+        """
+        Map each node in the DAG to the nodes it has incoming edges from.
+
+        :returns: A dictionary mapping node names to lists of parent names.
+        """
+        parents = {node: [] for node in self.adjacency_table}
+        for node, children in self.adjacency_table.items():
+            for child in children:
+                parents[child].append(node)
+
+        return parents
@@ -32,9 +32,9 @@
 import logging
 import os
 import re
-import subprocess
 
 from maestrowf.abstracts import Dependency
+from maestrowf.commandrunner import CommandRunner
 
 logger = logging.getLogger(__name__)
 
@@ -115,9 +115,10 @@ class GitDependency(Dependency):
             raise ValueError(error)
 
         path = os.path.join(self.path, self.name)
-        logger.debug("%s: %s", self.get_var(),
-                     data.replace(self.get_var(), path))
-        return data.replace(self.get_var(), path)
+        data = data.replace(self.get_var(), path)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s: %s", self.get_var(), data)
+        return data
 
     def acquire(self, substitutions=None):
         """
@@ -148,9 +149,9 @@ class GitDependency(Dependency):
 
         path = os.path.join(self.path, self.name)
         logger.info("Cloning %s from %s...", self.name, self.url)
-        clone = subprocess.Popen(["git", "clone", self.url, path],
-                                 stdout=subprocess.PIPE)
-        retcode = clone.wait()
+        runner = CommandRunner()
+        clone = runner.run(["git", "clone", self.url, path], shell=False)
+        retcode = clone.retcode
         if retcode != 0:
             if retcode == 128:
                 msg = "Destination path '{}' already exists and is not an " \
@@ -161,13 +162,13 @@ class GitDependency(Dependency):
                   "are valid. (Error code: {})".format(self.name, self.url,
                                                        path, retcode)
 
-            logger.error(msg)
+            logger.error("%s\n%s", msg, clone.err.strip())
             raise Exception(msg)
 
         if self.hash:
             logger.info("Checking out SHA1 hash '{}'...", self.hash)
-            chkout = subprocess.Popen(["git", "checkout", self.hash], cwd=path)
-            retcode = chkout.wait()
+            retcode = runner.run(["git", "checkout", self.hash], cwd=path,
+                                 shell=False).retcode
 
             if retcode != 0:
                 msg = "Unable to checkout SHA1 hash '{}' for the repository" \
@@ -179,9 +180,8 @@ class GitDependency(Dependency):
         if self.tag:
             logger.info("Checking out git tag '{}'...", self.tag)
             tag = "tags/{}".format(self.tag)
-            chkout = subprocess.Popen(["git", "checkout", tag], cwd=path)
-
-            retcode = chkout.wait()
+            retcode = runner.run(["git", "checkout", tag], cwd=path,
+                                 shell=False).retcode
 
             if retcode != 0:
                 msg = "Unable to checkout tag '{}' for the repository" \
@@ -191,10 +191,8 @@ class GitDependency(Dependency):
 
         if self.branch:
             logger.info("Checking out git branch '{}'...", self.branch)
-            chkout = subprocess.Popen(["git", "checkout", self.branch],
-                                      cwd=path)
-
-            retcode = chkout.wait()
+            retcode = runner.run(["git", "checkout", self.branch], cwd=path,
+                                 shell=False).retcode
 
             if retcode != 0:
                 msg = "Unable to checkout branch '{}' for the repository" \
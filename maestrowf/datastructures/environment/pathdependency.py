@@ -89,9 +89,10 @@ class PathDependency(Dependency):
             logger.exception(error)
             raise ValueError(error)
 
-        logger.debug("%s: %s", self.get_var(),
-                     data.replace(self.get_var(), self.value))
-        return data.replace(self.get_var(), self.value)
+        data = data.replace(self.get_var(), self.value)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s: %s", self.get_var(), data)
+        return data
 
     def acquire(self, substitutions=None):
         """
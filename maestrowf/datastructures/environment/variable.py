@@ -85,9 +85,10 @@ class Variable(Substitution):
         """
         self._verification("Attempting to substitute a variable that is not"
                            " complete.")
-        logger.debug("%s: %s", self.get_var(),
-                     data.replace(self.get_var(), str(self.value)))
-        return data.replace(self.get_var(), str(self.value))
+        data = data.replace(self.get_var(), str(self.value))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s: %s", self.get_var(), data)
+        return data
 
     def _verify(self):
         """
@@ -30,7 +30,11 @@
 """Module containing all things needed for a YAML Study Specification."""
 
 from copy import deepcopy
+import hashlib
 import logging
+import os
+import pickle
+import tempfile
 import yaml
 
 from maestrowf.abstracts import Specification
@@ -41,6 +45,20 @@ from maestrowf.datastructures import environment
 
 logger = logging.getLogger(__name__)
 
+# Prefer the libyaml backed loader when PyYAML was built with it.
+try:
+    SpecLoader = yaml.CSafeLoader
+except AttributeError:
+    SpecLoader = yaml.SafeLoader
+
+# Location of the cache of parsed and verified specifications.
+SPEC_CACHE = os.path.join(os.path.expanduser("~"), ".maestrowf", "specs")
+# Most specifications kept in the cache, the least recently used are removed.
+SPEC_CACHE_SIZE = 64
+# Bump when the cached representation of a specification changes.
+_CACHE_VERSION = 1
+_SPEC_ATTRS = ("description", "environment", "batch", "study", "globals")
+
 
 class YAMLSpecification(Specification):
     """
@@ -82,21 +100,44 @@ class YAMLSpecification(Specification):
         self.globals = {}
 
     @classmethod
-    def load_specification(cls, path):
+    def load_specification(cls, path, cache_dir=None):
         """
         Method for loading a study specification.
 
+        If a cache_dir is given (such as SPEC_CACHE), parsed and verified
+        specifications are cached in it keyed by the hash of the
+        specification's contents, so that loading an unchanged specification
+        again skips YAML parsing and verification.
+
         :param path: Path to a study specification.
+        :param cache_dir: Directory for cached specifications (optional, by
+        default nothing is cached).
         :returns: A specification object containing the information from path.
         """
         logger.info("Loading specification -- path = %s", path)
         try:
             # Load the YAML spec from the file.
-            with open(path, 'r') as data:
-                spec = yaml.load(data)
+            with open(path, 'rb') as data:
+                contents = data.read()
+
+            cache_path = None
+            if cache_dir:
+                digest = hashlib.sha1(contents).hexdigest()
+                cache_path = os.path.join(
+                    cache_dir, "{}.v{}.pkl".format(digest, _CACHE_VERSION))
+
+                specification = cls._load_cached(cache_path)
+                if specification is not None:
+                    logger.info("Using cached specification -- %s",
+                                cache_path)
+                    specification.path = path
+                    return specification
+
+            spec = yaml.load(contents, Loader=SpecLoader)
 
         except Exception as e:
-            logger.exception(e.message)
+            logger.exception("Failed to load specification '%s' -- %s",
+                             path, str(e))
             raise
 
         logger.debug("Loaded specification -- \n%s", spec["description"])
@@ -115,8 +156,103 @@ class YAMLSpecification(Specification):
         logger.debug("Specification object created. Verifying...")
         specification.verify()
         logger.debug("Returning verified specification.")
+
+        if cache_path:
+            specification._write_cache(cache_path)
+
+        return specification
+
+    @classmethod
+    def _load_cached(cls, cache_path):
+        """
+        Load a verified specification from the specification cache.
+
+        :param cache_path: Path to the cached specification.
+        :returns: A specification object, or None if no usable entry exists.
+        """
+        if not os.path.exists(cache_path):
+            return None
+
+        try:
+            with open(cache_path, 'rb') as pkl:
+                cached = pickle.load(pkl)
+        except Exception as e:
+            logger.warning("Ignoring unreadable cached specification %s -- "
+                           "%s", cache_path, str(e))
+            return None
+
+        specification = cls()
+        for attr in _SPEC_ATTRS:
+            setattr(specification, attr, cached[attr])
+
+        # Mark the entry as recently used so that it is kept in the cache.
+        try:
+            os.utime(cache_path, None)
+        except OSError:
+            pass
+
         return specification
 
+    def _write_cache(self, cache_path):
+        """
+        Write the verified specification to the specification cache.
+
+        The entry is written to a temporary file and renamed into place so
+        that concurrent readers never observe a partial entry. Entries beyond
+        SPEC_CACHE_SIZE are then removed, least recently used first. Failure
+        to write the cache is not fatal.
+
+        :param cache_path: Path to write the cached specification to.
+        """
+        cache_dir = os.path.dirname(cache_path)
+        tmp_path = None
+        try:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+
+            cached = {attr: getattr(self, attr) for attr in _SPEC_ATTRS}
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as pkl:
+                pickle.dump(cached, pkl, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, cache_path)
+            tmp_path = None
+        except Exception as e:
+            logger.warning("Unable to cache specification to %s -- %s",
+                           cache_path, str(e))
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        self._prune_cache(cache_dir)
+
+    @staticmethod
+    def _prune_cache(cache_dir):
+        """
+        Remove the least recently used entries beyond SPEC_CACHE_SIZE.
+
+        :param cache_dir: Directory of cached specifications.
+        """
+        try:
+            entries = [os.path.join(cache_dir, fname)
+                       for fname in os.listdir(cache_dir)
+                       if fname.endswith(".pkl")]
+            if len(entries) <= SPEC_CACHE_SIZE:
+                return
+            entries.sort(key=os.path.getmtime)
+        except OSError as e:
+            logger.warning("Unable to list cached specifications in %s -- "
+                           "%s", cache_dir, str(e))
+            return
+
+        for entry in entries[:len(entries) - SPEC_CACHE_SIZE]:
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+
     def verify(self):
         """Verify the whole specification."""
         self.verify_description()
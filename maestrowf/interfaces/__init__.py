@@ -30,9 +30,12 @@
 """Collection of custom adapters for interfacing with various systems."""
 import logging
 
-from maestrowf.interfaces.script import LocalScriptAdapter, SlurmScriptAdapter
+from maestrowf.interfaces.script import LocalScriptAdapter, \
+    SimulatedScriptAdapter, SlurmScriptAdapter
+from maestrowf.interfaces.state import SQLiteStateBackend
 
-__all__ = ("SlurmScriptAdapter", "ScriptAdapterFactory")
+__all__ = ("SlurmScriptAdapter", "ScriptAdapterFactory",
+           "SQLiteStateBackend", "StateBackendFactory")
 LOGGER = logging.getLogger(__name__)
 
 
@@ -40,6 +43,7 @@ class ScriptAdapterFactory(object):
     factories = {
         "slurm": SlurmScriptAdapter,
         "local": LocalScriptAdapter,
+        "simulated": SimulatedScriptAdapter,
     }
 
     @classmethod
@@ -56,3 +60,24 @@ class ScriptAdapterFactory(object):
     @classmethod
     def get_valid_adapters(cls):
         return cls.factories.keys()
+
+
+class StateBackendFactory(object):
+    factories = {
+        "sqlite": SQLiteStateBackend,
+    }
+
+    @classmethod
+    def get_backend(cls, backend_id):
+        if backend_id.lower() not in cls.factories:
+            msg = "State backend '{0}' not found. Specify a backend that " \
+                  "exists or implement a new one mapping to the '{0}'" \
+                  .format(str(backend_id))
+            LOGGER.error(msg)
+            raise Exception(msg)
+
+        return cls.factories[backend_id]
+
+    @classmethod
+    def get_valid_backends(cls):
+        return cls.factories.keys()
@@ -27,6 +27,9 @@
 # SOFTWARE.
 ###############################################################################
 from maestrowf.interfaces.script.localscriptadapter import LocalScriptAdapter
+from maestrowf.interfaces.script.simulatedscriptadapter import \
+    SimulatedScriptAdapter
 from maestrowf.interfaces.script.slurmscriptadapter import SlurmScriptAdapter
 
-__all__ = ("LocalScriptAdapter", "SlurmScriptAdapter")
+__all__ = ("LocalScriptAdapter", "SimulatedScriptAdapter",
+           "SlurmScriptAdapter")
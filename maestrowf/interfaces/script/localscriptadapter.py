@@ -30,10 +30,10 @@
 """Local interface implementation."""
 import logging
 import os
-from subprocess import PIPE, Popen
 
 from maestrowf.abstracts.enums import JobStatusCode, SubmissionCode
 from maestrowf.abstracts.interfaces import ScriptAdapter
+from maestrowf.commandrunner import CommandRunner
 
 LOGGER = logging.getLogger(__name__)
 
@@ -55,6 +55,7 @@ class LocalScriptAdapter(ScriptAdapter):
         super(LocalScriptAdapter, self).__init__()
 
         self._exec = kwargs.pop("shell", "#!/bin/bash")
+        self._runner = CommandRunner()
 
     def _write_script(self, ws_path, step):
         """
@@ -96,6 +97,14 @@ class LocalScriptAdapter(ScriptAdapter):
 
         return to_be_scheduled, script_path, restart_path
 
+    def get_status_scope(self):
+        """
+        Return a key for the set of jobs that check_jobs can observe.
+
+        :returns: A hashable key shared by all local adapters.
+        """
+        return ("local",)
+
     def check_jobs(self, joblist):
         """
         For the given job list, query execution status.
@@ -125,15 +134,11 @@ class LocalScriptAdapter(ScriptAdapter):
         """
         LOGGER.debug("cwd = %s", cwd)
         LOGGER.debug("Script to execute: %s", path)
-        p = Popen(path, shell=False, stdout=PIPE, stderr=PIPE, cwd=cwd,
-                  env=env)
-        pid = p.pid
-        output, err = p.communicate()
-        retcode = p.wait()
+        result = self._runner.run(path, cwd=cwd, env=env, shell=False)
 
-        if retcode == 0:
+        if result.retcode == 0:
             LOGGER.info("Execution returned status OK.")
-            return SubmissionCode.OK, pid
+            return SubmissionCode.OK, result.pid
         else:
-            LOGGER.warning("Execution returned an error: {}", str(err))
-            return SubmissionCode.ERROR, pid
+            LOGGER.warning("Execution returned an error: %s", result.err)
+            return SubmissionCode.ERROR, result.pid
@@ -0,0 +1,545 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Simulated scheduler interface for load testing the conductor."""
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from maestrowf.abstracts.interfaces import SchedulerScriptAdapter
+from maestrowf.abstracts.enums import CancelCode, JobStatusCode, State, \
+    SubmissionCode
+
+LOGGER = logging.getLogger(__name__)
+
+# Distributions that queue delays and runtimes can be sampled from. Each is
+# specified as a string of the form "name(arg, ...)" or as a plain number,
+# which is treated as a constant.
+DISTRIBUTIONS = {
+    "constant": lambda rng, value: value,
+    "uniform": lambda rng, low, high: rng.uniform(low, high),
+    "exponential": lambda rng, mean: rng.expovariate(1.0 / mean)
+    if mean > 0 else 0.0,
+    "normal": lambda rng, mu, sigma: rng.gauss(mu, sigma),
+    "lognormal": lambda rng, mu, sigma: rng.lognormvariate(mu, sigma),
+}
+DIST_REGEX = re.compile(r"^\s*(?P<name>[a-z]+)\s*\((?P<args>[^)]*)\)\s*$")
+CLOCKS = ("virtual", "wall")
+
+
+def parse_distribution(spec):
+    """
+    Parse the specification of a distribution.
+
+    :param spec: A number or a string of the form "name(arg, ...)" where name
+    is a key of DISTRIBUTIONS.
+    :returns: A tuple of the distribution name and a tuple of its arguments.
+    """
+    try:
+        return "constant", (float(spec),)
+    except (TypeError, ValueError):
+        pass
+
+    match = DIST_REGEX.match(str(spec))
+    if not match or match.group("name") not in DISTRIBUTIONS:
+        msg = "'{}' is not a valid distribution. Specify a number or one of " \
+              "{} with arguments (ex. 'uniform(10, 60)')." \
+              .format(spec, ", ".join(sorted(DISTRIBUTIONS)))
+        LOGGER.error(msg)
+        raise ValueError(msg)
+
+    try:
+        args = tuple(float(arg) for arg in match.group("args").split(","))
+    except ValueError:
+        msg = "Arguments to distribution '{}' must be numbers.".format(spec)
+        LOGGER.error(msg)
+        raise ValueError(msg)
+
+    return match.group("name"), args
+
+
+class _SimulatedQueue(object):
+    """
+    The job queue of a simulated scheduler.
+
+    The queue is kept in process and shared by every adapter simulating the
+    same scheduler. If a path is specified, every change to the queue is also
+    appended to a journal at that path and replayed, so that a queue outlives
+    the process that created it.
+
+    Journal entries are one per line and are idempotent:
+        - "J <jobid> <submitted> <started> <ended> <state>": Accepted job.
+        - "R <jobid>": Rejected submission.
+        - "C <jobid> <time>": Job cancelled.
+        - "T <clock>": Virtual clock advanced.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initialize an empty simulated queue.
+
+        :param path: Path to the journal of the queue (default: None).
+        """
+        self.jobs = {}
+        self.clock = 0.0
+        self.created = time.time()
+        self.next_id = 1
+        self.lock = threading.Lock()
+        self._path = path
+        self._offset = 0
+
+    def replay(self):
+        """Apply journal entries written since the last replay."""
+        if not self._path or not os.path.exists(self._path):
+            return
+
+        with open(self._path, "r") as journal:
+            journal.seek(self._offset)
+            for line in journal:
+                if not line.endswith("\n"):
+                    # Partially written entry, pick it up on the next replay.
+                    break
+                self._offset += len(line)
+                self._apply(line.split())
+
+    def record(self, *entry):
+        """
+        Apply an entry to the queue and append it to the journal.
+
+        :param *entry: The fields of a journal entry.
+        """
+        entry = [str(field) for field in entry]
+        self._apply(entry)
+        if self._path:
+            with open(self._path, "a") as journal:
+                journal.write(" ".join(entry) + "\n")
+
+    def _apply(self, entry):
+        """
+        Apply a single journal entry to the queue.
+
+        :param entry: A list of the fields of a journal entry.
+        """
+        if not entry:
+            return
+
+        if entry[0] == "J":
+            self.jobs[entry[1]] = (float(entry[2]), float(entry[3]),
+                                   float(entry[4]), entry[5])
+            self.next_id = max(self.next_id, int(entry[1]) + 1)
+        elif entry[0] == "R":
+            self.next_id = max(self.next_id, int(entry[1]) + 1)
+        elif entry[0] == "C" and entry[1] in self.jobs:
+            submitted, started, ended, state = self.jobs[entry[1]]
+            cancelled = float(entry[2])
+            if cancelled < ended:
+                self.jobs[entry[1]] = (submitted, min(started, cancelled),
+                                       cancelled, State.FAILED.name)
+        elif entry[0] == "T":
+            self.clock = max(self.clock, float(entry[1]))
+
+
+class SimulatedScriptAdapter(SchedulerScriptAdapter):
+    """
+    A ScriptAdapter class that simulates a cluster scheduler.
+
+    No scripts are executed. Each submission is assigned a queue delay,
+    runtime, and final state drawn from random streams seeded by the
+    adapter's seed and the job identifier, so a study replays identically
+    for the same settings regardless of how often status is checked.
+    """
+
+    # Queues of all simulated schedulers in this process. Adapters are
+    # instantiated per operation, so the queues must outlive them.
+    _queues = {}
+    _queues_lock = threading.Lock()
+
+    def __init__(self, **kwargs):
+        """
+        Initialize an instance of the SimulatedScriptAdapter.
+
+        The expected keyword arguments that are expected when the simulated
+        adapter is instantiated are as follows (all are optional):
+        - queue: Name of the simulated queue (default: "default").
+        - state_file: Path to a journal that persists the queue.
+        - seed: Seed for the random streams of each job (default: 0).
+        - clock: "virtual" (default) to advance time by 'tick' seconds on
+          every status check, or "wall" to use the system clock.
+        - tick: Seconds a virtual clock advances per status check (default:
+          1).
+        - queue_delay: Distribution of time spent pending (default: 0).
+        - runtime: Distribution of time spent running (default: 0).
+        - failure_rate: Fraction of jobs that fail (default: 0).
+        - timeout_rate: Fraction of jobs that time out (default: 0).
+        - hwfailure_rate: Fraction of jobs that fail due to hardware
+          (default: 0).
+        - submit_error_rate: Fraction of submissions rejected (default: 0).
+        - submit_latency: Seconds each submission blocks for (default: 0).
+        - query_latency: Seconds each status check blocks for (default: 0).
+        - status_ttl: Seconds a status check result is reused for (default:
+          0).
+        - status_cache: Path to a file that shares status check results
+          between processes (optional).
+        - nodes: The number of compute nodes to be reserved for computing.
+
+        :param **kwargs: A dictionary with default settings for the adapter.
+        """
+        super(SimulatedScriptAdapter, self).__init__()
+
+        self.add_batch_parameter("nodes", kwargs.pop("nodes", "1"))
+
+        self._seed = str(kwargs.pop("seed", 0))
+        self._clock = str(kwargs.pop("clock", "virtual")).lower()
+        if self._clock not in CLOCKS:
+            msg = "Simulated clock '{}' is not one of {}." \
+                  .format(self._clock, ", ".join(CLOCKS))
+            LOGGER.error(msg)
+            raise ValueError(msg)
+        self._tick = float(kwargs.pop("tick", 1))
+
+        self._queue_delay = parse_distribution(kwargs.pop("queue_delay", 0))
+        self._runtime = parse_distribution(kwargs.pop("runtime", 0))
+        self._failure_rate = float(kwargs.pop("failure_rate", 0))
+        self._timeout_rate = float(kwargs.pop("timeout_rate", 0))
+        self._hwfailure_rate = float(kwargs.pop("hwfailure_rate", 0))
+        self._submit_error_rate = float(kwargs.pop("submit_error_rate", 0))
+        self._submit_latency = float(kwargs.pop("submit_latency", 0))
+        self._query_latency = float(kwargs.pop("query_latency", 0))
+        self.set_status_cache(kwargs.pop("status_ttl", 0),
+                              kwargs.pop("status_cache", None))
+
+        total = self._failure_rate + self._timeout_rate + self._hwfailure_rate
+        if total > 1:
+            msg = "Simulated failure, timeout, and hardware failure rates " \
+                  "sum to {}, which is greater than 1.".format(total)
+            LOGGER.error(msg)
+            raise ValueError(msg)
+
+        state_file = kwargs.pop("state_file", None)
+        key = os.path.abspath(state_file) if state_file \
+            else kwargs.pop("queue", "default")
+        with self._queues_lock:
+            if key not in self._queues:
+                self._queues[key] = _SimulatedQueue(state_file)
+            self._queue = self._queues[key]
+        # A queue without a journal only exists in this process.
+        self._queue_key = key if state_file else \
+            (key, os.getpid(), self._queue.created)
+
+        self._exec = "#!/bin/bash"
+        self._header = {
+            "nodes": "# nodes: {nodes}",
+            "walltime": "# walltime: {walltime}",
+            "job-name": "# job-name: {job-name}",
+        }
+
+        self._cmd_flags = {
+            "cmd": "srun",
+            "ntasks": "-n",
+            "nodes": "-N",
+        }
+
+    def get_header(self, step):
+        """
+        Generate the header present at the top of simulated scripts.
+
+        :param step: A StudyStep instance.
+        :returns: A string of the header based on internal batch parameters and
+        the parameter step.
+        """
+        run = dict(step.run)
+        batch_header = dict(self._batch)
+        batch_header["walltime"] = run.pop("walltime", "")
+        batch_header["nodes"] = run.pop("nodes", self._batch["nodes"])
+        batch_header["job-name"] = step.name.replace(" ", "_")
+
+        modified_header = [self._exec]
+        for key, value in self._header.items():
+            modified_header.append(value.format(**batch_header))
+
+        return "\n".join(modified_header)
+
+    def get_parallelize_command(self, procs, nodes=1):
+        """
+        Generate the parallelization segement of the command line.
+
+        :param procs: Number of processors to allocate to the parallel call.
+        :param nodes: Number of nodes to allocate to the parallel call
+        (default = 1).
+        :returns: A string of the parallelize command configured using nodes
+        and procs.
+        """
+        args = [
+            self._cmd_flags["cmd"],
+            self._cmd_flags["nodes"],
+            str(nodes),
+            self._cmd_flags["ntasks"],
+            str(procs)
+        ]
+
+        return " ".join(args)
+
+    def _now(self):
+        """
+        Get the current time of the simulated scheduler.
+
+        :returns: The time in seconds on the clock of the adapter.
+        """
+        if self._clock == "wall":
+            return time.time()
+        return self._queue.clock
+
+    def _sample(self, rng, distribution):
+        """
+        Draw a non-negative duration from a distribution.
+
+        :param rng: The random.Random instance to draw from.
+        :param distribution: A tuple of a distribution name and its arguments.
+        :returns: The sampled duration in seconds.
+        """
+        name, args = distribution
+        return max(0.0, DISTRIBUTIONS[name](rng, *args))
+
+    def submit(self, step, path, cwd, job_map=None, env=None):
+        """
+        Submit a script to the simulated scheduler.
+
+        :param step: The StudyStep instance this submission is based on.
+        :param path: Local path to the script to be executed.
+        :param cwd: Path to the current working directory.
+        :param job_map: A dictionary mapping step names to their job
+        identifiers.
+        :param env: A dict containing a modified environment for execution.
+        :returns: The return status of the submission command and job
+        identiifer.
+        """
+        return self._submit()
+
+    def submit_after(self, step, path, cwd, jobid):
+        """
+        Submit a script that only starts if a job ends unsuccessfully.
+
+        The script starts once the job ends if it ends in any state but
+        FINISHED, and otherwise stays pending until it is cancelled.
+
+        :param step: The StudyStep instance this submission is based on.
+        :param path: Local path to the script to be executed.
+        :param cwd: Path to the current working directory.
+        :param jobid: Identifier of the job the script is to follow.
+        :returns: The return status of the submission command and job
+        identiifer.
+        """
+        return self._submit(after=jobid)
+
+    def _submit(self, after=None):
+        """
+        Add a job to the simulated queue.
+
+        :param after: Identifier of a job the new job may only start after,
+        if that job ends unsuccessfully (optional).
+        :returns: The return status of the submission command and job
+        identiifer.
+        """
+        if self._submit_latency:
+            time.sleep(self._submit_latency)
+
+        with self._queue.lock:
+            self._queue.replay()
+            jobid = self._queue.next_id
+            rng = random.Random("{}:{}".format(self._seed, jobid))
+
+            if rng.random() < self._submit_error_rate:
+                self._queue.record("R", jobid)
+                LOGGER.warning("Submission returned an error.")
+                return SubmissionCode.ERROR, -1
+
+            submitted = self._now()
+            started = submitted + self._sample(rng, self._queue_delay)
+            runtime = self._sample(rng, self._runtime)
+            if after is not None:
+                job = self._queue.jobs.get(str(after))
+                if job is None:
+                    self._queue.record("R", jobid)
+                    LOGGER.warning("Submission returned an error.")
+                    return SubmissionCode.ERROR, -1
+                # The dependency is never satisfied by a finished job.
+                started = float("inf") if job[3] == State.FINISHED.name \
+                    else max(started, job[2])
+
+            draw = rng.random()
+            if draw < self._failure_rate:
+                state = State.FAILED
+                runtime *= rng.random()
+            elif draw < self._failure_rate + self._timeout_rate:
+                state = State.TIMEDOUT
+            elif draw < self._failure_rate + self._timeout_rate + \
+                    self._hwfailure_rate:
+                state = State.HWFAILURE
+                runtime *= rng.random()
+            else:
+                state = State.FINISHED
+
+            self._queue.record("J", jobid, repr(submitted), repr(started),
+                               repr(started + runtime), state.name)
+
+        LOGGER.info("Submission returned status OK.")
+        return SubmissionCode.OK, str(jobid)
+
+    def cancel(self, joblist):
+        """
+        Cancel a list of jobs in the simulated queue.
+
+        :param joblist: A list of job identifiers to be cancelled.
+        :returns: The return code of the cancel command.
+        """
+        with self._queue.lock:
+            self._queue.replay()
+            now = self._now()
+            for jobid in joblist:
+                self._queue.record("C", jobid, repr(now))
+
+        return CancelCode.OK
+
+    def get_status_scope(self):
+        """
+        Return a key for the set of jobs that check_jobs can observe.
+
+        :returns: A hashable key for the simulated queue.
+        """
+        return ("simulated", self._queue_key)
+
+    def check_jobs(self, joblist):
+        """
+        For the given job list, query execution status.
+
+        When using a virtual clock, every call advances the clock by a tick
+        before job states are evaluated.
+
+        :param joblist: A list of job identifiers to be queried.
+        :returns: The return code of the status query, and a dictionary of job
+        identifiers to their status.
+        """
+        if self._query_latency:
+            time.sleep(self._query_latency)
+
+        status = {}
+        with self._queue.lock:
+            self._queue.replay()
+            if self._clock == "virtual":
+                self._queue.record("T", repr(self._queue.clock + self._tick))
+
+            now = self._now()
+            for jobid in joblist:
+                job = self._queue.jobs.get(str(jobid))
+                if job is None:
+                    status[jobid] = None
+                    continue
+
+                submitted, started, ended, state = job
+                if now < started:
+                    status[jobid] = State.PENDING
+                elif now < ended:
+                    status[jobid] = State.RUNNING
+                else:
+                    status[jobid] = self._state(state)
+
+            if not self._queue.jobs:
+                return JobStatusCode.NOJOBS, status
+
+        return JobStatusCode.OK, status
+
+    def get_bundle_status(self, job_state, markers):
+        """
+        Derive the status of each step in a bundle.
+
+        Simulated jobs do not run their scripts, so every step in a bundle
+        takes the state of the bundle job.
+
+        :param job_state: The State of the bundle job (None if not found).
+        :param markers: A list of the marker paths of the steps.
+        :returns: A list of the State of each step.
+        """
+        return [job_state] * len(markers)
+
+    def _state(self, job_state):
+        """
+        Map a simulated job state to a Study.State enum.
+
+        :param job_state: Name of the final state recorded for a job.
+        :returns: A Study.State enum corresponding to parameter job_state.
+        """
+        try:
+            return State[job_state]
+        except KeyError:
+            return State.UNKNOWN
+
+    def _write_script(self, ws_path, step):
+        """
+        Write a simulated script to the workspace of a workflow step.
+
+        :param ws_path: Path to the workspace directory of the step.
+        :param step: An instance of a StudyStep.
+        :returns: Boolean value (True if to be scheduled), the path to the
+        written script for run["cmd"], and the path to the script written for
+        run["restart"] (if it exists).
+        """
+        to_be_scheduled, cmd, restart = self.get_scheduler_command(step)
+
+        fname = "{}.sim.sh".format(step.name)
+        script_path = os.path.join(ws_path, fname)
+        with open(script_path, "w") as script:
+            if to_be_scheduled:
+                script.write(self.get_header(step))
+                script.write(self._get_marker_commands(step))
+            else:
+                script.write(self._exec)
+
+            cmd = "\n\n{}\n".format(cmd)
+            script.write(cmd)
+
+        if restart:
+            rname = "{}.restart.sim.sh".format(step.name)
+            restart_path = os.path.join(ws_path, rname)
+
+            with open(restart_path, "w") as script:
+                if to_be_scheduled:
+                    script.write(self.get_header(step))
+                    script.write(self._get_marker_commands(step, True))
+                else:
+                    script.write(self._exec)
+
+                cmd = "\n\n{}\n".format(restart)
+                script.write(cmd)
+        else:
+            restart_path = None
+
+        return to_be_scheduled, script_path, restart_path
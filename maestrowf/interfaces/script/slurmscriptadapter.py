@@ -32,10 +32,12 @@ import getpass
 import logging
 import os
 import re
-from subprocess import PIPE, Popen
+from six.moves import shlex_quote
 
 from maestrowf.abstracts.interfaces import SchedulerScriptAdapter
-from maestrowf.abstracts.enums import JobStatusCode, State, SubmissionCode
+from maestrowf.abstracts.enums import CancelCode, JobStatusCode, State, \
+    SubmissionCode
+from maestrowf.commandrunner import CommandRunner
 
 LOGGER = logging.getLogger(__name__)
 
@@ -58,6 +60,14 @@ class SlurmScriptAdapter(SchedulerScriptAdapter):
         - bank: The account to charge computing time to.
         - queue: Scheduler queue scripts should be submitted to.
         - nodes: The number of compute nodes to be reserved for computing.
+        - submit_timeout: Seconds before sbatch is killed (default: 120).
+        - query_timeout: Seconds before squeue is killed (default: 120).
+        - query_retries: Times a failed squeue is retried (default: 2).
+        - nodes_timeout: Seconds before sacct is killed when looking up the
+          nodes of failed jobs (default: 10).
+        - status_ttl: Seconds a squeue result is reused for (default: 0).
+        - status_cache: Path to a file that shares squeue results between
+          processes (optional).
 
         :param **kwargs: A dictionary with default settings for the adapter.
         """
@@ -70,6 +80,17 @@ class SlurmScriptAdapter(SchedulerScriptAdapter):
         self.add_batch_parameter("queue", kwargs.pop("queue"))
         self.add_batch_parameter("nodes", kwargs.pop("nodes", "1"))
 
+        # Submissions are not retried here since a submission that timed out
+        # may still have been queued. The ExecutionGraph decides whether to
+        # attempt a submission again.
+        self._submit_timeout = float(kwargs.pop("submit_timeout", 120))
+        self._query_timeout = float(kwargs.pop("query_timeout", 120))
+        self._query_retries = int(kwargs.pop("query_retries", 2))
+        self._nodes_timeout = float(kwargs.pop("nodes_timeout", 10))
+        self._runner = CommandRunner()
+        self.set_status_cache(kwargs.pop("status_ttl", 0),
+                              kwargs.pop("status_cache", None))
+
         self._exec = "#!/bin/bash"
         self._header = {
             "nodes": "#SBATCH -N {nodes}",
@@ -144,24 +165,125 @@ class SlurmScriptAdapter(SchedulerScriptAdapter):
         :returns: The return status of the submission command and job
         identiifer.
         """
-        cmd = " ".join(["sbatch", path, "-D", cwd])
+        return self._submit(step, path, cwd, env=env)
+
+    def submit_after(self, step, path, cwd, jobid):
+        """
+        Submit a script that only starts if a job ends unsuccessfully.
+
+        The script is submitted with an afternotok dependency, which Slurm
+        releases when the job times out but also when it fails, loses its
+        node or is cancelled (see ScriptAdapter.submit_after).
+
+        :param step: The StudyStep instance this submission is based on.
+        :param path: Local path to the script to be executed.
+        :param cwd: Path to the current working directory.
+        :param jobid: Identifier of the job the script is to follow.
+        :returns: The return status of the submission command and job
+        identiifer.
+        """
+        return self._submit(step, path, cwd, after=jobid)
+
+    def _submit(self, step, path, cwd, env=None, after=None):
+        """
+        Submit a script to the Slurm scheduler with sbatch.
+
+        :param step: The StudyStep instance this submission is based on.
+        :param path: Local path to the script to be executed.
+        :param cwd: Path to the current working directory.
+        :param env: A dict containing a modified environment for execution.
+        :param after: Identifier of a job the script may only start after,
+        if that job ends unsuccessfully (optional).
+        :returns: The return status of the submission command and job
+        identiifer.
+        """
+        cmd = ["sbatch"]
+        # Nodes excluded after hardware failures (see get_job_nodes).
+        if step.run.get("exclude"):
+            cmd.append("--exclude={}".format(
+                shlex_quote(step.run["exclude"])))
+        if after is not None:
+            cmd.append("{}=afternotok:{}".format(self._cmd_flags["depends"],
+                                                 after))
+        cmd = " ".join(cmd + [path, "-D", cwd])
         LOGGER.debug("cwd = %s", cwd)
         LOGGER.debug("Command to execute: %s", cmd)
-        p = Popen(cmd, shell=True, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env)
-        output, err = p.communicate()
-        retcode = p.wait()
-
-        # TODO: We need to check for dependencies here. The sbatch is where
-        # dependent batch jobs are specified. If we're trying to launch
-        # everything at once then that should happen here.
+        result = self._runner.run(cmd, cwd=cwd, env=env,
+                                  timeout=self._submit_timeout, retries=0)
 
-        if retcode == 0:
+        if result.retcode == 0 and not result.timed_out:
             LOGGER.info("Submission returned status OK.")
-            return SubmissionCode.OK, re.search('[0-9]+', output).group(0)
+            return SubmissionCode.OK, \
+                re.search('[0-9]+', result.output).group(0)
         else:
             LOGGER.warning("Submission returned an error.")
             return SubmissionCode.ERROR, -1
 
+    def cancel(self, joblist):
+        """
+        Cancel a list of jobs with scancel.
+
+        :param joblist: A list of job identifiers to be cancelled.
+        :returns: The return code of the cancel command.
+        """
+        if not joblist:
+            return CancelCode.OK
+
+        cmd = "scancel {}".format(" ".join(str(jobid) for jobid in joblist))
+        result = self._runner.run(cmd, timeout=self._submit_timeout,
+                                  retries=self._query_retries)
+        if result.retcode == 0 and not result.timed_out:
+            return CancelCode.OK
+
+        LOGGER.warning("Cancelling jobs %s returned an error.",
+                       ", ".join(str(jobid) for jobid in joblist))
+        return CancelCode.ERROR
+
+    def get_status_scope(self):
+        """
+        Return a key for the set of jobs that check_jobs can observe.
+
+        Status is queried for all of the user's jobs, so every study submitted
+        by the same user can share a query.
+
+        :returns: A hashable key for the jobs of the current user.
+        """
+        return ("slurm", getpass.getuser())
+
+    def get_job_nodes(self, joblist):
+        """
+        Return the nodes jobs ran on, to be avoided when resubmitting them.
+
+        All of the jobs are looked up with a single sacct call, which has a
+        short timeout and is not retried so that a slow accounting database
+        does not hold up the conductor.
+
+        :param joblist: A list of job identifiers to look up.
+        :returns: A dictionary of job identifiers to a list holding each job's
+        Slurm node list. Jobs whose nodes are unknown are left out.
+        """
+        if not joblist:
+            return {}
+
+        # sacct options:
+        # -n = no header, -X = the job allocation only, -P = parsable.
+        cmd = "sacct -n -X -P -j {} -o JobID,NodeList" \
+            .format(",".join(str(jobid) for jobid in joblist))
+        result = self._runner.run(cmd, timeout=self._nodes_timeout,
+                                  retries=0)
+        if result.retcode != 0 or result.timed_out:
+            LOGGER.warning("Unable to look up the nodes of jobs %s.",
+                           ", ".join(str(jobid) for jobid in joblist))
+            return {}
+
+        nodes = {}
+        for line in result.output.strip().split("\n"):
+            jobid, _, nodelist = line.strip().partition("|")
+            nodelist = nodelist.strip()
+            if jobid and nodelist and nodelist != "None assigned":
+                nodes[jobid] = [nodelist]
+        return nodes
+
     def check_jobs(self, joblist):
         """
         For the given job list, query execution status.
@@ -178,9 +300,12 @@ class SlurmScriptAdapter(SchedulerScriptAdapter):
         # -u = username to search queues for.
         # -t = list of job states to search for. 'all' for all states.
         cmd = "squeue -u $USER -t all"
-        p = Popen(cmd, shell=True, stdout=PIPE, stderr=PIPE)
-        output, err = p.communicate()
-        retcode = p.wait()
+        # squeue returns 1 when the user has no jobs, which is not a failure.
+        result = self._runner.run(cmd, timeout=self._query_timeout,
+                                  retries=self._query_retries,
+                                  ok_codes=(0, 1))
+        retcode = None if result.timed_out else result.retcode
+        output = result.output
 
         status = {}
         for jobid in joblist:
@@ -276,6 +401,7 @@ class SlurmScriptAdapter(SchedulerScriptAdapter):
         with open(script_path, "w") as script:
             if to_be_scheduled:
                 script.write(self.get_header(step))
+                script.write(self._get_marker_commands(step))
             else:
                 script.write(self._exec)
 
@@ -289,6 +415,7 @@ class SlurmScriptAdapter(SchedulerScriptAdapter):
             with open(restart_path, "w") as script:
                 if to_be_scheduled:
                     script.write(self.get_header(step))
+                    script.write(self._get_marker_commands(step, True))
                 else:
                     script.write(self._exec)
 
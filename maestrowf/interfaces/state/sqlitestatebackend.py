@@ -0,0 +1,252 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""SQLite backed study state store."""
+import logging
+import sqlite3
+
+from maestrowf.abstracts.enums import State
+from maestrowf.abstracts.interfaces import StateBackend
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    name TEXT PRIMARY KEY,
+    abstract_name TEXT,
+    workspace TEXT,
+    state TEXT,
+    num_restarts INTEGER,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS edges (
+    src TEXT,
+    dest TEXT,
+    PRIMARY KEY (src, dest)
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    step TEXT,
+    attempt INTEGER,
+    jobid TEXT,
+    state TEXT,
+    submitted REAL,
+    updated REAL,
+    PRIMARY KEY (step, attempt)
+);
+CREATE TABLE IF NOT EXISTS jobids (
+    jobid TEXT PRIMARY KEY,
+    step TEXT
+);
+CREATE INDEX IF NOT EXISTS steps_state ON steps (state);
+CREATE INDEX IF NOT EXISTS steps_abstract_name ON steps (abstract_name);
+CREATE INDEX IF NOT EXISTS steps_updated ON steps (updated);
+CREATE INDEX IF NOT EXISTS edges_dest ON edges (dest);
+"""
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    A StateBackend that stores study state in a local SQLite database.
+
+    The database is opened in write-ahead logging (WAL) mode so that external
+    tools can query study state while the conductor is updating it. Steps are
+    indexed on their state and the name of the abstract step they were
+    expanded from so that queries are proportional to the size of their
+    result rather than the size of the study.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Initialize an instance of the SQLiteStateBackend.
+
+        The expected keyword arguments are as follows:
+        - path: Path to the SQLite database file.
+        - timeout: Seconds to wait on a locked database (default: 30).
+
+        :param **kwargs: A dictionary with settings for the backend.
+        """
+        self._path = kwargs.pop("path")
+        self._timeout = kwargs.pop("timeout", 30)
+        self._conn = None
+        # Map of step names to the last_updated value that was written.
+        self._synced = {}
+
+    @property
+    def connection(self):
+        """
+        Return the connection to the database, opening it if needed.
+
+        :returns: A sqlite3 Connection to the backend's database.
+        """
+        if self._conn is None:
+            LOGGER.debug("Opening state database %s", self._path)
+            self._conn = sqlite3.connect(self._path, timeout=self._timeout)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+        return self._conn
+
+    def initialize(self, graph):
+        """
+        Record the steps and edges of an ExecutionGraph.
+
+        :param graph: The ExecutionGraph instance to be recorded.
+        """
+        steps = []
+        edges = []
+        for name, record in graph.values.items():
+            # Skip the source node, it has no record.
+            if record is None:
+                continue
+
+            steps.append((name, record.abstract_name, record.workspace,
+                          record.status.name, record.num_restarts,
+                          record.last_updated))
+
+        for src, dests in graph.adjacency_table.items():
+            for dest in dests:
+                edges.append((src, dest))
+
+        with self.connection as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO steps (name, abstract_name, workspace,"
+                " state, num_restarts, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                steps)
+            conn.executemany(
+                "INSERT OR IGNORE INTO edges (src, dest) VALUES (?, ?)",
+                edges)
+
+        LOGGER.info("Recorded %d steps and %d edges in %s.",
+                    len(steps), len(edges), self._path)
+
+    def update(self, graph):
+        """
+        Update the store with the current state of each step in a graph.
+
+        Only steps whose state has changed since the last update are written.
+        Each job of a step is recorded as an attempt with the time it was
+        submitted and the state it reached.
+
+        :param graph: The ExecutionGraph instance whose state is recorded.
+        """
+        steps = []
+        attempts = []
+        jobids = []
+        for name, record in graph.values.items():
+            if record is None:
+                continue
+
+            if self._synced.get(name) == record.last_updated:
+                continue
+
+            steps.append((record.status.name, record.num_restarts,
+                          record.last_updated, name))
+            for attempt, (jobid, submitted, state, updated) in \
+                    enumerate(record.get_attempts(), 1):
+                attempts.append((name, attempt, str(jobid), state.name,
+                                 submitted, updated))
+                jobids.append((str(jobid), name))
+
+            self._synced[name] = record.last_updated
+
+        if not steps:
+            return
+
+        with self.connection as conn:
+            conn.executemany(
+                "UPDATE steps SET state = ?, num_restarts = ?, updated = ? "
+                "WHERE name = ?", steps)
+            conn.executemany(
+                "INSERT OR REPLACE INTO attempts (step, attempt, jobid, state,"
+                " submitted, updated) VALUES (?, ?, ?, ?, ?, ?)", attempts)
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobids (jobid, step) VALUES (?, ?)",
+                jobids)
+
+        LOGGER.debug("Updated %d steps in %s.", len(steps), self._path)
+
+    def get_steps(self, state=None, abstract_name=None, updated_before=None):
+        """
+        Query the steps recorded in the store.
+
+        :param state: Only return steps in this State (optional).
+        :param abstract_name: Only return steps expanded from the abstract
+        step with this name (optional).
+        :param updated_before: Only return steps whose state last changed
+        before this time in seconds since the epoch (optional).
+        :returns: A list of dictionaries describing each matching step.
+        """
+        query = "SELECT name, abstract_name, workspace, state, " \
+                "num_restarts, updated FROM steps"
+        clauses = []
+        args = []
+        if state is not None:
+            clauses.append("state = ?")
+            args.append(state.name)
+        if abstract_name is not None:
+            clauses.append("abstract_name = ?")
+            args.append(abstract_name)
+        if updated_before is not None:
+            clauses.append("updated < ?")
+            args.append(updated_before)
+
+        if clauses:
+            query = "{} WHERE {}".format(query, " AND ".join(clauses))
+
+        steps = []
+        for row in self.connection.execute(query, args):
+            steps.append({
+                "name": row[0],
+                "abstract_name": row[1],
+                "workspace": row[2],
+                "state": State[row[3]],
+                "restarts": row[4],
+                "updated": row[5],
+            })
+
+        return steps
+
+    def get_jobids(self, step):
+        """
+        Return the job identifiers submitted for a step.
+
+        :param step: Name of the step.
+        :returns: A list of job identifiers in order of submission.
+        """
+        cursor = self.connection.execute(
+            "SELECT jobid FROM attempts WHERE step = ? ORDER BY attempt",
+            (step,))
+        return [row[0] for row in cursor]
+
+    def close(self):
+        """Close the connection to the database."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
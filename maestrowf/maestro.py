@@ -37,9 +37,17 @@ from subprocess import Popen, PIPE
 import six
 import sys
 
+from maestrowf.conductor import display_status
 from maestrowf.datastructures import YAMLSpecification
 from maestrowf.datastructures.core import Study
+from maestrowf.datastructures.core.executiongraph import PRIORITIZERS
+from maestrowf.datastructures.core.study import WORKSPACE_LAYOUTS
 from maestrowf.datastructures.environment import Variable
+from maestrowf.datastructures.yamlspecification import SPEC_CACHE
+from maestrowf.interfaces import StateBackendFactory
+from maestrowf.maestrod import get_daemon_pid, register_study
+from maestrowf.profiler import PROFILE_FORMATS, Profiler
+from maestrowf.runtimehistory import RUNTIME_HISTORY
 from maestrowf.utils import create_parentdir
 
 
@@ -66,11 +74,11 @@ def setup_argparser():
 
     parser.add_argument("specification", type=str, help="The path to a Study"
                         " YAML specification that will be loaded and "
-                        "executed.")
+                        "executed (or a study directory when checking "
+                        "status).")
     parser.add_argument("-s", "--status", action="store_true",
-                        help="Check the status of the ExecutionGraph "
-                        "located as specified by the 'directory' "
-                        "argument.")
+                        help="Check the status of the study located in the "
+                        "directory specified in place of a specification.")
     parser.add_argument("-l", "--logpath", type=str,
                         help="Alternate path to store program logging.")
     parser.add_argument("-d", "--debug_lvl", type=int, default=2,
@@ -87,6 +95,76 @@ def setup_argparser():
                         "wait between job status checks.")
     parser.add_argument("-y", "--autoyes", action="store_true", default=False,
                         help="Automatically answer yes to input prompts.")
+    backends = sorted(StateBackendFactory.get_valid_backends())
+    parser.add_argument("--state_backend", type=str, default=None,
+                        choices=backends,
+                        help="Also record study state in a queryable backend "
+                        "stored in the study directory.")
+    parser.add_argument("--max_in_flight", type=int, default=0,
+                        help="Maximum number of scheduled steps submitted "
+                        "and unfinished at once (default: no limit).")
+    parser.add_argument("--submit_rate", type=float, default=0,
+                        help="Maximum average number of submissions per "
+                        "second (default: no limit).")
+    parser.add_argument("--submit_burst", type=int, default=0,
+                        help="Maximum number of submissions at once when "
+                        "--submit_rate is set.")
+    parser.add_argument("--rejection_retries", type=int, default=0,
+                        help="Times a step whose submission was rejected is "
+                        "queued again before it fails.")
+    parser.add_argument("--rejection_delay", type=float, default=60,
+                        help="Seconds before resubmitting a step whose "
+                        "submission was rejected, doubled with each "
+                        "rejection (default: %(default)s).")
+    parser.add_argument("--hwfailure_retries", type=int, default=3,
+                        help="Times a step is resubmitted after a hardware "
+                        "failure before it fails (default: %(default)s).")
+    parser.add_argument("--hwfailure_delay", type=float, default=60,
+                        help="Seconds before resubmitting a step after a "
+                        "hardware failure, growing with each failure "
+                        "(default: %(default)s).")
+    parser.add_argument("--prioritizer", type=str, default=PRIORITIZERS[0],
+                        choices=PRIORITIZERS,
+                        help="Order in which queued steps are submitted "
+                        "(critical_path estimates runtimes from step "
+                        "walltimes and finished steps).")
+    parser.add_argument("--workspace_layout", type=str,
+                        default=WORKSPACE_LAYOUTS[0],
+                        choices=WORKSPACE_LAYOUTS,
+                        help="Layout of the workspaces of parameterized "
+                        "steps: flat, sharded by a hash prefix, or nested by "
+                        "parameter (default: %(default)s).")
+    parser.add_argument("--stage_workers", type=int, default=1,
+                        help="Number of processes to expand the parameter "
+                        "combinations of the study with (default: "
+                        "%(default)s).")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Number of independent shards to split the "
+                        "study into, each with its own state and conductor "
+                        "(default: %(default)s).")
+    parser.add_argument("--runtime_history", type=str, default=None,
+                        help="Record step runtimes to this database, which "
+                        "is used to predict the walltime of steps that set "
+                        "'auto_walltime' (default: only recorded to {} for "
+                        "studies with such steps).".format(RUNTIME_HISTORY))
+    parser.add_argument("--no_runtime_history", action="store_true",
+                        default=False,
+                        help="Neither record nor predict step runtimes, even "
+                        "for steps that set 'auto_walltime'.")
+    parser.add_argument("--no_markers", action="store_true", default=False,
+                        help="Do not have scheduled steps write markers, and "
+                        "detect their completion only by querying the "
+                        "scheduler.")
+    parser.add_argument("--service", action="store_true", default=False,
+                        help="Register the study with the maestrod service "
+                        "instead of launching a conductor for it.")
+    parser.add_argument("--profile", type=str, default=None,
+                        choices=PROFILE_FORMATS,
+                        help="Profile study set up (and the launched "
+                        "conductor), writing the profile to the logging "
+                        "path:\n"
+                        "pstats - cProfile output readable with pstats\n"
+                        "trace - Timing spans as Chrome trace JSON")
 
     return parser
 
@@ -147,8 +225,16 @@ def main():
     parser = setup_argparser()
     args = parser.parse_args()
 
+    # If only checking status, read the study's status index and exit.
+    if args.status:
+        sys.exit(display_status(args.specification))
+
+    profiler = Profiler("maestro", args.profile)
+
     # Load the Specification
-    spec = YAMLSpecification.load_specification(args.specification)
+    with profiler.span("load", path=args.specification):
+        spec = YAMLSpecification.load_specification(args.specification,
+                                                    SPEC_CACHE)
     environment = spec.get_study_environment()
     parameters = spec.get_parameters()
     steps = spec.get_study_steps()
@@ -161,11 +247,13 @@ def main():
     # Setup the study.
     study = Study(spec.name, spec.description, studyenv=environment,
                   parameters=parameters, steps=steps)
-    study.setup()
+    with profiler.span("setup"):
+        study.setup(workspace_layout=args.workspace_layout)
     setup_logging(args, study.output_path, study.name)
 
     # Stage the study.
-    path, exec_dag = study.stage()
+    with profiler.span("stage"):
+        path, exec_dag = study.stage(args.stage_workers)
 
     if not spec.batch:
         exec_dag.set_adapter({"type": "local"})
@@ -175,9 +263,53 @@ def main():
     # Copy the spec to the output directory
     shutil.copy(args.specification, path)
 
-    # Generate scripts
-    exec_dag.generate_scripts()
-    exec_dag.pickle(os.path.join(path, "{}.pkl".format(study.name)))
+    # Runtimes are only recorded when asked to or to predict walltimes.
+    auto_walltime = any(record.step.run.get("auto_walltime")
+                        for record in exec_dag.values.values()
+                        if record is not None)
+    history = args.runtime_history or (RUNTIME_HISTORY if auto_walltime
+                                       else None)
+    if history and not args.no_runtime_history:
+        exec_dag.set_runtime_history(history)
+    exec_dag.set_throttle(max_in_flight=args.max_in_flight,
+                          submit_rate=args.submit_rate,
+                          burst=args.submit_burst,
+                          rejection_retries=args.rejection_retries,
+                          retry_delay=args.rejection_delay)
+    exec_dag.set_retry_policy(hwfailure_retries=args.hwfailure_retries,
+                              hwfailure_delay=args.hwfailure_delay)
+
+    # Split the study into shards that are each conducted on their own.
+    if args.shards > 1:
+        with profiler.span("partition", shards=args.shards):
+            shards = exec_dag.partition(args.shards)
+        graphs = [(os.path.join(path, "shards", "{:03d}".format(index)), dag)
+                  for index, dag in enumerate(shards)]
+    else:
+        graphs = [(path, exec_dag)]
+
+    for directory, dag in graphs:
+        create_parentdir(directory)
+        if not args.no_markers:
+            dag.set_marker_dir(os.path.join(directory, "markers"))
+
+        # Generate scripts
+        with profiler.span("generate_scripts", steps=len(dag.values)):
+            dag.generate_scripts()
+        dag.set_prioritizer(args.prioritizer)
+        if args.state_backend:
+            dag.set_state_backend({
+                "type": args.state_backend,
+                "path": os.path.join(directory, "{}.db".format(study.name)),
+            })
+        with profiler.span("pickle"):
+            dag.pickle(os.path.join(directory, "{}.pkl".format(study.name)))
+            dag.write_status(
+                os.path.join(directory, "{}.status".format(study.name)))
+            dag.sync_state()
+
+    logpath = args.logpath or os.path.join(study.output_path, "logs")
+    profiler.dump(logpath, study.name)
 
     # If we are automatically launching, just set the input as yes.
     if args.autoyes:
@@ -185,16 +317,30 @@ def main():
     else:
         uinput = six.moves.input("Would you like to launch the study?[yn] ")
 
-    if uinput.lower() in ACCEPTED_INPUT:
-        # Launch manager with nohup
-        cmd = ["nohup", "conductor",
-               "-t", str(args.sleeptime),
-               "-d", str(args.debug_lvl),
-               path,
-               "&>", "{}.txt".format(os.path.join(
-                study.output_path, exec_dag.name))]
-        LOGGER.debug(" ".join(cmd))
-        Popen(" ".join(cmd), shell=True, stdout=PIPE, stderr=PIPE)
+    if uinput.lower() in ACCEPTED_INPUT and args.service:
+        # Hand the study (or each of its shards) to the running service.
+        for directory, dag in graphs:
+            register_study(directory)
+        if get_daemon_pid() is None:
+            LOGGER.warning("maestrod is not running. The study will be "
+                           "conducted once it is started ('nohup maestrod "
+                           "&').")
+    elif uinput.lower() in ACCEPTED_INPUT:
+        # Launch a manager for the study (or each of its shards) with nohup
+        for directory, dag in graphs:
+            cmd = ["nohup", "conductor",
+                   "-t", str(args.sleeptime),
+                   "-d", str(args.debug_lvl)]
+            if args.profile:
+                cmd += ["--profile", args.profile]
+            cmd += [directory,
+                    "&>", "{}.txt".format(os.path.join(directory, dag.name))]
+            LOGGER.debug(" ".join(cmd))
+            Popen(" ".join(cmd), shell=True, stdout=PIPE, stderr=PIPE)
+    elif len(graphs) > 1:
+        LOGGER.info("Study partitioned into shards in %s, which can each be "
+                    "conducted on their own (for example, by a conductor "
+                    "within an allocation).", os.path.join(path, "shards"))
 
     sys.exit(0)
 
@@ -0,0 +1,455 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""A long-lived conductor that manages many studies in one process."""
+from argparse import ArgumentParser, RawTextHelpFormatter
+from collections import OrderedDict
+import errno
+import glob
+import hashlib
+import inspect
+import logging
+import os
+import signal
+import sys
+from time import sleep
+
+from maestrowf.abstracts.enums import JobStatusCode
+from maestrowf.datastructures.core import ExecutionGraph
+from maestrowf.datastructures.core.executiongraph import _TokenBucket
+from maestrowf.utils import create_parentdir
+
+# Logger instantiation
+rootlogger = logging.getLogger(inspect.getmodule(__name__))
+logger = logging.getLogger(__name__)
+
+# Formatting of logger.
+LFORMAT = "%(asctime)s - %(name)s:%(funcName)s:%(lineno)s - " \
+               "%(levelname)s - %(message)s"
+
+# Directory studies are registered in, and the files kept there.
+REGISTRY = os.path.join(os.path.expanduser("~"), ".maestrowf", "studies")
+PIDFILE = "maestrod.pid"
+REGISTRATION_EXT = ".study"
+FAILED_EXT = ".failed"
+
+
+def register_study(directory, registry=REGISTRY):
+    """
+    Register a study directory to be conducted by maestrod.
+
+    :param directory: The directory where a study has been set up.
+    :param registry: The directory studies are registered in.
+    :returns: The path to the registration.
+    """
+    directory = os.path.abspath(directory)
+    digest = hashlib.sha1(directory.encode("utf-8")).hexdigest()[:8]
+    registration = os.path.join(registry, "{}.{}{}".format(
+        os.path.basename(directory), digest, REGISTRATION_EXT))
+
+    create_parentdir(registry)
+    with open(registration, "w") as reg_file:
+        reg_file.write(directory)
+
+    logger.info("Registered '%s' as %s.", directory, registration)
+    return registration
+
+
+def get_daemon_pid(registry=REGISTRY):
+    """
+    Return the process identifier of a running maestrod.
+
+    :param registry: The directory studies are registered in.
+    :returns: The process identifier, or None if maestrod is not running.
+    """
+    try:
+        with open(os.path.join(registry, PIDFILE)) as pid_file:
+            pid = int(pid_file.read().strip())
+    except (IOError, OSError, ValueError):
+        return None
+
+    try:
+        os.kill(pid, 0)
+    except OSError as exception:
+        if exception.errno != errno.EPERM:
+            return None
+
+    return pid
+
+
+class _Study(object):
+    """A registered study and the files used to conduct it."""
+
+    def __init__(self, registration):
+        """
+        Load a registered study.
+
+        :param registration: Path to the study's registration.
+        """
+        self.registration = registration
+        with open(registration) as reg_file:
+            self.directory = reg_file.read().strip()
+
+        study_pkl = glob.glob(os.path.join(self.directory, "*.pkl"))
+        # We expect only a single pickle file.
+        if len(study_pkl) != 1:
+            msg = "Expected a single pickle in '{}', found {}." \
+                  .format(self.directory, len(study_pkl))
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self.pickle_path = study_pkl[0]
+        self.status_path = "{}.status".format(
+            os.path.splitext(self.pickle_path)[0])
+        self.dag = ExecutionGraph.unpickle(self.pickle_path)
+
+    def save(self):
+        """Re-pickle the study and refresh its status and state."""
+        self.dag.pickle(self.pickle_path)
+        self.dag.write_status(self.status_path)
+        self.dag.sync_state()
+
+
+class StudyDaemon(object):
+    """
+    Conducts every study registered in a directory from a single process.
+
+    Each tick the daemon picks up newly registered studies and then conducts
+    every study once, as the conductor does for a single study. Studies whose
+    adapters observe the same jobs share a single status query, and scheduled
+    steps are submitted under throttles shared by all studies.
+    """
+
+    def __init__(self, registry=REGISTRY, max_in_flight=0, submit_rate=0,
+                 burst=0):
+        """
+        Initialize an instance of a StudyDaemon.
+
+        :param registry: The directory studies are registered in.
+        :param max_in_flight: Maximum number of steps submitted and
+        unfinished at once across all studies (0 for no limit).
+        :param submit_rate: Maximum submissions per second on average across
+        all studies (0 for no limit).
+        :param burst: Maximum number of submissions at once when limiting the
+        rate (defaults to the larger of 1 and submit_rate).
+        """
+        self._registry = registry
+        self._max_in_flight = max_in_flight
+        self._bucket = None
+        if submit_rate:
+            self._bucket = _TokenBucket(submit_rate,
+                                        burst or max(1, submit_rate))
+        # Registered studies keyed on the path to their registration.
+        self._studies = OrderedDict()
+        # Offset into the studies of the first one to submit each tick, which
+        # rotates so that no study is always last to use the throttle.
+        self._offset = 0
+
+    @property
+    def studies(self):
+        """
+        Return the studies currently being conducted.
+
+        :returns: A list of the ExecutionGraphs of registered studies.
+        """
+        return [study.dag for study in self._studies.values()]
+
+    def scan(self):
+        """Load newly registered studies and drop unregistered ones."""
+        registrations = set(glob.glob(
+            os.path.join(self._registry, "*" + REGISTRATION_EXT)))
+
+        for registration in list(self._studies.keys()):
+            if registration not in registrations:
+                logger.info("'%s' was unregistered.",
+                            self._studies[registration].dag.name)
+                del self._studies[registration]
+
+        for registration in sorted(registrations - set(self._studies)):
+            try:
+                study = _Study(registration)
+            except Exception:
+                logger.exception("Unable to load the study registered as "
+                                 "%s.", registration)
+                self._unregister(registration, failed=True)
+                continue
+
+            logger.info("Conducting study '%s' located in %s.",
+                        study.dag.name, study.directory)
+            self._studies[registration] = study
+
+    def _unregister(self, registration, failed=False):
+        """
+        Stop conducting a study and remove its registration.
+
+        :param registration: Path to the study's registration.
+        :param failed: True to keep the registration (renamed so that it is
+        not loaded again) for inspection.
+        """
+        self._studies.pop(registration, None)
+        try:
+            if failed:
+                os.rename(registration,
+                          os.path.splitext(registration)[0] + FAILED_EXT)
+            else:
+                os.remove(registration)
+        except OSError:
+            logger.warning("Unable to remove registration %s.", registration)
+
+    def _query_status(self):
+        """
+        Query the status of the jobs of every study.
+
+        Studies with the same status scope share one query. A study whose
+        status could not be queried is given an error status, so that it is
+        skipped this tick rather than stopping the service.
+
+        :returns: A dictionary of registrations to the result of the status
+        query for the study (None for studies to be queried on their own).
+        """
+        scopes = OrderedDict()
+        job_status = {}
+        for registration, study in self._studies.items():
+            try:
+                scope = study.dag.get_status_scope()
+            except Exception:
+                logger.exception("Unable to get the status scope of '%s'.",
+                                 study.dag.name)
+                job_status[registration] = (JobStatusCode.ERROR, {})
+                continue
+
+            if scope is None:
+                job_status[registration] = None
+            else:
+                scopes.setdefault(scope, []).append(registration)
+
+        for scope, registrations in scopes.items():
+            try:
+                joblist = []
+                for registration in registrations:
+                    joblist.extend(self._studies[registration].dag
+                                   .get_active_jobs())
+
+                # Steps that exited cleanly are resolved from their markers.
+                if joblist:
+                    dag = self._studies[registrations[0]].dag
+                    status = dag.check_jobs(joblist)
+                else:
+                    status = (JobStatusCode.NOJOBS, {})
+            except Exception:
+                logger.exception("Unable to query the status of jobs in "
+                                 "scope %s.", scope)
+                status = (JobStatusCode.ERROR, {})
+            logger.info("Queried %d jobs of %d studies in scope %s (retcode "
+                        "%s).", len(joblist), len(registrations), scope,
+                        status[0])
+            for registration in registrations:
+                job_status[registration] = status
+
+        return job_status
+
+    def _get_capacity(self):
+        """
+        Return how many steps may be submitted under the shared throttles.
+
+        :returns: The number of steps, or None if there is no limit.
+        """
+        capacity = None
+        if self._max_in_flight:
+            in_flight = sum(len(dag.in_progress) for dag in self.studies)
+            capacity = max(0, self._max_in_flight - in_flight)
+        if self._bucket:
+            tokens = self._bucket.refill()
+            capacity = tokens if capacity is None else min(capacity, tokens)
+
+        return capacity
+
+    def tick(self):
+        """
+        Conduct every registered study once.
+
+        :returns: The number of studies still being conducted.
+        """
+        self.scan()
+        if not self._studies:
+            return 0
+
+        job_status = self._query_status()
+        capacity = self._get_capacity()
+
+        registrations = list(self._studies.keys())
+        self._offset = self._offset % len(registrations)
+        registrations = registrations[self._offset:] + \
+            registrations[:self._offset]
+        self._offset += 1
+
+        num_scheduled = 0
+        for registration in registrations:
+            study = self._studies[registration]
+            status = job_status[registration]
+            if status is not None and status[0] == JobStatusCode.ERROR:
+                logger.warning("Job status check failed for '%s' -- "
+                               "skipping it this tick.", study.dag.name)
+                continue
+
+            try:
+                complete = study.dag.execute_ready_steps(status, capacity)
+                study.save()
+            except Exception:
+                logger.exception("Conducting '%s' failed -- it will no "
+                                 "longer be conducted.", study.dag.name)
+                self._unregister(registration, failed=True)
+                continue
+
+            scheduled = study.dag.tick_summary.get("scheduled", 0)
+            num_scheduled += scheduled
+            if capacity is not None:
+                capacity = max(0, capacity - scheduled)
+            if complete:
+                logger.info("Study '%s' is complete.", study.dag.name)
+                self._unregister(registration)
+
+        if self._bucket:
+            self._bucket.take(num_scheduled)
+
+        return len(self._studies)
+
+    def run(self, sleeptime):
+        """
+        Conduct registered studies until the process is stopped.
+
+        :param sleeptime: Seconds to wait between ticks.
+        """
+        while True:
+            num_studies = self.tick()
+            logger.info("Conducting %d studies.", num_studies)
+            sleep(sleeptime)
+
+
+def setup_argparser():
+    """
+    Method for setting up the program's argument parser.
+    """
+    parser = ArgumentParser(prog="maestrod",
+                            description="A service that conducts every "
+                            "study registered with it (see 'maestro "
+                            "--service') from a single process.",
+                            formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument("--registry", type=str, default=REGISTRY,
+                        help="Directory studies are registered in "
+                        "(default: %(default)s).")
+    parser.add_argument("-l", "--logpath", type=str,
+                        help="Alternate path to store program logging.")
+    parser.add_argument("-d", "--debug_lvl", type=int, default=2,
+                        help="Level of logging messages to be output:\n"
+                             "5 - Critical\n"
+                             "4 - Error\n"
+                             "3 - Warning\n"
+                             "2 - Info (Default)\n"
+                             "1 - Debug")
+    parser.add_argument("-c", "--logstdout", action="store_true",
+                        help="Output logging to stdout in addition to a file.")
+    parser.add_argument("-t", "--sleeptime", type=int, default=60,
+                        help="Amount of time (in seconds) for the service to "
+                        "wait between job status checks.")
+    parser.add_argument("--max_in_flight", type=int, default=0,
+                        help="Maximum number of steps submitted and "
+                        "unfinished at once across all studies (default: no "
+                        "limit).")
+    parser.add_argument("--submit_rate", type=float, default=0,
+                        help="Maximum average number of submissions per "
+                        "second across all studies (default: no limit).")
+    parser.add_argument("--submit_burst", type=int, default=0,
+                        help="Maximum number of submissions at once when "
+                        "--submit_rate is set.")
+
+    return parser
+
+
+def setup_logging(args):
+    """
+    Method for setting up logging for the service.
+
+    :param args: A Namespace object created by a parsed ArgumentParser.
+    """
+    log_path = args.logpath or os.path.join(args.registry, "logs")
+    loglevel = args.debug_lvl * 10
+
+    # Attempt to create the logging directory.
+    create_parentdir(log_path)
+    formatter = logging.Formatter(LFORMAT)
+    rootlogger.setLevel(loglevel)
+
+    # Set up handlers
+    if args.logstdout:
+        handler = logging.StreamHandler()
+        handler.setFormatter(formatter)
+        rootlogger.addHandler(handler)
+
+    handler = logging.FileHandler(os.path.join(log_path, "maestrod.log"))
+    handler.setFormatter(formatter)
+    rootlogger.addHandler(handler)
+
+
+def main():
+    # Set up and parse the ArgumentParser
+    parser = setup_argparser()
+    args = parser.parse_args()
+
+    pid = get_daemon_pid(args.registry)
+    if pid is not None:
+        sys.stderr.write("maestrod is already running (pid {}) for '{}'.\n"
+                         .format(pid, args.registry))
+        sys.exit(1)
+
+    setup_logging(args)
+    create_parentdir(args.registry)
+    pid_path = os.path.join(args.registry, PIDFILE)
+    with open(pid_path, "w") as pid_file:
+        pid_file.write(str(os.getpid()))
+
+    # Exit through the cleanup below when asked to terminate.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    daemon = StudyDaemon(args.registry, max_in_flight=args.max_in_flight,
+                         submit_rate=args.submit_rate,
+                         burst=args.submit_burst)
+    logger.info("maestrod (pid %d) conducting studies registered in %s.",
+                os.getpid(), args.registry)
+    try:
+        daemon.run(args.sleeptime)
+    finally:
+        os.remove(pid_path)
+
+    # Explicitly return a 0 status.
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
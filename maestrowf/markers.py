@@ -0,0 +1,156 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Markers that scheduled steps write to report their own completion."""
+import logging
+import os
+from six.moves import shlex_quote
+
+LOGGER = logging.getLogger(__name__)
+# Names of the files a step writes when it starts and when it exits.
+START_MARKER = "{}.start"
+EXIT_MARKER = "{}.exit"
+# Exit codes at or above this are a step killed by a signal (for example, by
+# the scheduler at its walltime), whose state the scheduler knows better.
+SIGNAL_EXIT = 128
+
+
+def get_marker_commands(marker_dir, name, restart=False):
+    """
+    Generate the shell commands that write the markers of a step.
+
+    The start marker holds the time the step started. The exit marker holds
+    the exit code of the script and the time it exited, and is written by an
+    EXIT trap so it is written however the script exits (a script ended by a
+    signal exits with 128 plus the signal number). Both are written to a
+    temporary file first and moved into place so that a reader never sees a
+    partially written marker.
+
+    A restart may be chained to start as soon as the job before it ends
+    unsuccessfully, which includes ending with an error rather than being
+    ended by a signal. Restarts exit before writing any markers if the exit
+    marker left by the job before them holds such an error.
+
+    :param marker_dir: Path to the directory markers are written to.
+    :param name: Name of the step.
+    :param restart: True if the commands are for a restart of the step.
+    :returns: A string of shell commands to place at the top of a script.
+    """
+    marker = shlex_quote(os.path.join(marker_dir, name))
+    start = START_MARKER.format("$MAESTRO_MARKER")
+    end = EXIT_MARKER.format("$MAESTRO_MARKER")
+    commands = ["MAESTRO_MARKER={}".format(marker)]
+    if restart:
+        commands.append(
+            "if [ -f \"{0}\" ] && read MAESTRO_RC MAESTRO_END < \"{0}\" && "
+            "[ \"$MAESTRO_RC\" -lt {1} ]; then exit 0; fi"
+            .format(end, SIGNAL_EXIT))
+    return "\n".join(commands + [
+        "date +%s > \"{0}.$$\" && mv -f \"{0}.$$\" \"{0}\"".format(start),
+        "trap 'exit 129' HUP; trap 'exit 130' INT; trap 'exit 143' TERM",
+        "trap 'MAESTRO_RC=$?; echo \"$MAESTRO_RC $(date +%s)\" > \"{0}.$$\" "
+        "&& mv -f \"{0}.$$\" \"{0}\"; exit $MAESTRO_RC' EXIT".format(end),
+    ])
+
+
+def scan_markers(marker_dir, names):
+    """
+    Read the exit markers of a set of steps with a single directory scan.
+
+    :param marker_dir: Path to the directory markers are written to.
+    :param names: The names of the steps to read the markers of.
+    :returns: A dict of step names to the exit code of the step and the time
+    it exited, for each of the steps that has exited.
+    """
+    try:
+        found = os.listdir(marker_dir)
+    except OSError:
+        LOGGER.warning("Marker directory '%s' could not be read.", marker_dir)
+        return {}
+
+    exited = {}
+    suffix = EXIT_MARKER.format("")
+    for fname in found:
+        if not fname.endswith(suffix):
+            continue
+        name = fname[:-len(suffix)]
+        if name not in names:
+            continue
+
+        try:
+            with open(os.path.join(marker_dir, fname)) as marker:
+                code, ended = marker.read().split()
+            exited[name] = (int(code), float(ended))
+        except (IOError, OSError, ValueError):
+            LOGGER.warning("Ignoring malformed exit marker '%s'.", fname)
+
+    return exited
+
+
+def read_start_marker(marker_dir, name):
+    """
+    Read the time a step started from its start marker.
+
+    :param marker_dir: Path to the directory markers are written to.
+    :param name: Name of the step.
+    :returns: The time the step started in seconds since the epoch, or None
+    if it has no (readable) start marker.
+    """
+    try:
+        with open(os.path.join(marker_dir, START_MARKER.format(name))) as f:
+            return float(f.read().strip())
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def clear_markers(marker_dir, name, attempt=None):
+    """
+    Remove the markers a step wrote in an earlier attempt.
+
+    :param marker_dir: Path to the directory markers are written to.
+    :param name: Name of the step.
+    :param attempt: The times (started, exited) the earlier attempt wrote to
+    its markers (optional). If given, only markers holding those times are
+    removed, keeping any that a later attempt has already written.
+    """
+    for marker, index in ((START_MARKER, 0), (EXIT_MARKER, 1)):
+        path = os.path.join(marker_dir, marker.format(name))
+        if attempt is not None:
+            try:
+                with open(path) as f:
+                    written = float(f.read().split()[-1])
+            except (IOError, OSError, ValueError, IndexError):
+                continue
+            if written != attempt[index]:
+                continue
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,165 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Opt-in profiling of the maestro and conductor entry points."""
+from contextlib import contextmanager
+import cProfile
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# Supported profile output formats:
+#   - pstats: A cProfile of the whole program, readable with pstats.
+#   - trace: Timing spans as Chrome trace JSON (chrome://tracing, Perfetto).
+PROFILE_FORMATS = ("pstats", "trace")
+
+
+class Profiler(object):
+    """
+    Record timing spans of a program and dump them as a profile.
+
+    A Profiler constructed without a format is disabled and spans cost next
+    to nothing, so spans can be left in place around hot paths.
+    """
+
+    def __init__(self, program, fmt=None):
+        """
+        Initialize a Profiler.
+
+        :param program: Name of the program being profiled.
+        :param fmt: Output format (one of PROFILE_FORMATS), or None to
+        disable profiling.
+        """
+        if fmt is not None and fmt not in PROFILE_FORMATS:
+            msg = "Profile format '{}' is not one of {}." \
+                  .format(fmt, ", ".join(PROFILE_FORMATS))
+            LOGGER.error(msg)
+            raise ValueError(msg)
+
+        self.program = program
+        self.fmt = fmt
+        self._start = time.time()
+        self._events = []
+        self._profile = None
+
+        if self.fmt == "pstats":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    @property
+    def enabled(self):
+        """
+        Check if the profiler is recording.
+
+        :returns: True if a profile format is set, False otherwise.
+        """
+        return self.fmt is not None
+
+    @contextmanager
+    def span(self, name, **args):
+        """
+        Time the enclosed block as a named span.
+
+        :param name: Name of the span.
+        :param **args: Additional details to record with the span.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            end = time.time()
+            LOGGER.debug("Profile span '%s' took %.6fs.", name, end - start)
+            self._events.append({
+                "name": name,
+                "cat": self.program,
+                "ph": "X",
+                "ts": int((start - self._start) * 1e6),
+                "dur": int((end - start) * 1e6),
+                "pid": os.getpid(),
+                "tid": threading.current_thread().ident,
+                "args": args,
+            })
+
+    def dump(self, path, name):
+        """
+        Write the profile collected so far.
+
+        The profile is written to '<name>.<program>.prof' for the pstats
+        format and '<name>.<program>.trace.json' for the trace format. Dumps
+        replace the previous dump so that a long running program can be
+        profiled while it is still running.
+
+        :param path: Directory to write the profile to.
+        :param name: Name to prefix the profile file with.
+        :returns: The path the profile was written to, or None if the
+        profiler is disabled.
+        """
+        if not self.enabled:
+            return None
+
+        if self.fmt == "pstats":
+            out_path = os.path.join(
+                path, "{}.{}.prof".format(name, self.program))
+            # Dumping stats disables the profiler, resume once written.
+            self._profile.dump_stats(out_path)
+            self._profile.enable()
+        else:
+            out_path = os.path.join(
+                path, "{}.{}.trace.json".format(name, self.program))
+            metadata = [{
+                "name": "process_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "args": {"name": self.program},
+            }]
+            trace = {
+                "traceEvents": metadata + self._events,
+                "displayTimeUnit": "ms",
+                "otherData": {
+                    "program": self.program,
+                    "start": time.strftime("%Y-%m-%d %H:%M:%S",
+                                           time.localtime(self._start)),
+                },
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=path, suffix=".tmp")
+            with os.fdopen(fd, "w") as trace_file:
+                json.dump(trace, trace_file)
+            os.rename(tmp_path, out_path)
+
+        LOGGER.debug("Profile written to %s", out_path)
+        return out_path
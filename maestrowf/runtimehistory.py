@@ -0,0 +1,183 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Local store of step runtimes used to predict walltimes."""
+import logging
+import math
+import os
+import sqlite3
+import time
+
+LOGGER = logging.getLogger(__name__)
+RUNTIME_HISTORY = os.path.join(os.path.expanduser("~"), ".maestrowf",
+                               "runtimes.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runtimes (
+    study TEXT,
+    step TEXT,
+    params TEXT,
+    runtime REAL,
+    recorded REAL
+);
+CREATE INDEX IF NOT EXISTS runtimes_step ON runtimes (study, step, params);
+"""
+
+
+class RuntimeHistory(object):
+    """
+    A store of how long steps took to run in past studies.
+
+    Runtimes are keyed by the name of the study, the name of the abstract step
+    a step was expanded from, and the values of the parameters the step used
+    (the labels that name the expanded step). Predictions use the runtimes of
+    steps with the same parameters when there are enough of them, and the
+    runtimes of the abstract step across all parameters otherwise.
+    """
+
+    def __init__(self, path=RUNTIME_HISTORY, timeout=30, max_samples=100):
+        """
+        Initialize an instance of a RuntimeHistory.
+
+        :param path: Path to the SQLite database file.
+        :param timeout: Seconds to wait on a locked database.
+        :param max_samples: Number of most recent runtimes used to predict.
+        """
+        self._path = path
+        self._timeout = timeout
+        self._max_samples = max_samples
+        self._conn = None
+
+    @property
+    def connection(self):
+        """
+        Return the connection to the database, opening it if needed.
+
+        :returns: A sqlite3 Connection to the history's database.
+        """
+        if self._conn is None:
+            LOGGER.debug("Opening runtime history %s", self._path)
+            dirname = os.path.dirname(self._path)
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname)
+            self._conn = sqlite3.connect(self._path, timeout=self._timeout)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+        return self._conn
+
+    def record(self, runtimes):
+        """
+        Record the runtimes of finished steps.
+
+        Failing to write to the history is logged but not raised, a study
+        should not stop because its history could not be recorded.
+
+        :param runtimes: A list of (study, step, params, runtime) tuples, with
+        the runtime in seconds.
+        """
+        if not runtimes:
+            return
+
+        now = time.time()
+        try:
+            with self.connection as conn:
+                conn.executemany(
+                    "INSERT INTO runtimes (study, step, params, runtime, "
+                    "recorded) VALUES (?, ?, ?, ?, ?)",
+                    [tuple(entry) + (now,) for entry in runtimes])
+        except (OSError, sqlite3.Error) as exception:
+            LOGGER.warning("Unable to record %d runtimes in %s -- %s",
+                           len(runtimes), self._path, exception)
+            return
+
+        LOGGER.debug("Recorded %d runtimes in %s.", len(runtimes), self._path)
+
+    def get_runtimes(self, study, step, params=None):
+        """
+        Return the most recently recorded runtimes of a step.
+
+        :param study: Name of the study.
+        :param step: Name of the abstract step.
+        :param params: Parameter labels of the expanded step (optional, all
+        parameters if None).
+        :returns: A list of runtimes in seconds, most recent first.
+        """
+        query = "SELECT runtime FROM runtimes WHERE study = ? AND step = ?"
+        args = [study, step]
+        if params is not None:
+            query += " AND params = ?"
+            args.append(params)
+        query += " ORDER BY recorded DESC LIMIT ?"
+        args.append(self._max_samples)
+
+        try:
+            cursor = self.connection.execute(query, args)
+            return [row[0] for row in cursor]
+        except (OSError, sqlite3.Error) as exception:
+            LOGGER.warning("Unable to read runtimes from %s -- %s",
+                           self._path, exception)
+            return []
+
+    def predict_walltime(self, study, step, params="", percentile=0.95,
+                         margin=0.2, min_samples=3, minimum=60):
+        """
+        Predict the walltime a step needs from its recorded runtimes.
+
+        The prediction is a percentile of the recorded runtimes plus a
+        margin, rounded up to the minute.
+
+        :param study: Name of the study.
+        :param step: Name of the abstract step.
+        :param params: Parameter labels of the expanded step.
+        :param percentile: Fraction of recorded runtimes the walltime should
+        cover.
+        :param margin: Fraction of the percentile added as a safety margin.
+        :param min_samples: Fewest runtimes a prediction is based on.
+        :param minimum: Shortest walltime predicted in seconds.
+        :returns: The predicted walltime in seconds, or None if there are too
+        few recorded runtimes.
+        """
+        runtimes = self.get_runtimes(study, step, params)
+        if len(runtimes) < min_samples:
+            runtimes = self.get_runtimes(study, step)
+        if len(runtimes) < min_samples:
+            return None
+
+        # Nearest rank percentile.
+        runtimes.sort()
+        rank = max(0, int(math.ceil(percentile * len(runtimes))) - 1)
+        walltime = max(minimum, runtimes[rank] * (1 + margin))
+        return int(math.ceil(walltime / 60.0)) * 60
+
+    def close(self):
+        """Close the connection to the database."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
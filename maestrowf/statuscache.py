@@ -0,0 +1,269 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""A cache of job status shared by script adapters."""
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from maestrowf.abstracts.enums import JobStatusCode, State
+
+LOGGER = logging.getLogger(__name__)
+# States a job never leaves, which are cached for as long as they are kept.
+TERMINAL_STATES = frozenset([State.FINISHED, State.FAILED, State.TIMEDOUT,
+                             State.HWFAILURE])
+# Seconds that terminal states are kept in a cache.
+TERMINAL_RETENTION = 7 * 24 * 60 * 60
+
+
+class StatusCache(object):
+    """
+    A cache of the status of scheduled jobs.
+
+    Status is cached per status scope (see ScriptAdapter.get_status_scope),
+    so a query made for one adapter answers queries for any adapter that
+    observes the same jobs. Each query covers the jobs requested along with
+    every job of the scope that was last seen unfinished, and its result is
+    reused until it is older than a time to live. Jobs in a terminal state are
+    never queried again.
+
+    Caches are shared within a process. A cache may also be kept in a file so
+    that it is shared between processes. Queries are then made under a file
+    lock, so that one process queries the scheduler while the others wait for
+    and reuse its result.
+    """
+
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    @classmethod
+    def get_cache(cls, path=None):
+        """
+        Return the cache shared by the process for a cache file.
+
+        :param path: Path to the cache file (None for a cache that is only
+        kept in memory).
+        :returns: A StatusCache instance.
+        """
+        key = os.path.abspath(path) if path else None
+        with cls._caches_lock:
+            if key not in cls._caches:
+                cls._caches[key] = cls(key)
+            return cls._caches[key]
+
+    def __init__(self, path=None):
+        """
+        Initialize an empty StatusCache.
+
+        :param path: Path to the cache file (default: None).
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        # Latest query per scope: the time, return code, and state name (or
+        # None if not found) of every job queried.
+        self._snapshots = {}
+        # Terminal state names and the time they were seen, per scope.
+        self._terminal = {}
+
+    def check_jobs(self, scope, joblist, query, ttl=0):
+        """
+        Return the status of jobs, querying the scheduler if needed.
+
+        :param scope: The status scope of the adapter the jobs belong to.
+        :param joblist: A list of job identifiers.
+        :param query: A function that takes a list of job identifiers and
+        returns the return code of a status query and a dictionary of job
+        identifiers to their status (for example, an adapter's check_jobs).
+        :param ttl: Seconds a query result is reused for.
+        :returns: The return code of the status query, and a dictionary of job
+        identifiers to their status.
+        """
+        if not joblist:
+            return JobStatusCode.NOJOBS, {}
+
+        key = repr(scope)
+        with self._lock:
+            lock_file = self._lock_file()
+            try:
+                self._load()
+                cached = self._lookup(key, joblist, ttl)
+                if cached is not None:
+                    return cached
+
+                return self._query(key, joblist, query)
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+
+    def _lookup(self, key, joblist, ttl):
+        """
+        Answer a status query from the cache.
+
+        :param key: The key of the status scope.
+        :param joblist: A list of job identifiers.
+        :param ttl: Seconds a query result is reused for.
+        :returns: The return code and dictionary of job identifiers to their
+        status, or None if the cache cannot answer the query.
+        """
+        terminal = self._terminal.get(key, {})
+        snapshot = self._snapshots.get(key)
+        remaining = [jobid for jobid in joblist if str(jobid) not in terminal]
+        if remaining:
+            if not ttl or snapshot is None or \
+                    time.time() - snapshot["time"] > ttl:
+                return None
+            if any(str(jobid) not in snapshot["jobs"] for jobid in remaining):
+                return None
+            retcode = JobStatusCode[snapshot["retcode"]]
+        else:
+            retcode = JobStatusCode.OK
+
+        status = {}
+        for jobid in joblist:
+            if str(jobid) in terminal:
+                state = terminal[str(jobid)][0]
+            else:
+                state = snapshot["jobs"][str(jobid)]
+            status[jobid] = State[state] if state else None
+
+        if len(remaining) < len(joblist):
+            # Jobs were found, even if the last query found none.
+            retcode = JobStatusCode.OK
+
+        LOGGER.debug("Status of %d jobs answered from the cache (%d "
+                     "terminal).", len(joblist),
+                     len(joblist) - len(remaining))
+        return retcode, status
+
+    def _query(self, key, joblist, query):
+        """
+        Query the scheduler and cache the result.
+
+        :param key: The key of the status scope.
+        :param joblist: A list of job identifiers.
+        :param query: A function that queries the status of jobs.
+        :returns: The return code and dictionary of job identifiers to their
+        status for the jobs in joblist.
+        """
+        terminal = self._terminal.setdefault(key, {})
+        requested = set(str(jobid) for jobid in joblist)
+        # Also refresh jobs others asked about that were last seen unfinished.
+        snapshot = self._snapshots.get(key, {"jobs": {}})
+        extra = [jobid for jobid, state in snapshot["jobs"].items()
+                 if state and jobid not in requested and jobid not in terminal]
+        queried = [jobid for jobid in joblist if str(jobid) not in terminal]
+        queried += extra
+
+        retcode, status = query(queried)
+        if retcode not in (JobStatusCode.OK, JobStatusCode.NOJOBS):
+            return retcode, {jobid: status.get(jobid) for jobid in joblist}
+
+        now = time.time()
+        jobs = dict.fromkeys((str(jobid) for jobid in queried), None)
+        for jobid, state in status.items():
+            jobs[str(jobid)] = state.name if state else None
+            if state in TERMINAL_STATES:
+                terminal[str(jobid)] = (state.name, now)
+        self._snapshots[key] = {"time": now, "retcode": retcode.name,
+                                "jobs": jobs}
+        self._prune(now)
+        self._save()
+
+        return self._lookup(key, joblist, float("inf"))
+
+    def _prune(self, now):
+        """
+        Forget terminal states once they are unlikely to be asked about.
+
+        :param now: The current time in seconds since the epoch.
+        """
+        oldest = now - TERMINAL_RETENTION
+        for terminal in self._terminal.values():
+            for jobid in [jobid for jobid, entry in terminal.items()
+                          if entry[1] < oldest]:
+                del terminal[jobid]
+
+    def _lock_file(self):
+        """
+        Take the lock on the cache file.
+
+        :returns: The open lock file (closing it releases the lock), or None
+        if the cache is not kept in a file.
+        """
+        if not self._path:
+            return None
+
+        dirname = os.path.dirname(self._path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        lock_file = open(self._path + ".lock", "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _load(self):
+        """Merge the contents of the cache file into the cache."""
+        if not self._path or not os.path.exists(self._path):
+            return
+
+        try:
+            with open(self._path, "r") as cache_file:
+                contents = json.load(cache_file)
+        except (IOError, OSError, ValueError) as exception:
+            LOGGER.warning("Ignoring unreadable status cache %s -- %s",
+                           self._path, exception)
+            return
+
+        for key, snapshot in contents.get("snapshots", {}).items():
+            current = self._snapshots.get(key)
+            if current is None or snapshot["time"] > current["time"]:
+                self._snapshots[key] = snapshot
+        for key, jobs in contents.get("terminal", {}).items():
+            terminal = self._terminal.setdefault(key, {})
+            for jobid, entry in jobs.items():
+                terminal.setdefault(jobid, tuple(entry))
+
+    def _save(self):
+        """Write the cache to the cache file."""
+        if not self._path:
+            return
+
+        contents = {"snapshots": self._snapshots, "terminal": self._terminal}
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self._path), suffix=".tmp")
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump(contents, cache_file)
+            os.rename(tmp_path, self._path)
+        except (IOError, OSError) as exception:
+            LOGGER.warning("Unable to write status cache %s -- %s",
+                           self._path, exception)
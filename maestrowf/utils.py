@@ -30,6 +30,7 @@
 """A collection of more general utility functions."""
 
 import logging
+import math
 import os
 import time
 
@@ -79,7 +80,12 @@ def create_parentdir(path):
         LOGGER.info("Directory does not exist. Creating directories to %s",
                     path)
         path = os.path.expanduser(path)
-        os.makedirs(path)
+        try:
+            os.makedirs(path)
+        except OSError:
+            # Another process may have created it in the meantime.
+            if not os.path.isdir(path):
+                raise
 
 
 def apply_function(item, func):
@@ -106,3 +112,64 @@ def apply_function(item, func):
               ", or dict.".format(type(item))
         LOGGER.error(msg)
         raise ValueError(msg)
+
+
+def parse_walltime(walltime):
+    """
+    Utility function for converting a walltime to seconds.
+
+    Accepts the formats understood by common schedulers: "minutes",
+    "minutes:seconds", "hours:minutes:seconds", "days-hours",
+    "days-hours:minutes", and "days-hours:minutes:seconds".
+
+    :param walltime: A walltime string (or number of minutes).
+    :returns: The walltime in seconds, or None if walltime is empty or not
+    a valid walltime.
+    """
+    if walltime is None or walltime == "":
+        return None
+
+    walltime = str(walltime).strip()
+    days = 0
+    try:
+        if "-" in walltime:
+            days, walltime = walltime.split("-", 1)
+            days = int(days)
+            # With days, fields are hours[:minutes[:seconds]].
+            fields = [int(field) for field in walltime.split(":")]
+            fields += [0] * (3 - len(fields))
+            hours, minutes, seconds = fields
+        else:
+            fields = [int(field) for field in walltime.split(":")]
+            if len(fields) == 1:
+                hours, minutes, seconds = 0, fields[0], 0
+            elif len(fields) == 2:
+                hours, (minutes, seconds) = 0, fields
+            elif len(fields) == 3:
+                hours, minutes, seconds = fields
+            else:
+                raise ValueError(walltime)
+    except ValueError:
+        LOGGER.warning("'%s' is not a valid walltime.", walltime)
+        return None
+
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def format_walltime(seconds):
+    """
+    Utility function for formatting seconds as a walltime.
+
+    :param seconds: A duration in seconds.
+    :returns: A walltime string formatted as "hours:minutes:seconds", or
+    "days-hours:minutes:seconds" for durations of a day or more.
+    """
+    seconds = int(math.ceil(seconds))
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    walltime = "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
+    if days:
+        walltime = "{}-{}".format(days, walltime)
+
+    return walltime
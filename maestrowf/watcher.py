@@ -0,0 +1,223 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Watchers that wake the conductor when steps write their exit markers."""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import six
+import struct
+import sys
+import time
+
+from maestrowf.markers import EXIT_MARKER
+
+LOGGER = logging.getLogger(__name__)
+# inotify event masks (see inotify(7)).
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+# Layout of the fixed part of an inotify_event: wd, mask, cookie, len.
+_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher(object):
+    """A watcher that lists the marker directory at a fixed interval."""
+
+    def __init__(self, path, interval=1.0, settle=0.05):
+        """
+        Initialize a watcher of a marker directory.
+
+        :param path: Path to the marker directory.
+        :param interval: Seconds between listings of the directory.
+        :param settle: Seconds to keep collecting markers after the first
+        one appears, so that steps exiting together wake the conductor once.
+        """
+        self._path = path
+        self._interval = float(interval)
+        self._settle = float(settle)
+        self._seen = self._scan()
+
+    def _scan(self):
+        """
+        List the exit markers in the marker directory.
+
+        :returns: A set of the file names of the exit markers.
+        """
+        suffix = EXIT_MARKER.format("")
+        try:
+            return set(fname for fname in os.listdir(self._path)
+                       if fname.endswith(suffix))
+        except OSError:
+            return set()
+
+    def wait(self, timeout):
+        """
+        Wait for steps to write their exit markers.
+
+        :param timeout: Most seconds to wait.
+        :returns: True if exit markers were written, False if none were
+        written before the timeout.
+        """
+        deadline = time.time() + timeout
+        while True:
+            found = self._scan()
+            written = found - self._seen
+            self._seen = found
+            if written:
+                time.sleep(self._settle)
+                self._seen = self._scan()
+                return True
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self._interval, remaining))
+
+    def close(self):
+        """Release the resources of the watcher."""
+        pass
+
+
+class InotifyWatcher(object):
+    """
+    A watcher notified of new exit markers by Linux inotify.
+
+    Markers are moved into place once written, so an IN_MOVED_TO (or an
+    IN_CLOSE_WRITE) event for a file named like an exit marker means a step
+    exited. Note that inotify is not notified of files written on other
+    hosts of a network file system, so a conductor watching a shared marker
+    directory may still only notice markers at the end of its timeout.
+    """
+
+    def __init__(self, path, settle=0.05):
+        """
+        Initialize a watcher of a marker directory.
+
+        :param path: Path to the marker directory.
+        :param settle: Seconds to keep collecting markers after the first
+        one appears, so that steps exiting together wake the conductor once.
+        :raises OSError: If inotify is unavailable.
+        """
+        self._settle = float(settle)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                           use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not supported by the C library.")
+
+        flags = os.O_NONBLOCK | getattr(os, "O_CLOEXEC", 0)
+        self._fd = libc.inotify_init1(flags)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        if isinstance(path, six.text_type):
+            path = path.encode(sys.getfilesystemencoding())
+        watch = libc.inotify_add_watch(self._fd, ctypes.c_char_p(path),
+                                       IN_CLOSE_WRITE | IN_MOVED_TO)
+        if watch < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, os.strerror(errno))
+
+    def _read(self):
+        """
+        Read the pending events of the watch.
+
+        :returns: True if an exit marker was written (or events were lost),
+        False otherwise.
+        """
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError:
+            return False
+
+        suffix = EXIT_MARKER.format("").encode()
+        written = False
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW or name.endswith(suffix):
+                written = True
+
+        return written
+
+    def wait(self, timeout):
+        """
+        Wait for steps to write their exit markers.
+
+        :param timeout: Most seconds to wait.
+        :returns: True if exit markers were written, False if none were
+        written before the timeout.
+        """
+        deadline = time.time() + timeout
+        written = False
+        while True:
+            remaining = deadline - time.time()
+            if written:
+                remaining = min(remaining, self._settle)
+            if remaining <= 0:
+                return written
+
+            ready = select.select([self._fd], [], [], remaining)[0]
+            if not ready:
+                return written
+            written = self._read() or written
+
+    def close(self):
+        """Release the resources of the watcher."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def get_watcher(path, interval=1.0, settle=0.05):
+    """
+    Create a watcher of a marker directory.
+
+    An InotifyWatcher is used where inotify is available, and a
+    PollingWatcher otherwise.
+
+    :param path: Path to the marker directory.
+    :param interval: Seconds between listings of the directory if polling.
+    :param settle: Seconds to keep collecting markers after the first one
+    appears.
+    :returns: An InotifyWatcher or a PollingWatcher.
+    """
+    try:
+        return InotifyWatcher(path, settle)
+    except (AttributeError, OSError) as exception:
+        LOGGER.info("Polling '%s' for markers, inotify is unavailable (%s).",
+                    path, exception)
+        return PollingWatcher(path, interval, settle)
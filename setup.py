@@ -13,6 +13,7 @@ setup(name='maestrowf',
         'console_scripts': [
             'maestro = maestrowf.maestro:main',
             'conductor = maestrowf.conductor:main',
+            'maestrod = maestrowf.maestrod:main',
         ]
       },
       install_requires=[
@@ -0,0 +1,239 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Tests for the ExecutionGraph."""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from maestrowf.abstracts.enums import JobStatusCode, State, SubmissionCode
+from maestrowf.datastructures.core.executiongraph import ExecutionGraph, \
+    SOURCE, _StepRecord
+from maestrowf.datastructures.core.study import StudyStep
+from maestrowf.markers import EXIT_MARKER, START_MARKER
+
+
+def _write_markers(marker_dir, name, started, ended, code=0):
+    """Write the markers a step's script would write."""
+    with open(os.path.join(marker_dir, START_MARKER.format(name)), "w") as f:
+        f.write("{}\n".format(int(started)))
+    with open(os.path.join(marker_dir, EXIT_MARKER.format(name)), "w") as f:
+        f.write("{} {}\n".format(code, int(ended)))
+
+
+class TestExecutionGraph(unittest.TestCase):
+    """Tests for the ExecutionGraph class."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.graph = ExecutionGraph()
+        self.graph.add_node(SOURCE, None)
+        self.graph.set_marker_dir(os.path.join(self.tmpdir, "markers"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _add_step(self, name, depends=(), scheduled=True, **run):
+        step = StudyStep()
+        step.name = name
+        step.run["depends"] = list(depends)
+        step.run.update(run)
+        record = _StepRecord(workspace=self.tmpdir, step=step,
+                             restart_limit=1, abstract_name=name)
+        record.to_be_scheduled = scheduled
+        self.graph.add_node(name, record)
+        self.graph.add_edge(SOURCE, name)
+        for parent in depends:
+            self.graph.add_edge(parent, name)
+        return record
+
+    def _submit(self, name, jobid):
+        record = self.graph.values[name]
+        self.graph._apply_submission(name, record, SubmissionCode.OK, jobid)
+        return record
+
+    def test_latency_of_late_detection(self):
+        """A finish seen a tick late counts towards the latency."""
+        self._add_step("a")
+        self._add_step("b", depends=["a"])
+        record = self._submit("a", "1")
+        # The step was submitted a minute ago, and ran from 55 to 40 seconds
+        # ago, but the conductor is only now checking on it.
+        record.events = [(event, timestamp - 60)
+                         for event, timestamp in record.events]
+        now = time.time()
+        _write_markers(self.graph.marker_dir, "a", now - 55, now - 40)
+
+        retcode, status = self.graph.check_study_status(
+            (JobStatusCode.OK, {}))
+        self.assertEqual(status, {"a": State.FINISHED})
+        record.status = State.FINISHED
+        self._submit("b", "2")
+
+        report = self.graph.get_performance_report()
+        self.assertGreaterEqual(report["latency"]["mean"], 39)
+        self.assertLessEqual(report["latency"]["mean"], 42)
+        self.assertGreaterEqual(report["steps"]["a"]["runtime"]["mean"], 14)
+        self.assertLessEqual(report["steps"]["a"]["runtime"]["mean"], 16)
+
+    def test_markers_only_check(self):
+        """A markers only check resolves clean exits without a query."""
+        for name, jobid in (("a", "1"), ("b", "2"), ("c", "3")):
+            self._add_step(name)
+            self._submit(name, jobid)
+        now = time.time()
+        _write_markers(self.graph.marker_dir, "a", now - 10, now, code=0)
+        _write_markers(self.graph.marker_dir, "b", now - 10, now, code=137)
+
+        def check_jobs(joblist):
+            self.fail("Queried the scheduler for {}".format(joblist))
+        self.graph.check_jobs = check_jobs
+
+        retcode, status = self.graph.check_study_status(markers_only=True)
+        self.assertEqual(retcode, JobStatusCode.OK)
+        # The step ended by a signal is left for the scheduler to explain.
+        self.assertEqual(status, {"a": State.FINISHED})
+
+    def test_exclude_nodes_batched(self):
+        """The nodes of every hardware failure in a tick are one query."""
+        queries = []
+
+        class Adapter(object):
+            def get_job_nodes(self, joblist):
+                queries.append(sorted(joblist))
+                return {"1": ["node1"], "2": ["node2"]}
+
+        self.graph.add_description("test", "")
+        self.graph._get_adapter = lambda scheduled=True: Adapter()
+        for name, jobid in (("a", "1"), ("b", "2")):
+            self._add_step(name)
+            self._submit(name, jobid)
+
+        self.graph.execute_ready_steps(
+            (JobStatusCode.OK, {"1": State.HWFAILURE, "2": State.HWFAILURE}))
+        self.assertEqual(queries, [["1", "2"]])
+        self.assertEqual(self.graph.values["a"].step.run["exclude"], "node1")
+        self.assertEqual(self.graph.values["b"].step.run["exclude"], "node2")
+
+    def test_exclude_node_ranges(self):
+        """Excluded host ranges are kept whole across hardware failures."""
+        class Adapter(object):
+            def get_job_nodes(self, joblist):
+                return {"1": ["node[01-03,07]"], "2": ["node[05,09]"]}
+
+        self.graph._get_adapter = lambda scheduled=True: Adapter()
+        record = self._add_step("a", exclude="node[10-11],other")
+        for jobid in ("1", "2"):
+            self._submit("a", jobid)
+            self.graph._exclude_nodes(["a"])
+        self.assertEqual(record.step.run["exclude"],
+                         "node[01-03,07],node[05,09],node[10-11],other")
+
+    def test_chained_restart_markers(self):
+        """A chained restart is not resolved from the markers it follows."""
+        self.graph.add_description("test", "")
+        self._add_step("a", chain_restart=True)
+        record = self._submit("a", "1")
+        record.chained = "2"
+        now = time.time()
+        _write_markers(self.graph.marker_dir, "a", now - 60, now - 5,
+                       code=143)
+
+        self.graph.execute_ready_steps(
+            (JobStatusCode.OK, {"1": State.TIMEDOUT, "2": State.PENDING}))
+        self.assertEqual(record.jobid, ["1", "2"])
+        self.assertEqual([(jobid, state) for jobid, _, state, _
+                          in record.get_attempts()],
+                         [("1", State.TIMEDOUT), ("2", State.PENDING)])
+
+        # The restart is not listed by the scheduler yet.
+        retcode, status = self.graph.check_study_status(
+            (JobStatusCode.OK, {}))
+        self.assertEqual(status, {})
+
+    def test_chained_restart_cancelled_on_failure(self):
+        """A step that fails cancels its chained restart from its marker."""
+        cancelled = []
+
+        class Adapter(object):
+            def cancel(self, joblist):
+                cancelled.extend(joblist)
+
+        self.graph.add_description("test", "")
+        self.graph._get_adapter = lambda scheduled=True: Adapter()
+        self._add_step("a", chain_restart=True)
+        record = self._submit("a", "1")
+        record.chained = "2"
+        now = time.time()
+        _write_markers(self.graph.marker_dir, "a", now - 60, now - 5, code=1)
+
+        self.graph.execute_ready_steps(markers_only=True)
+        self.assertEqual(cancelled, ["2"])
+        self.assertIsNone(record.chained)
+        self.assertEqual(record.jobid, ["1"])
+        self.assertEqual(record.status, State.FAILED)
+        self.assertEqual(sorted(os.listdir(self.graph.marker_dir)),
+                         ["a.exit", "a.start"])
+
+    def test_local_steps_not_throttled(self):
+        """Local steps are taken from the queue when the throttle is full."""
+        self._add_step("a")
+        self._add_step("b")
+        self._add_step("c", scheduled=False)
+        self.graph.set_throttle(max_in_flight=1)
+        self._submit("a", "1")
+        self.graph._enqueue("b")
+        self.graph._enqueue("c")
+
+        selected = self.graph._dequeue()
+        self.assertEqual([name for name, _, _ in selected], ["c"])
+        self.assertEqual([entry[2] for entry in self.graph._submit_queue],
+                         ["b"])
+
+    def test_prioritize_keeps_delays(self):
+        """Reprioritizing the queue does not cut short a retry delay."""
+        self._add_step("a")
+        self._add_step("b", depends=["a"])
+        self.graph._enqueue("a", delay=60)
+        self.graph._enqueue("b")
+        self.graph.set_prioritizer("critical_path")
+
+        # The delayed step is now first, but not before its delay ends.
+        self.assertEqual(self.graph._submit_queue[0][2], "a")
+        self.assertEqual([name for name, _, _ in self.graph._dequeue()],
+                         ["b"])
+        self.graph._not_before["a"] = time.time()
+        self.assertEqual([name for name, _, _ in self.graph._dequeue()],
+                         ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
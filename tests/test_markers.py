@@ -0,0 +1,75 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Tests for the markers scheduled steps write."""
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from maestrowf.markers import EXIT_MARKER, START_MARKER, get_marker_commands
+
+
+class TestMarkers(unittest.TestCase):
+    """Tests for the marker commands written to scripts."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _run(self, restart):
+        script = "{}\necho ran\n".format(
+            get_marker_commands(self.tmpdir, "a", restart))
+        return subprocess.check_output(["bash", "-c", script]).decode()
+
+    def _write_exit(self, code):
+        with open(os.path.join(self.tmpdir, EXIT_MARKER.format("a")),
+                  "w") as marker:
+            marker.write("{} 100\n".format(code))
+
+    def test_restart_after_failure(self):
+        """A restart does not run after a job that exited with an error."""
+        self._write_exit(1)
+        self.assertEqual(self._run(True), "")
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tmpdir, START_MARKER.format("a"))))
+
+    def test_restart_after_timeout(self):
+        """A restart runs after a job that was ended by a signal."""
+        self._write_exit(143)
+        self.assertEqual(self._run(True), "ran\n")
+        with open(os.path.join(self.tmpdir, EXIT_MARKER.format("a"))) as f:
+            self.assertEqual(f.read().split()[0], "0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Tests for the SQLite backed study state store."""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from maestrowf.abstracts.enums import State, SubmissionCode
+from maestrowf.datastructures.core.executiongraph import ExecutionGraph, \
+    _StepRecord
+from maestrowf.interfaces.state.sqlitestatebackend import SQLiteStateBackend
+
+
+class TestSQLiteStateBackend(unittest.TestCase):
+    """Tests for the SQLiteStateBackend class."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.backend = SQLiteStateBackend(
+            path=os.path.join(self.tmpdir, "study.db"))
+        self.graph = ExecutionGraph()
+        record = _StepRecord(workspace=self.tmpdir, restart_limit=1)
+        record.to_be_scheduled = True
+        self.graph.add_node("step", record)
+        self.backend.initialize(self.graph)
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.tmpdir)
+
+    def _submit(self, record, jobid, restart=False):
+        self.graph._apply_submission("step", record, SubmissionCode.OK,
+                                     jobid, restart)
+        time.sleep(0.01)
+
+    def _get_attempts(self):
+        return list(self.backend.connection.execute(
+            "SELECT attempt, jobid, state, submitted FROM attempts "
+            "WHERE step = ? ORDER BY attempt", ("step",)))
+
+    def test_restarted_attempts(self):
+        """Each attempt of a restarted step keeps its own time and state."""
+        record = self.graph.values["step"]
+        self._submit(record, "1")
+        first_submitted = record.last_event("SUBMITTED")
+        record.status = State.RUNNING
+        self.backend.update(self.graph)
+
+        time.sleep(0.01)
+        record.status = State.TIMEDOUT
+        self.graph._enqueue("step", restart=True)
+        self._submit(record, "2", restart=True)
+        second_submitted = record.last_event("SUBMITTED")
+        record.status = State.FINISHED
+        self.backend.update(self.graph)
+
+        attempts = self._get_attempts()
+        self.assertEqual([row[:3] for row in attempts],
+                         [(1, "1", "TIMEDOUT"), (2, "2", "FINISHED")])
+        self.assertEqual(attempts[0][3], first_submitted)
+        self.assertEqual(attempts[1][3], second_submitted)
+        self.assertLess(attempts[0][3], attempts[1][3])
+        self.assertEqual(self.backend.get_jobids("step"), ["1", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Tests for staging parameterized studies."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from maestrowf.datastructures.core import Study
+from maestrowf.datastructures.core.study import HASH_WIDTH, \
+    WORKSPACE_LAYOUTS
+from maestrowf.datastructures.yamlspecification import YAMLSpecification
+
+SPEC = """
+description:
+    name: stage
+    description: staging test
+
+env:
+    variables:
+        OUTPUT_PATH: {output}
+    labels:
+        outfile: $(SIZE.label).$(ITER.label).log
+
+study:
+    - name: prep
+      description: Uses no parameters.
+      run:
+          cmd: echo prep > prep.txt
+          depends: []
+    - name: run
+      description: Uses every parameter.
+      run:
+          cmd: echo $(SIZE) $(ITER) > $(outfile)
+          depends: [prep]
+    - name: post
+      description: Uses the parameters of the step it depends on.
+      run:
+          cmd: ls $(run.workspace)
+          depends: [run]
+    - name: size
+      description: Uses one of the parameters.
+      run:
+          cmd: echo $(SIZE)
+          depends: [prep]
+
+global.parameters:
+    SIZE:
+        values  : [10, 10, 20, 20, 30, 30, 40, 40]
+        label   : SIZE.%%
+    ITER:
+        values  : [1, 2, 3, 4, 5, 6, 7, 8]
+        label   : ITER.%%
+"""
+
+
+def _describe(dag):
+    """Return the steps, edges, workspaces and commands of a graph."""
+    return dict(
+        (name, (sorted(dag.adjacency_table[name]),
+                record.workspace if record else None,
+                record.step.run["cmd"] if record else None))
+        for name, record in dag.values.items())
+
+
+class TestStudyStaging(unittest.TestCase):
+    """Tests for the expansion of parameterized studies."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.spec_path = os.path.join(self.tmpdir, "spec.yaml")
+        with open(self.spec_path, "w") as spec:
+            spec.write(SPEC.format(output=os.path.join(self.tmpdir, "out")))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _setup_study(self, layout):
+        spec = YAMLSpecification.load_specification(self.spec_path)
+        study = Study(spec.name, spec.description,
+                      studyenv=spec.get_study_environment(),
+                      parameters=spec.get_parameters(),
+                      steps=spec.get_study_steps())
+        study.setup(workspace_layout=layout)
+        return study
+
+    def test_workers_stage_same_graph(self):
+        """Staging with workers gives the graph of staging in one process."""
+        for layout in WORKSPACE_LAYOUTS:
+            study = self._setup_study(layout)
+            path, serial = study.stage(1)
+            _, parallel = study.stage(4)
+
+            expected = _describe(serial)
+            self.assertEqual(_describe(parallel), expected, layout)
+            # prep once, run and post for each combination, and size for
+            # each value of SIZE (which more than one range expands).
+            self.assertEqual(len(expected), 1 + 1 + 8 + 8 + 4, layout)
+            workspaces = set(workspace for _, workspace, _
+                             in expected.values() if workspace)
+            self.assertEqual(len(workspaces), 1 + 8 + 4, layout)
+            for workspace in workspaces:
+                self.assertTrue(workspace.startswith(path), layout)
+
+    def test_layouts(self):
+        """Each layout places the same steps in its own workspaces."""
+        graphs = {}
+        for layout in WORKSPACE_LAYOUTS:
+            path, dag = self._setup_study(layout).stage(1)
+            graphs[layout] = dict(
+                (name, (edges, os.path.relpath(workspace, path), cmd))
+                for name, (edges, workspace, cmd) in _describe(dag).items()
+                if workspace)
+
+        self.assertEqual(
+            graphs["flat"]["run_ITER.1.SIZE.10"][1],
+            "ITER.1.SIZE.10")
+        self.assertEqual(
+            graphs["nested"]["run_ITER.1.SIZE.10"][1],
+            os.path.join("ITER.1", "SIZE.10"))
+        shard, combo = os.path.split(graphs["hashed"]["run_ITER.1.SIZE.10"][1])
+        self.assertEqual((len(shard), combo), (HASH_WIDTH, "ITER.1.SIZE.10"))
+        for layout in WORKSPACE_LAYOUTS:
+            self.assertEqual(sorted(graphs[layout]), sorted(graphs["flat"]))
+            for name, (edges, _, _) in graphs["flat"].items():
+                self.assertEqual(graphs[layout][name][0], edges)
+
+
+if __name__ == "__main__":
+    unittest.main()
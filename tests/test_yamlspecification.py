@@ -0,0 +1,92 @@
+###############################################################################
+# Copyright (c) 2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by Francesco Di Natale, dinatale3@llnl.gov.
+#
+# LLNL-CODE-734340
+# All rights reserved.
+# This file is part of MaestroWF, Version: 1.0.0.
+#
+# For details, see https://github.com/LLNL/maestrowf.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+###############################################################################
+
+"""Tests for loading YAML study specifications."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from maestrowf.datastructures import yamlspecification
+from maestrowf.datastructures.yamlspecification import YAMLSpecification
+
+SPEC = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                    "samples", "lulesh", "lulesh_sample1.yaml")
+
+
+class TestSpecificationCache(unittest.TestCase):
+    """Tests for the cache of parsed specifications."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, "specs")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_cache_hit(self):
+        """A cached specification loads the same as a parsed one."""
+        parsed = YAMLSpecification.load_specification(SPEC, self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        cached = YAMLSpecification.load_specification(SPEC, self.cache_dir)
+        for attr in yamlspecification._SPEC_ATTRS:
+            self.assertEqual(getattr(parsed, attr), getattr(cached, attr))
+
+    def test_failed_write(self):
+        """A cache entry that cannot be written leaves no temporary file."""
+        def dump(*args):
+            raise TypeError("unpicklable")
+
+        dump_orig = yamlspecification.pickle.dump
+        yamlspecification.pickle.dump = dump
+        try:
+            YAMLSpecification.load_specification(SPEC, self.cache_dir)
+        finally:
+            yamlspecification.pickle.dump = dump_orig
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_cache_size(self):
+        """Only the most recently used specifications are kept."""
+        size_orig = yamlspecification.SPEC_CACHE_SIZE
+        yamlspecification.SPEC_CACHE_SIZE = 2
+        try:
+            with open(SPEC) as spec:
+                contents = spec.read()
+            for index in range(3):
+                path = os.path.join(self.tmpdir, "{}.yaml".format(index))
+                with open(path, "w") as spec:
+                    spec.write("{}\n# {}\n".format(contents, index))
+                YAMLSpecification.load_specification(path, self.cache_dir)
+        finally:
+            yamlspecification.SPEC_CACHE_SIZE = size_orig
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()